@@ -1,23 +1,56 @@
 from sanic          import Sanic, Request
 from sanic.response import json, html, HTTPResponse
-from datetime       import datetime
 from sanic_cors     import CORS
+from contextlib     import aclosing
 from typing         import Any
 
+import asyncio
+import json as json_module
+
 from Moonlight.api.decorators       import permission, required_fields, get_database_by_id, required_arguments
+from Moonlight.api.registry         import registry
 from Moonlight.config.config        import config, app_data
 from Moonlight.core.tools           import password_hash
 from Moonlight.config.documentation import read_docs
 from Moonlight.config.paths         import docs_moonlight_path
 from Moonlight.core.moonlight       import Moonlight
 from Moonlight.core.methods         import Methods
+from Moonlight.core.tokens          import tokens
+from Moonlight.core.serializers     import json_lines
+from Moonlight.core.query           import compile_query
 from Moonlight.api.response_codes   import ResponseCodes
 
+def get_page(source: Any) -> tuple[int, int | None] | None:
+    '''Reads `offset` and `limit` from the request arguments or body, None if they are not non-negative integers'''
+    try:
+        offset: int        = int(source.get('offset') or 0)
+        limit:  int | None = int(source.get('limit')) if source.get('limit') is not None else None
+
+    except (TypeError, ValueError): return None
+
+    if offset < 0 or (limit is not None and limit < 0): return None
+
+    return offset, limit
+
+def check_ttl(ttl: Any) -> bool:
+    '''Checks that the `ttl` of the request body is missing or a positive number of seconds'''
+    return ttl is None or (isinstance(ttl, (int, float)) and not isinstance(ttl, bool) and ttl > 0)
+
 def create_application() -> Sanic:
     app: Sanic = Sanic('Moonlight')
 
     CORS(app)
 
+    @app.before_server_start
+    async def prune_tokens(app: Sanic) -> None:
+        app.ctx.pruner = asyncio.get_running_loop().create_task(tokens.keep_pruned(app_data.get('tokens').get('prune_interval')))
+
+    @app.after_server_stop
+    async def close_databases(app: Sanic) -> None:
+        app.ctx.pruner.cancel()
+
+        await registry.close()
+
     @app.route('/moonlight/docs', methods = ['GET'])
     async def moonlight_docs(request: Request) -> HTTPResponse:
         return html(
@@ -46,13 +79,12 @@ def create_application() -> Sanic:
             case '/moonlight/docs': return
             case _: pass
 
-        user_token: str = request.headers.get('Authorization')
-
-        token: dict[str, Any] = next((token for token in config.get('api_keys') if token.get('token') == user_token and datetime.fromisoformat(token.get('expires')) > datetime.now()), None)
+        token: dict[str, Any] | None = tokens.find(request.headers.get('Authorization'))
+        user:  dict[str, Any] | None = next((user for user in config.get('users') if user.get('username') == token.get('author')), None) if token else None
 
-        if not token: return json({ 'message' : 'Invalid or expired token' }, status = ResponseCodes['UNAUTHORIZED'].value)
+        if not user: return json({ 'message' : 'Invalid or expired token' }, status = ResponseCodes['UNAUTHORIZED'].value)
 
-        request.ctx.user = next(user for user in config.get('users') if user.get('username') == token.get('author'))
+        request.ctx.user = user
 
     @app.route('/moonlight/databases', methods = ['GET'])
     @permission('Administrator')
@@ -77,6 +109,8 @@ def create_application() -> Sanic:
 
         database: Moonlight = Moonlight(name, author = request.ctx.user.get('username'), console_show = app_data.get('api').get('console_show'))
 
+        registry.add(database)
+
         return json({ 
             'data' : { 
                 'id'      : database.database_id, 
@@ -91,7 +125,9 @@ def create_application() -> Sanic:
     async def moonlight_push(request: Request, database: Moonlight) -> HTTPResponse:
         query: dict[str, Any] = request.json.get('query')
 
-        record_id: int = await database.push(query)
+        if not check_ttl(request.json.get('ttl')): return json({ 'message' : '`ttl` must be a positive number of seconds' }, status = ResponseCodes['BAD_REQUEST'].value)
+
+        record_id: int = await database.push(query, request.json.get('ttl'))
 
         return json({ 
             'data' : { 
@@ -105,31 +141,138 @@ def create_application() -> Sanic:
     @permission('Viewer')
     @get_database_by_id
     async def moonlight_all(request: Request, database: Moonlight) -> HTTPResponse:
-        records: list[dict[str, Any]] = await database.all()
+        paging: tuple[int, int | None] | None = get_page(request.args)
 
-        return json({ 
-            'data' : { 
-                'records' : records, 
-                'message' : 'The records were successfully received from the database' 
-            } 
-        }, status = ResponseCodes['OK'].value)
+        if paging is None: return json({ 'message' : '`offset` and `limit` must be non-negative integers' }, status = ResponseCodes['BAD_REQUEST'].value)
+
+        offset, limit = paging
+
+        if limit is not None:
+            records: list[dict[str, Any]] = await database.all(offset, limit)
+
+            return json({ 
+                'data' : { 
+                    'records' : records, 
+                    'message' : 'The records were successfully received from the database' 
+                } 
+            }, status = ResponseCodes['OK'].value)
+
+        response: Any = await request.respond(status = ResponseCodes['OK'].value, content_type = 'application/json')
+
+        await response.send(b'{"data":{"records":[')
+
+        separator: bytes = b''
+
+        async for record in database.iter_all(offset):
+            await response.send(separator + json_lines.dumps(record))
+
+            separator = b','
+
+        await response.send(b'],"message":"The records were successfully received from the database"}}')
+        await response.eof()
 
     @app.route('/moonlight/<database_id:int>/get', methods = ['POST'])
     @permission('Viewer')
     @get_database_by_id
-    @required_fields('query')
     async def moonlight_get(request: Request, database: Moonlight) -> HTTPResponse:
-        query: dict[str, Any] = request.json.get('query')
+        if not request.json or not (request.json.get('query') or request.json.get('range')): 
+            return json({ 'message' : 'The request body must contain `query` or `range`', 'missing_fields' : ['query'] }, status = ResponseCodes['BAD_REQUEST'].value)
+
+        query:   dict[str, Any] = request.json.get('query')
+        options: dict[str, Any] = request.json.get('range')
+
+        if not options:
+            paging: tuple[int, int | None] | None = get_page(request.json)
+
+            if paging is None: return json({ 'message' : '`offset` and `limit` must be non-negative integers' }, status = ResponseCodes['BAD_REQUEST'].value)
+
+            records: list[dict[str, Any]] | None = await database.get(query, *paging, sort = request.json.get('sort'), projection = request.json.get('projection'))
+
+            if records is None: return json({ 'message' : 'Invalid `query`, `sort` or `projection`' }, status = ResponseCodes['BAD_REQUEST'].value)
 
-        records: list[dict[str, Any]] = await database.get(query) 
+            return json({
+                'data' : {
+                    'records' : records, 
+                    'message' : 'The records were successfully received from the database'
+                }
+            }, status = ResponseCodes['OK'].value)
+
+        page: dict[str, Any] = await database.range(
+            field   = options.get('field'),
+            start   = options.get('start'),
+            end     = options.get('end'),
+            query   = query,
+            reverse = options.get('order') == 'desc',
+            limit   = options.get('limit'),
+            cursor  = options.get('cursor')
+        )
+
+        if page is None: return json({ 'message' : 'Invalid `range`' }, status = ResponseCodes['BAD_REQUEST'].value)
 
         return json({
             'data' : {
-                'records' : records, 
+                'records' : page.get('records'),
+                'cursor'  : page.get('cursor'),
                 'message' : 'The records were successfully received from the database'
             }
         }, status = ResponseCodes['OK'].value)
 
+    @app.route('/moonlight/<database_id:int>/explain', methods = ['POST'])
+    @permission('Viewer')
+    @get_database_by_id
+    @required_fields('query')
+    async def moonlight_explain(request: Request, database: Moonlight) -> HTTPResponse:
+        plan: dict[str, Any] | None = await database.explain(request.json.get('query'), request.json.get('sort'))
+
+        if plan is None: return json({ 'message' : 'Invalid `query` or `sort`' }, status = ResponseCodes['BAD_REQUEST'].value)
+
+        return json({
+            'data' : {
+                'plan'    : plan,
+                'message' : 'The query plan was successfully built'
+            }
+        }, status = ResponseCodes['OK'].value)
+
+    @app.route('/moonlight/<database_id:int>/watch', methods = ['GET'])
+    @permission('Viewer')
+    @get_database_by_id
+    async def moonlight_watch(request: Request, database: Moonlight) -> HTTPResponse:
+        resume: str | None = request.args.get('generation') or request.headers.get('Last-Event-ID')
+
+        try:
+            query:      dict[str, Any] = json_module.loads(request.args.get('query') or '{}')
+            generation: int | None     = int(resume) if resume is not None else None
+
+            if not isinstance(query, dict) or (generation is not None and generation < 0): raise ValueError
+
+            compile_query(query)
+
+        except ValueError: return json({ 'message' : '`query` must be a valid query in json format and `generation` a non-negative integer' }, status = ResponseCodes['BAD_REQUEST'].value)
+
+        response: Any = await request.respond(status = ResponseCodes['OK'].value, content_type = 'text/event-stream', headers = { 'Cache-Control' : 'no-cache' })
+
+        await response.send(b': watching\n\n')
+
+        heartbeat: float = app_data.get('api').get('watch_heartbeat')
+
+        async with aclosing(database.watch(query, generation)) as changes:
+            while True:
+                waiting: asyncio.Task = asyncio.ensure_future(anext(changes, None))
+
+                try:
+                    while not (await asyncio.wait({ waiting }, timeout = heartbeat))[0]: await response.send(b': keep-alive\n\n')
+
+                finally:
+                    waiting.cancel()
+
+                    await asyncio.wait({ waiting })
+
+                change: dict[str, Any] | None = waiting.result()
+
+                if change is None: break
+
+                await response.send(f'id: {change.get("generation")}\nevent: {change.get("op")}\ndata: '.encode() + json_lines.dumps(change) + b'\n\n')
+
     @app.route('/moonlight/<database_id:int>/update', methods = ['POST'])
     @permission('Editor')
     @get_database_by_id
@@ -137,7 +280,9 @@ def create_application() -> Sanic:
     async def moonlight_update(request: Request, database: Moonlight) -> HTTPResponse:
         query: dict[str, Any] = request.json.get('query')
 
-        record_id: int = await database.update(query)
+        if not check_ttl(request.json.get('ttl')): return json({ 'message' : '`ttl` must be a positive number of seconds' }, status = ResponseCodes['BAD_REQUEST'].value)
+
+        record_id: int = await database.update(query, request.json.get('ttl'))
 
         return json({
             'data' : {
@@ -166,7 +311,7 @@ def create_application() -> Sanic:
     @permission('Administrator')
     @get_database_by_id
     async def moonlight_drop(request: Request, database: Moonlight) -> HTTPResponse:
-        await database.drop()
+        await registry.drop(database)
 
         return json({
             'data' : {
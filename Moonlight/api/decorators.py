@@ -2,8 +2,8 @@ from sanic.response import json
 from functools      import wraps
 
 from Moonlight.api.response_codes import ResponseCodes
-from Moonlight.config.config      import app_data, config
-from Moonlight.core.moonlight     import Moonlight
+from Moonlight.config.config      import app_data
+from Moonlight.api.registry       import registry
 
 access_hierarchy: dict[str, int] = app_data.get('access_hierarchy')
 
@@ -73,10 +73,9 @@ def required_arguments(*arguments):
 def get_database_by_id(func):
     @wraps(func)
     async def decorated_function(request, database_id, *args, **kwargs):
-        existed_database = next((database for database in config.get('databases') if database.get('id') == database_id), None)
-        
-        if not existed_database: return json({ 'message': 'Database not found' }, status = ResponseCodes['NOT_FOUND'].value)
-        
-        return await func(request, Moonlight(existed_database.get('name')), *args, **kwargs)
+        async with registry.use(database_id) as database:
+            if not database: return json({ 'message': 'Database not found' }, status = ResponseCodes['NOT_FOUND'].value)
+
+            return await func(request, database, *args, **kwargs)
         
     return decorated_function
\ No newline at end of file
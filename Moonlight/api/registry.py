@@ -0,0 +1,117 @@
+from contextlib import asynccontextmanager
+from typing     import Any, AsyncIterator
+
+import asyncio
+import time
+
+from Moonlight.config.config  import config, app_data
+from Moonlight.core.moonlight import Moonlight
+
+
+class Registry:
+    '''Open database handles of the process by database id, a handle is opened on its first request and closed after it was idle for a while'''
+    def __init__(self, idle_timeout: float) -> None:
+        '''
+        arguments
+            - idle_timeout (float) <- seconds a handle stays open after its last request finished
+        '''
+        self.idle_timeout: float = idle_timeout
+
+        self.__handles: dict[int, Moonlight] = {}
+        self.__used:    dict[int, float]     = {}
+        self.__busy:    dict[int, int]       = {}
+        self.__evictor: asyncio.Task | None  = None
+
+    @asynccontextmanager
+    async def use(self, database_id: int) -> AsyncIterator[Moonlight | None]:
+        '''
+        `Holds the handle of the database for a request, the handle is not evicted until the request finishes`
+
+        @yields {database: Moonlight | None} <- None if there is no database with the id
+        '''
+        database: Moonlight | None = self.__open(database_id)
+
+        if database is None:
+            yield None
+            return
+
+        self.__busy[database_id] = self.__busy.get(database_id, 0) + 1
+
+        try: yield database
+
+        finally:
+            if database_id in self.__busy:    self.__busy[database_id] -= 1
+            if database_id in self.__handles: self.__used[database_id]  = time.monotonic()
+
+    def add(self, database: Moonlight) -> None:
+        '''`Keeps a handle opened elsewhere (a database that was just created), so its first request does not open another one`'''
+        if database.database_id in self.__handles: return None
+
+        self.__handles[database.database_id] = database
+        self.__used[database.database_id]    = time.monotonic()
+
+        self.__start_evictor()
+
+    async def drop(self, database: Moonlight) -> None:
+        '''`Drops the database and forgets its handle`'''
+        self.__forget(database.database_id)
+
+        await database.drop()
+
+    async def close(self) -> None:
+        '''`Closes all handles, called when the server stops`'''
+        if self.__evictor is not None: self.__evictor.cancel()
+
+        for database_id in list(self.__handles): await self.__close(database_id)
+
+    def __open(self, database_id: int) -> Moonlight | None:
+        '''`Returns the handle of the database, opening it if needed, the config is checked every time so a handle of a deleted database is forgotten`'''
+        existed_database: dict[str, Any] | None = next((database for database in config.get('databases') if database.get('id') == database_id), None)
+
+        if not existed_database:
+            self.__forget(database_id)
+            return None
+
+        if database_id not in self.__handles: self.add(Moonlight(existed_database.get('name'), console_show = app_data.get('api').get('console_show')))
+
+        return self.__handles.get(database_id)
+
+    def __forget(self, database_id: int) -> None:
+        '''`Removes the handle from the registry without closing it`'''
+        self.__handles.pop(database_id, None)
+        self.__used.pop(database_id, None)
+        self.__busy.pop(database_id, None)
+
+    async def __close(self, database_id: int) -> None:
+        '''`Forgets the handle, then compacts the database and releases its log file`'''
+        database: Moonlight | None = self.__handles.get(database_id)
+
+        self.__forget(database_id)
+
+        if database is None: return None
+
+        await database.close()
+
+        database.logger.stop()
+
+    def __start_evictor(self) -> None:
+        '''`Starts evicting idle handles in the background unless it is running already`'''
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+
+        if self.__evictor is None or self.__evictor.done() or self.__evictor.get_loop() is not loop: self.__evictor = loop.create_task(self.__evict())
+
+    async def __evict(self) -> None:
+        '''`Closes the handles which were not used for the idle timeout, stops when no handles are left`'''
+        while self.__handles:
+            await asyncio.sleep(self.idle_timeout)
+
+            for database_id in list(self.__handles):
+                if self.__idle(database_id): await self.__close(database_id)
+
+    def __idle(self, database_id: int) -> bool:
+        '''`Checks if the handle is open, no request holds it and the last one finished the idle timeout ago`'''
+        if database_id not in self.__handles or self.__busy.get(database_id): return False
+
+        return time.monotonic() - self.__used.get(database_id) >= self.idle_timeout
+
+registry: Registry = Registry(app_data.get('api').get('idle_timeout'))
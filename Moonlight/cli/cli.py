@@ -221,6 +221,26 @@ def delete_database(username: str) -> None:
     
     console.print('\n' + t('success.database.deleted'), style = Style['SUCCESS'].value)
 
+@click.command()
+@auth_cli('administrator')
+def compact_database(username: str) -> None:
+    databases: list[dict] = config.get('databases')
+
+    if len(databases) == 0:
+        console.print('\n' + t('errors.database.no_one'), style = Style['ERROR'].value)
+        return
+
+    database_name = prompt({
+        'type'    : 'list',
+        'message' : t('prompt.select.database'),
+        'choices' : [database.get('name') for database in databases],
+        'name'    : 'database_name'
+    }).get('database_name')
+
+    asyncio.run(Moonlight(database_name).compact())
+
+    console.print('\n' + t('success.database.compacted'), style = Style['SUCCESS'].value)
+
 @click.command()
 def databases() -> None:
     databases: list[dict] = config.get('databases')
@@ -306,6 +326,7 @@ cli.add_command(create_user)
 cli.add_command(delete_user)
 cli.add_command(create_database)
 cli.add_command(delete_database)
+cli.add_command(compact_database)
 cli.add_command(databases)
 cli.add_command(database)
 cli.add_command(create_key)
@@ -1,43 +1,134 @@
 from Moonlight.config.paths import conf_path, data_path
+from Moonlight.core.tools   import write_atomic
+from Moonlight.core.locks   import FileReadWriteLock
 
+import multiprocessing
+import threading
+import atexit
 import json
+import time
 import os
 
 def init_config(path: str, initial_data: dict[str, any], skip: bool = False) -> dict[str, any]:
-    if os.path.exists(path) and not skip: 
-        with open(path, 'r', encoding = 'utf-8') as config_file: 
+    '''Reads the config file, a missing one is created with the initial data, but not on import in a `multiprocessing` child (a worker of sharded scans) started in another directory'''
+    if os.path.exists(path) and not skip:
+        with open(path, 'r', encoding = 'utf-8') as config_file:
             return json.load(config_file)
 
-    with open(path, 'w', encoding = 'utf-8') as config_file:
-        json.dump(initial_data, config_file, indent = 4)
+    if multiprocessing.current_process().name != 'MainProcess' and not skip: return initial_data
+
+    write_atomic(path, json.dumps(initial_data, indent = 4).encode())
 
     return initial_data
 
+def get_stamp(path: str) -> tuple[int, ...] | None:
+    '''Returns the state of the file used to detect changes made by other processes'''
+    try:            stat: os.stat_result = os.stat(path)
+    except OSError: return None
+
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
 class Config:
-    def __init__(self, path: str, initial_data: dict[str, any] = {}) -> None:
+    '''
+    Settings kept in a json-file. Changes are applied in memory at once and written together a moment later (`write_delay`),
+    a write replays them on the file as it is on disk at that time, so changes of other processes (workers of the server) are not lost.
+    The file is read again when it was changed by another process, this is checked at most every `check_interval` seconds (never without it).
+    '''
+    def __init__(self, path: str, initial_data: dict[str, any] = {}, write_delay: float = 0, check_interval: float | None = None) -> None:
         self.path = path
 
+        self.write_delay:    float        = write_delay
+        self.check_interval: float | None = check_interval
+
         self.config = init_config(self.path, initial_data)
 
-    def get(self, tab: str) -> any: return self.config.get(tab)
+        self.__stamp:   tuple[int, ...] | None  = get_stamp(self.path)
+        self.__checked: float                   = time.monotonic()
+        self.__pending: list[tuple[str, tuple]] = []
+        self.__timer:   threading.Timer | None  = None
+        self.__lock:    threading.RLock         = threading.RLock()
+        self.__file:    FileReadWriteLock       = FileReadWriteLock(f'{path}.lock')
+
+        atexit.register(self.flush)
 
-    def set(self, tab: str, value: str) -> None:
-        self.config[tab] = value
+    def get(self, tab: str) -> any:
+        self.__reload()
 
-        with open(self.path, 'w', encoding = 'utf-8') as config_file: json.dump(self.config, config_file, indent = 4)
+        return self.config.get(tab)
 
-    def push(self, tab: str, value: str) -> None:
-        array: list[any] = self.config.get(tab)
+    def set(self, tab: str, value: str) -> None: self.__change('set', tab, value)
 
-        array.append(value)
+    def push(self, tab: str, value: str) -> None: self.__change('push', tab, value)
 
-        self.set(tab, array)
-    
-    def delete(self, tab: str, key: str, value: str) -> None:
-        self.set(tab, [element for element in self.config.get(tab) if element.get(key) != value])
+    def delete(self, tab: str, key: str, value: str) -> None: self.__change('delete', tab, key, value)
 
     def reinit(self, initial_data: dict[str, any]) -> None:
-        self.config = init_config(self.path, initial_data, skip = True)
+        with self.__lock, self.__file.exclusive():
+            self.__cancel()
+
+            self.__pending = []
+            self.config    = init_config(self.path, initial_data, skip = True)
+            self.__stamp   = get_stamp(self.path)
+
+    def flush(self) -> None:
+        '''Writes the pending changes to the file now'''
+        with self.__lock:
+            self.__cancel()
+
+            if not self.__pending: return None
+
+            with self.__file.exclusive():
+                if get_stamp(self.path) != self.__stamp: self.__read()
+
+                write_atomic(self.path, json.dumps(self.config, indent = 4).encode())
+
+                self.__stamp   = get_stamp(self.path)
+                self.__pending = []
+
+    def __change(self, *change: any) -> None:
+        '''Applies the change in memory and writes it with the other changes made until the write delay passes'''
+        with self.__lock:
+            self.__apply(self.config, change)
+            self.__pending.append(change)
+
+            if not self.write_delay: return self.flush()
+
+            if self.__timer is None:
+                self.__timer        = threading.Timer(self.write_delay, self.flush)
+                self.__timer.daemon = True
+                self.__timer.start()
+
+    def __apply(self, data: dict[str, any], change: tuple) -> None:
+        match change:
+            case ('set',    tab, value):      data[tab] = value
+            case ('push',   tab, value):      data[tab] = [*(data.get(tab) or []), value]
+            case ('delete', tab, key, value): data[tab] = [element for element in data.get(tab) or [] if element.get(key) != value]
+
+    def __read(self) -> None:
+        '''Reads the file changed by another process and replays the pending changes on it (lock must be held)'''
+        with open(self.path, 'r', encoding = 'utf-8') as config_file: data: dict[str, any] = json.load(config_file)
+
+        for change in self.__pending: self.__apply(data, change)
+
+        self.config  = data
+        self.__stamp = get_stamp(self.path)
+
+    def __reload(self) -> None:
+        '''Reads the file again if another process changed it, at most every check interval'''
+        if self.check_interval is None or time.monotonic() - self.__checked < self.check_interval: return None
+
+        self.__checked = time.monotonic()
+
+        if get_stamp(self.path) == self.__stamp: return None
+
+        with self.__lock:
+            try:                          self.__read()
+            except (OSError, ValueError): pass
+
+    def __cancel(self) -> None:
+        if self.__timer is not None: self.__timer.cancel()
+
+        self.__timer = None
 
 app_data = Config(data_path)
-config   = Config(conf_path, app_data.get('base_config'))
\ No newline at end of file
+config   = Config(conf_path, app_data.get('base_config'), app_data.get('config').get('write_delay'), app_data.get('config').get('check_interval'))
@@ -11,8 +11,9 @@ databases_path: str = join(exec_path, 'databases')
 logging_path:   str = join(exec_path, 'logs')
 locales_path:   str = join(head_path, 'locales')
 
-conf_path: str = join(exec_path, 'config.json')
-data_path: str = join(head_path, 'sources', 'app_data.json')
+conf_path:   str = join(exec_path, 'config.json')
+tokens_path: str = join(exec_path, 'tokens.json')
+data_path:   str = join(head_path, 'sources', 'app_data.json')
 
 docs_moonlight_path: str = join(head_path, 'sources', 'moonlight_api_documentation.md')
 
@@ -20,6 +21,18 @@ def make_database_path(filename: str) -> str:
     '''Creates the full path to the database file based on the file name'''
     return join(databases_path, add_ext(get_filename_from_path(filename), '.json'))
 
+def make_journal_path(filename: str) -> str:
+    '''Creates the full path to the database journal file based on the file name'''
+    return join(databases_path, add_ext(get_filename_from_path(filename), '.journal'))
+
+def make_offsets_path(filename: str) -> str:
+    '''Creates the full path to the record offsets table of the database file based on the file name'''
+    return join(databases_path, add_ext(get_filename_from_path(filename), '.offsets'))
+
+def make_columns_path(filename: str) -> str:
+    '''Creates the full path to the columnar copy of the database file based on the file name'''
+    return join(databases_path, add_ext(get_filename_from_path(filename), '.columns'))
+
 def make_logging_path(filename: str) -> str:
     '''Creates the full path to the logging file based on the file name.'''    
     return join(logging_path, add_ext(get_filename_from_path(filename), '.log'))
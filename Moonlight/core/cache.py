@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from typing      import Any, Hashable
+
+import threading
+import json
+import time
+
+from Moonlight.core.dataset import copy_record
+
+
+class ResultCache:
+    '''
+    Results of recent reads of a database kept in least recently used order, every result remembers the version of the database it was read at
+
+    A result is copied when it is kept and every time it is returned, so callers changing their objects do not change the kept result.
+    '''
+    def __init__(self, max_entries: int, max_records: int) -> None:
+        '''
+        arguments
+            - max_entries (int) <- count of results kept, the least recently used one is dropped first
+            - max_records (int) <- count of objects in all kept results together, a larger result is not kept at all
+        '''
+        self.max_entries: int = max(0, max_entries)
+        self.max_records: int = max(0, max_records)
+
+        self.__entries: OrderedDict[Hashable, tuple[Hashable, float | None, list[Any]]] = OrderedDict()
+        self.__records: int                                                             = 0
+        self.__lock:    threading.Lock                                                  = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable) -> list[Any] | None:
+        '''
+        `Returns the result read at the given version of the database`
+
+        @returns {result: list | None} <- copy of the result, None if there is no such result, it was read at another version or one of its objects has expired since
+        '''
+        with self.__lock:
+            entry: tuple[Hashable, float | None, list[Any]] | None = self.__entries.get(key)
+
+            if entry is None: return None
+
+            if entry[0] != version or (entry[1] is not None and entry[1] <= time.time()):
+                self.__remove(key)
+                return None
+
+            self.__entries.move_to_end(key)
+
+        return copy_record(entry[2])
+
+    def put(self, key: Hashable, version: Hashable, result: list[Any], expires: float | None = None) -> None:
+        '''
+        `Keeps the result read at the given version of the database`
+
+        arguments
+            - key     (hashable) <- normalized read the result belongs to, see `make_key`
+            - version (hashable) <- version of the database taken before the read, so a write made during the read makes the result stale
+            - result  (list)     <- objects of the result, a copy of them is kept
+            - expires (float)    <- moment the first of its objects expires at, the result is stale from then on
+        '''
+        if len(result) > self.max_records or not self.max_entries: return None
+
+        result = copy_record(result)
+
+        with self.__lock:
+            if key in self.__entries: self.__remove(key)
+
+            self.__entries[key]  = (version, expires, result)
+            self.__records      += len(result)
+
+            while len(self.__entries) > self.max_entries or self.__records > self.max_records: self.__remove(next(iter(self.__entries)))
+
+    def clear(self) -> None:
+        '''`Forgets all results`'''
+        with self.__lock:
+            self.__entries.clear()
+            self.__records = 0
+
+    def __remove(self, key: Hashable) -> None:
+        '''`Drops the result (lock must be held)`'''
+        self.__records -= len(self.__entries.pop(key)[2])
+
+def make_key(*parts: Any) -> str | None:
+    '''Returns the same key for reads with equal arguments whatever the order of the fields of their queries, None if they can not be compared'''
+    try:                            return json.dumps(parts, sort_keys = True, ensure_ascii = False, separators = (',', ':'))
+    except (TypeError, ValueError): return None
+
+caches:      dict[str, ResultCache] = {}
+caches_lock: threading.Lock         = threading.Lock()
+
+def get_cache(path: str, max_entries: int, max_records: int) -> ResultCache:
+    '''Returns the result cache of the database file, all handles of the file in this process share it'''
+    with caches_lock:
+        if path not in caches: caches[path] = ResultCache(max_entries, max_records)
+
+        return caches.get(path)
@@ -0,0 +1,290 @@
+from typing import Any, Iterable
+from enum   import Enum
+
+import zipfile
+import json
+import io
+
+from Moonlight.core.query   import is_operator
+from Moonlight.core.tools   import write_atomic
+from Moonlight.core.dataset import EXPIRES
+
+try:                import numpy
+except ImportError: numpy = None
+
+
+class Aggregation(Enum):
+    COUNT: str = 'count'
+    SUM:   str = 'sum'
+    MIN:   str = 'min'
+    MAX:   str = 'max'
+    AVG:   str = 'avg'
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def aggregate(values: Iterable[Any], aggregation: Aggregation, partial: bool = False) -> Any:
+    '''Aggregates field values of records in Python, only numbers are summed, compared and averaged, a partial `avg` is a (sum, count) pair'''
+    values:  list[Any]         = list(values)
+    numbers: list[int | float] = [value for value in values if is_number(value)]
+
+    match aggregation:
+        case Aggregation.COUNT: return len(values)
+        case Aggregation.SUM:   return sum(numbers)
+        case Aggregation.MIN:   return min(numbers) if numbers else None
+        case Aggregation.MAX:   return max(numbers) if numbers else None
+        case Aggregation.AVG:   return (sum(numbers), len(numbers)) if partial else combine([(sum(numbers), len(numbers))], aggregation)
+
+def combine(results: list[Any], aggregation: Aggregation) -> Any:
+    '''Merges partial results of the aggregation computed over separate parts of the database'''
+    match aggregation:
+        case Aggregation.COUNT | Aggregation.SUM: return sum(results)
+        case Aggregation.MIN:                     return min((result for result in results if result is not None), default = None)
+        case Aggregation.MAX:                     return max((result for result in results if result is not None), default = None)
+
+        case Aggregation.AVG:
+            count: int = sum(count for _, count in results)
+
+            return sum(total for total, _ in results) / count if count else None
+
+
+class Column:
+    '''Typed array of one field with a bitmap of records where the field is set, strings are stored as codes of a dictionary'''
+    def __init__(self, kind: str, values: Any, present: Any, dictionary: list[str] | None = None) -> None:
+        '''
+        arguments
+            - kind       (str)       <- `int`, `float`, `bool`, `str`, `null` or `object` for fields that cannot be stored in an array
+            - values     (ndarray)   <- value of every record, None for `null` and `object` columns
+            - present    (ndarray)   <- True for records where the field is set and is not None
+            - dictionary (list[str]) <- strings by their codes for `str` columns
+        '''
+        self.kind:       str              = kind
+        self.values:     Any              = values
+        self.present:    Any              = present
+        self.dictionary: list[str] | None = dictionary
+
+        self.__codes: dict[str, int] = { value: code for code, value in enumerate(dictionary or []) }
+
+    @classmethod
+    def build(cls, values: list[Any]) -> 'Column':
+        present: Any = numpy.array([value is not None for value in values], dtype = bool)
+        kinds:   set = { 'bool' if isinstance(value, bool) else type(value).__name__ for value in values if value is not None }
+
+        if not kinds: return cls('null', None, present)
+
+        try:
+            if kinds == { 'int' }:          return cls('int',   numpy.array([value or 0 for value in values], dtype = numpy.int64), present)
+            if kinds <= { 'int', 'float' }: return cls('float', numpy.array([value or 0 for value in values], dtype = numpy.float64), present)
+
+        except OverflowError: return cls('object', None, present)
+
+        if kinds == { 'bool' }: return cls('bool', numpy.array([bool(value) for value in values], dtype = bool), present)
+
+        if kinds == { 'str' }:
+            codes: dict[str, int] = {}
+
+            return cls('str', numpy.array([codes.setdefault(value, len(codes)) if value is not None else -1 for value in values], dtype = numpy.int32), present, list(codes))
+
+        return cls('object', None, present)
+
+    def equals(self, value: Any) -> Any:
+        '''`Returns the mask of records whose field is equal to the value, None if the column cannot be compared`'''
+        if value is None:         return ~self.present
+        if self.kind == 'object': return None
+
+        nothing: Any = numpy.zeros(len(self.present), dtype = bool)
+
+        match self.kind:
+            case 'int' | 'float' | 'bool' if isinstance(value, (int, float)):
+                try:                  return self.present & (self.values == value)
+                except OverflowError: return nothing
+
+            case 'str' if isinstance(value, str):
+                code: int | None = self.__codes.get(value)
+
+                return self.present & (self.values == code) if code is not None else nothing
+
+        return nothing
+
+    def decode(self, value: Any) -> Any:
+        '''`Converts an array value back to the value of the record`'''
+        if self.kind == 'str': return self.dictionary[value]
+
+        return value.item()
+
+
+class Columns:
+    '''Columnar copy of the database used by vectorized scans and aggregations, requires numpy'''
+    def __init__(self, ids: Any, columns: dict[str, Column], stamp: tuple[int, ...]) -> None:
+        '''
+        arguments
+            - ids     (ndarray)            <- primary keys of the records in the order of the database
+            - columns (dict[str, Column])  <- column of every field
+            - stamp   (tuple[int, ...])    <- state of the database files the columns were built from
+        '''
+        self.ids:     Any               = ids
+        self.columns: dict[str, Column] = columns
+        self.stamp:   tuple[int, ...]   = stamp
+
+    def __len__(self) -> int: return len(self.ids)
+
+    @classmethod
+    def build(cls, records: Iterable[dict[str, Any]], primary_key: str, stamp: tuple[int, ...]) -> 'Columns | None':
+        '''`Builds the columns of the records, None if the primary keys are not integers`'''
+        records: list[dict[str, Any]] = list(records)
+        fields:  dict[str, None]       = {}
+
+        for record in records: fields.update(dict.fromkeys(record))
+
+        columns: dict[str, Column] = { field: Column.build([record.get(field) for record in records]) for field in fields }
+        ids:     Column | None     = columns.get(primary_key)
+
+        if records and (ids is None or ids.kind != 'int' or not ids.present.all()): return None
+
+        return cls(ids.values if records else numpy.zeros(0, dtype = numpy.int64), columns, stamp)
+
+    @classmethod
+    def load(cls, path: str, stamp: tuple[int, ...]) -> 'Columns | None':
+        '''`Reads the columns file, None if it is missing, damaged or was built from another state of the database`'''
+        try:
+            with numpy.load(path) as arrays:
+                meta: dict[str, Any] = json.loads(arrays['meta'].tobytes())
+
+                if tuple(meta.get('stamp')) != stamp: return None
+
+                columns: dict[str, Column] = {
+                    field.get('name') : Column(
+                        field.get('kind'),
+                        arrays[f'{position}.values'] if f'{position}.values' in arrays else None,
+                        arrays[f'{position}.present'],
+                        field.get('dictionary')
+                    ) for position, field in enumerate(meta.get('fields'))
+                }
+
+                return cls(arrays['ids'], columns, stamp)
+
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile): return None
+
+    def save(self, path: str) -> None:
+        '''`Writes the columns to a binary file, the file is replaced at once so readers never see it half-written`'''
+        arrays: dict[str, Any] = { 'ids' : self.ids }
+        fields: list[dict]     = []
+
+        for position, (name, column) in enumerate(self.columns.items()):
+            fields.append({ 'name' : name, 'kind' : column.kind, 'dictionary' : column.dictionary })
+
+            arrays[f'{position}.present'] = column.present
+
+            if column.values is not None: arrays[f'{position}.values'] = column.values
+
+        arrays['meta'] = numpy.frombuffer(json.dumps({ 'stamp' : self.stamp, 'fields' : fields }, ensure_ascii = False).encode('utf-8'), dtype = numpy.uint8)
+
+        buffer: io.BytesIO = io.BytesIO()
+
+        numpy.savez(buffer, **arrays)
+
+        write_atomic(path, buffer.getvalue())
+
+    def mask(self, query: dict[str, Any] | None) -> Any:
+        '''`Returns the mask of records matching all key-value pairs of the query, None if it cannot be evaluated on columns (operators, nested paths)`'''
+        mask: Any = numpy.ones(len(self.ids), dtype = bool)
+
+        for key, value in (query or {}).items():
+            if is_operator(value) or ('.' in key and key not in self.columns): return None
+
+            column: Column | None = self.columns.get(key)
+
+            if column is None:
+                if value is not None: return numpy.zeros(len(self.ids), dtype = bool)
+                continue
+
+            try:              matches: Any = column.equals(value)
+            except TypeError: return None
+
+            if matches is None: return None
+
+            mask &= matches
+
+        return mask
+
+    def alive(self, now: float) -> Any:
+        '''`Returns the mask of records that have not expired by the given moment`'''
+        column: Column | None = self.columns.get(EXPIRES)
+
+        if column is None or column.kind not in ('int', 'float'): return numpy.ones(len(self.ids), dtype = bool)
+
+        return ~(column.present & (column.values <= now))
+
+    def supports(self, *fields: str | None) -> bool:
+        '''`Checks if the fields can be aggregated on columns`'''
+        return all(field not in self.columns or self.columns[field].kind != 'object' for field in fields if field is not None)
+
+    def aggregate(self, aggregation: Aggregation, field: str, mask: Any, partial: bool = False) -> Any:
+        '''`Aggregates the field over the records of the mask`'''
+        if aggregation is Aggregation.COUNT: return int(mask.sum())
+
+        column: Column | None = self.columns.get(field)
+
+        values: Any = column.values[mask & column.present] if column is not None and column.kind in ('int', 'float') else numpy.zeros(0)
+
+        if aggregation is Aggregation.AVG and partial: return (values.sum().item() if values.size else 0, int(values.size))
+
+        if not values.size: return 0 if aggregation is Aggregation.SUM else None
+
+        match aggregation:
+            case Aggregation.SUM: return values.sum().item()
+            case Aggregation.MIN: return values.min().item()
+            case Aggregation.MAX: return values.max().item()
+            case Aggregation.AVG: return values.mean().item()
+
+    def group_by(self, key: str, aggregation: Aggregation, field: str | None, mask: Any, partial: bool = False) -> dict[Any, Any]:
+        '''`Aggregates the field over the records of the mask grouped by the value of the key field`'''
+        groups: dict[Any, Any] = {}
+        column: Column | None  = self.columns.get(key)
+
+        if column is None: return { None : self.aggregate(aggregation, field, mask, partial) } if mask.any() else {}
+
+        present: Any = mask & column.present
+        missing: Any = mask & ~column.present
+
+        if present.any():
+            uniques, inverse = numpy.unique(column.values[present], return_inverse = True)
+
+            groups.update(zip((column.decode(value) for value in uniques), self.__aggregate_groups(aggregation, field, present, inverse, len(uniques), partial)))
+
+        if missing.any(): groups[None] = self.aggregate(aggregation, field, missing, partial)
+
+        return groups
+
+    def __aggregate_groups(self, aggregation: Aggregation, field: str | None, rows: Any, inverse: Any, size: int, partial: bool) -> list[Any]:
+        if aggregation is Aggregation.COUNT: return numpy.bincount(inverse, minlength = size).tolist()
+
+        column: Column | None = self.columns.get(field)
+
+        if column is None or column.kind not in ('int', 'float'):
+            if aggregation is Aggregation.AVG and partial: return [(0, 0)] * size
+
+            return [0 if aggregation is Aggregation.SUM else None] * size
+
+        numeric: Any = column.present[rows]
+        groups:  Any = inverse[numeric]
+        values:  Any = column.values[rows][numeric]
+        counts:  Any = numpy.bincount(groups, minlength = size)
+
+        match aggregation:
+            case Aggregation.SUM | Aggregation.AVG:
+                totals: Any = numpy.zeros(size, dtype = values.dtype)
+                numpy.add.at(totals, groups, values)
+
+                if aggregation is Aggregation.SUM: return totals.tolist()
+                if partial:                        return list(zip(totals.tolist(), counts.tolist()))
+
+                return [total / count if count else None for total, count in zip(totals.tolist(), counts.tolist())]
+
+            case Aggregation.MIN | Aggregation.MAX:
+                bounds:  tuple = (numpy.inf, -numpy.inf) if values.dtype.kind == 'f' else (numpy.iinfo(values.dtype).max, numpy.iinfo(values.dtype).min)
+                results: Any   = numpy.full(size, bounds[0] if aggregation is Aggregation.MIN else bounds[1], dtype = values.dtype)
+
+                (numpy.minimum if aggregation is Aggregation.MIN else numpy.maximum).at(results, groups, values)
+
+                return [result if count else None for result, count in zip(results.tolist(), counts.tolist())]
@@ -0,0 +1,413 @@
+from bisect import bisect_left, bisect_right, insort
+from heapq  import heapify, heappop, heappush
+from typing import Any, Iterator
+
+OrderKey = tuple[int, Any, Any]
+
+EXPIRES: str = '_expires'
+
+def order_key(value: Any) -> tuple[int, Any] | None:
+    '''Returns the sort key of the value for ordered indexes, numbers go before strings, other values are not ordered'''
+    if isinstance(value, (int, float)): return (0, value)
+    if isinstance(value, str):          return (1, value)
+
+    return None
+
+def expiry(record: dict[str, Any]) -> float | None:
+    '''Returns the moment the record expires at in seconds since the epoch, None if it does not expire'''
+    value: Any = record.get(EXPIRES)
+
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+def is_expired(record: dict[str, Any], now: float) -> bool:
+    '''Checks if the record has expired by the given moment'''
+    return EXPIRES in record and (expires := expiry(record)) is not None and expires <= now
+
+def copy_record(value: Any) -> Any:
+    '''Returns a copy of the record with its nested objects and lists copied too, the other values can not be changed in place and are shared'''
+    if isinstance(value, dict): return { key: copy_record(item) for key, item in value.items() }
+    if isinstance(value, list): return [copy_record(item) for item in value]
+
+    return value
+
+
+class Dataset:
+    '''In-memory database records kept in insertion order and addressed by primary key'''
+    def __init__(self, database_data: dict[str, Any], primary_key: str) -> None:
+        '''
+        arguments
+            - database_data (dict[str, any]) <- parsed database file
+            - primary_key   (str)            <- name of the primary key field
+        '''
+        self.primary_key: str = primary_key
+
+        self.meta:    dict[str, Any]            = { key: value for key, value in database_data.items() if key != 'data' }
+        self.records: dict[Any, dict[str, Any]] = { record.get(primary_key): record for record in database_data.get('data', []) }
+
+        self.__postings: dict[str, dict[Any, set]] = {}
+        self.__ordered:  dict[str, list[OrderKey]] = {}
+        self.__sequence: dict[Any, int] | None     = None
+        self.__counter:  int                       = 0
+        self.__in_order: bool | None               = None
+        self.__ids:      list[Any] | None          = None
+        self.__expiry:   list[tuple] | None        = None
+
+    def __len__(self) -> int:                       return len(self.records)
+    def __iter__(self) -> Iterator[dict[str, Any]]: return iter(self.records.values())
+    def __contains__(self, id: Any) -> bool:        return id in self.records
+
+    @property
+    def indexes(self) -> list[str]:
+        '''`Fields with a declared equality index`'''
+        return self.meta.get('indexes', [])
+
+    @property
+    def ordered_indexes(self) -> list[str]:
+        '''`Fields with a declared ordered index`'''
+        return self.meta.get('ordered_indexes', [])
+
+    @property
+    def ids_in_order(self) -> bool:
+        '''`Integer primary keys grow in the order of the records, as generated ids do, so the records are sorted by the primary key`'''
+        if self.__in_order is None:
+            identifiers: list[Any] = list(self.records)
+
+            self.__in_order = all(type(id) is int for id in identifiers) and all(previous < id for previous, id in zip(identifiers, identifiers[1:]))
+
+        return self.__in_order
+
+    def get(self, id: Any) -> dict[str, Any] | None:
+        '''`Returns the record with the given primary key`'''
+        return self.records.get(id)
+
+    def push(self, record: dict[str, Any]) -> None:
+        '''`Adds the record to the end of the dataset`'''
+        if self.__in_order and record.get(self.primary_key) not in self.records:
+            last: Any = next(reversed(self.records), None)
+
+            self.__in_order = type(record.get(self.primary_key)) is int and (last is None or last < record.get(self.primary_key))
+
+        if self.__ids is not None and record.get(self.primary_key) not in self.records:
+            if self.__in_order: self.__ids.append(record.get(self.primary_key))
+            else:               self.__ids = None
+
+        self.records[record.get(self.primary_key)] = record
+
+        if self.__sequence is not None: self.__sequence[record.get(self.primary_key)] = self.__next_sequence()
+
+        self.__index(record)
+        self.__schedule(record)
+
+    def update(self, record: dict[str, Any]) -> dict[str, Any] | None:
+        '''`Replaces the record with the same primary key by a copy with the fields merged in, returns the updated record`'''
+        existed_record: dict[str, Any] | None = self.records.get(record.get(self.primary_key))
+
+        if existed_record is None: return None
+
+        self.__unindex(existed_record)
+
+        updated_record: dict[str, Any] = { **existed_record, **record }
+
+        self.records[record.get(self.primary_key)] = updated_record
+
+        self.__index(updated_record)
+
+        if expiry(updated_record) != expiry(existed_record): self.__schedule(updated_record)
+
+        return updated_record
+
+    def delete(self, id: Any) -> dict[str, Any] | None:
+        '''`Removes the record with the given primary key, returns the removed record`'''
+        deleted_record: dict[str, Any] | None = self.records.pop(id, None)
+
+        if deleted_record is None: return None
+
+        if self.__sequence is not None: self.__sequence.pop(id, None)
+
+        self.__ids = None
+
+        self.__unindex(deleted_record)
+
+        return deleted_record
+
+    def create_index(self, field: str, ordered: bool = False) -> None:
+        '''`Declares an equality or ordered index on the field`'''
+        kind: str = 'ordered_indexes' if ordered else 'indexes'
+
+        if field in self.meta.get(kind, []) or (field == self.primary_key and not ordered): return None
+
+        self.meta[kind] = [*self.meta.get(kind, []), field]
+
+    def drop_index(self, field: str) -> None:
+        '''`Removes equality and ordered indexes from the field`'''
+        for kind in ('indexes', 'ordered_indexes'):
+            if field not in self.meta.get(kind, []): continue
+
+            self.meta[kind] = [index for index in self.meta.get(kind) if index != field]
+
+            if not self.meta[kind]: self.meta.pop(kind)
+
+        self.__postings.pop(field, None)
+        self.__ordered.pop(field, None)
+
+    def built(self, field: str, ordered: bool = False) -> bool:
+        '''`Whether the postings or the ordered entries of the field are built already, so using the index costs no pass over the records`'''
+        return field in (self.__ordered if ordered else self.__postings)
+
+    def lookup(self, conditions: dict[str, list[Any]]) -> list[dict[str, Any]] | None:
+        '''
+        `Returns the records whose indexed fields have one of the accepted values by intersecting index postings`
+
+        Only the indexed fields are checked, the caller still has to match the rest of the query.
+
+        arguments
+            - conditions (dict[str, list[any]]) <- accepted values of every field
+
+        @returns {records: list[dict[str, any]] | None} <- None if no index can be used for the conditions
+        '''
+        postings: list[set] = []
+
+        for key, values in conditions.items():
+            if key not in self.indexes: continue
+
+            try:              postings.append(set().union(*(self.__get_postings(key).get(value, ()) for value in values)))
+            except TypeError: continue
+
+        if not postings: return None
+
+        postings.sort(key = len)
+
+        identifiers: set = postings[0].intersection(*postings[1:])
+
+        if self.__sequence is None: self.__sequence = { id: self.__next_sequence() for id in self.records }
+
+        return [self.records[id] for id in sorted(identifiers, key = self.__sequence.__getitem__)]
+
+    def range(self, field: str, start: Any = None, end: Any = None, reverse: bool = False, after: OrderKey | None = None) -> Iterator[tuple[OrderKey, dict[str, Any]]]:
+        '''
+        `Yields records whose field lies between start and end (inclusive) in the order of the field`
+
+        Records without an orderable value of the field are skipped. Without a declared ordered index the records are sorted for this call only,
+        primary keys growing in the order of the records are searched without sorting.
+
+        arguments
+            - field   (str)      <- name of the field
+            - start   (any)      <- lower bound, None for no bound
+            - end     (any)      <- upper bound, None for no bound
+            - reverse (bool)     <- iterate from the greatest value
+            - after   (OrderKey) <- key of the last record of the previous page
+
+        @returns {entries: Iterator[tuple[OrderKey, dict[str, any]]]}
+        '''
+        if field == self.primary_key and self.ids_in_order:
+            yield from self.__range_ids(start, end, reverse, after)
+            return
+
+        entries: list[OrderKey] = self.__get_ordered(field) if field in self.ordered_indexes else self.__build_ordered(field)
+
+        low:  int = 0
+        high: int = len(entries)
+
+        if start is not None: low  = bisect_left(entries, (*order_key(start),))
+        if end   is not None: high = bisect_right(entries, (*order_key(end), float('inf')))
+
+        if after is not None:
+            if reverse: high = min(high, bisect_left(entries, after))
+            else:       low  = max(low,  bisect_right(entries, after))
+
+        positions: range = range(high - 1, low - 1, -1) if reverse else range(low, high)
+
+        for position in positions:
+            key: OrderKey = entries[position]
+
+            yield key, self.records[key[2]]
+
+    def expired(self, now: float) -> tuple[list[Any], float | None]:
+        '''
+        `Finds the records expired by the given moment on the expiry heap`
+
+        The heap is only read, entries of changed and deleted records are skipped, so readers of a published dataset can call it.
+
+        @returns {expired: tuple[list[any], float | None]} <- primary keys of the expired records and the moment the next record expires at
+        '''
+        heap:        list[tuple]     = self.__get_expiry()
+        identifiers: dict[Any, None] = {}
+        upcoming:    float | None    = None
+        positions:   list[int]       = [0]
+
+        while positions:
+            position: int = positions.pop()
+
+            if position >= len(heap): continue
+
+            expires, _, id = heap[position]
+
+            if upcoming is not None and expires >= upcoming: continue
+
+            if self.__current(heap[position]):
+                if expires > now:
+                    upcoming = expires
+                    continue
+
+                identifiers[id] = None
+
+            positions.extend((2 * position + 1, 2 * position + 2))
+
+        return list(identifiers), upcoming
+
+    def prune_expiry(self) -> None:
+        '''`Drops entries of changed and deleted records from the top of the expiry heap (writers only)`'''
+        if self.__expiry is None: return None
+
+        while self.__expiry and not self.__current(self.__expiry[0]): heappop(self.__expiry)
+
+    def apply(self, entry: dict[str, Any]) -> None:
+        '''`Applies a journal entry, applying the same entry twice has no effect`'''
+        match entry.get('op'):
+            case 'push':
+                if entry.get('record').get(self.primary_key) not in self.records: self.push(entry.get('record'))
+
+            case 'update':       self.update(entry.get('record'))
+            case 'delete':       self.delete(entry.get('id'))
+            case 'create_index': self.create_index(entry.get('field'), entry.get('ordered', False))
+            case 'drop_index':   self.drop_index(entry.get('field'))
+
+    def copy(self) -> 'Dataset':
+        '''`Returns a copy sharing the records, records are replaced and never changed in place, so changes of the copy are not seen here`'''
+        dataset: Dataset = Dataset.__new__(Dataset)
+
+        dataset.primary_key = self.primary_key
+        dataset.meta        = dict(self.meta)
+        dataset.records     = dict(self.records)
+
+        dataset.__postings = { field: { value: set(identifiers) for value, identifiers in postings.items() } for field, postings in self.__postings.items() }
+        dataset.__ordered  = { field: list(entries) for field, entries in self.__ordered.items() }
+        dataset.__sequence = dict(self.__sequence) if self.__sequence is not None else None
+        dataset.__counter  = self.__counter
+        dataset.__in_order = self.__in_order
+        dataset.__ids      = list(self.__ids) if self.__ids is not None else None
+        dataset.__expiry   = list(self.__expiry) if self.__expiry is not None else None
+
+        return dataset
+
+    def dump(self) -> dict[str, Any]:
+        '''`Returns the dataset in the database file format`'''
+        return { **self.meta, 'data': list(self.records.values()) }
+
+    def __next_sequence(self) -> int:
+        self.__counter += 1
+
+        return self.__counter
+
+    def __get_postings(self, field: str) -> dict[Any, set]:
+        '''`Returns value -> primary keys mapping of the index, building it on first use`'''
+        if field not in self.__postings:
+            postings: dict[Any, set] = {}
+
+            for id, record in self.records.items():
+                try:              postings.setdefault(record.get(field), set()).add(id)
+                except TypeError: continue
+
+            self.__postings[field] = postings
+
+        return self.__postings[field]
+
+    def __get_ordered(self, field: str) -> list[OrderKey]:
+        '''`Returns sorted (rank, value, primary key) entries of the ordered index, building it on first use`'''
+        if field not in self.__ordered: self.__ordered[field] = self.__build_ordered(field)
+
+        return self.__ordered[field]
+
+    def __range_ids(self, start: Any, end: Any, reverse: bool, after: OrderKey | None) -> Iterator[tuple[OrderKey, dict[str, Any]]]:
+        '''`Binary search of the range on the primary keys in the order of the records, strings go after all numbers`'''
+        if self.__ids is None: self.__ids = list(self.records)
+
+        identifiers: list[int] = self.__ids
+
+        low:  int = 0
+        high: int = len(identifiers)
+
+        if start is not None: low  = bisect_left(identifiers, start)  if order_key(start)[0] == 0 else high
+        if end   is not None: high = bisect_right(identifiers, end)   if order_key(end)[0] == 0   else high
+
+        if after is not None and after[0] == 0:
+            if reverse: high = min(high, bisect_left(identifiers, after[2]))
+            else:       low  = max(low,  bisect_right(identifiers, after[2]))
+
+        elif after is not None and not reverse: low = high
+
+        positions: range = range(high - 1, low - 1, -1) if reverse else range(low, high)
+
+        for position in positions:
+            id: int = identifiers[position]
+
+            yield (0, id, id), self.records[id]
+
+    def __get_expiry(self) -> list[tuple]:
+        '''`Returns the min-heap of (expires, sequence, primary key) entries of expiring records, building it on first use`'''
+        if self.__expiry is None:
+            heap: list[tuple] = [(expires, self.__next_sequence(), id) for id, record in self.records.items() if EXPIRES in record and (expires := expiry(record)) is not None]
+
+            heapify(heap)
+
+            self.__expiry = heap
+
+        return self.__expiry
+
+    def __current(self, entry: tuple) -> bool:
+        '''`Checks that the heap entry still describes the record, its expiry is changed or it is deleted otherwise`'''
+        record: dict[str, Any] | None = self.records.get(entry[2])
+
+        return record is not None and expiry(record) == entry[0]
+
+    def __schedule(self, record: dict[str, Any]) -> None:
+        expires: float | None = expiry(record)
+
+        if self.__expiry is not None and expires is not None: heappush(self.__expiry, (expires, self.__next_sequence(), record.get(self.primary_key)))
+
+    def __build_ordered(self, field: str) -> list[OrderKey]:
+        return sorted((*key, id) for id, record in self.records.items() if (key := order_key(record.get(field))) is not None)
+
+    def __index(self, record: dict[str, Any]) -> None:
+        for field, postings in self.__postings.items():
+            try:              postings.setdefault(record.get(field), set()).add(record.get(self.primary_key))
+            except TypeError: continue
+
+        for field, entries in self.__ordered.items():
+            key: tuple[int, Any] | None = order_key(record.get(field))
+
+            if key is not None: insort(entries, (*key, record.get(self.primary_key)))
+
+    def __unindex(self, record: dict[str, Any]) -> None:
+        for field, entries in self.__ordered.items():
+            key: tuple[int, Any] | None = order_key(record.get(field))
+
+            if key is None: continue
+
+            position: int = bisect_left(entries, (*key, record.get(self.primary_key)))
+
+            if position < len(entries) and entries[position] == (*key, record.get(self.primary_key)): del entries[position]
+
+        for field, postings in self.__postings.items():
+            try:              identifiers: set | None = postings.get(record.get(field))
+            except TypeError: continue
+
+            if identifiers is None: continue
+
+            identifiers.discard(record.get(self.primary_key))
+
+            if not identifiers: postings.pop(record.get(field))
+
+
+class Snapshot:
+    '''Dataset published to readers with the state of the files it was read from, every new one gets the next generation number'''
+    def __init__(self, generation: int, stamp: tuple[int, ...], dataset: Dataset) -> None:
+        '''
+        arguments
+            - generation (int)             <- number of the snapshot, it grows with every change of the database
+            - stamp      (tuple[int, ...]) <- state of the database files the dataset matches
+            - dataset    (Dataset)         <- records of the snapshot, in snapshot storage it is never changed after it was published
+        '''
+        self.generation: int             = generation
+        self.stamp:      tuple[int, ...] = stamp
+        self.dataset:    Dataset         = dataset
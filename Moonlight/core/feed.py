@@ -0,0 +1,120 @@
+from collections import deque
+from itertools   import islice
+from typing      import Any, Hashable
+
+import threading
+import asyncio
+
+Change = tuple[str, Any, dict[str, Any] | None, dict[str, Any] | None]
+
+
+class ChangeFeed:
+    '''
+    Recent changes of a database in a ring buffer, every change gets the next generation and watchers read the changes after the generation they have seen
+
+    Changes made by other processes are not known one by one, the feed compares the state of the files with the one left by its last write
+    and publishes a `reset` change when they differ (see `check`).
+    '''
+    def __init__(self, size: int) -> None:
+        '''
+        arguments
+            - size (int) <- count of the latest changes kept, a watcher that fell further behind has to start over
+        '''
+        self.generation: int = 0
+
+        self.__events:  deque[tuple[dict[str, Any], dict[str, Any] | None]]     = deque(maxlen = max(1, size))
+        self.__waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.__stamps:  dict[str, Hashable]                                     = {}
+        self.__lock:    threading.Lock                                          = threading.Lock()
+
+    def publish(self, changes: list[Change]) -> None:
+        '''
+        `Adds the changes to the buffer and wakes the watchers, can be called from any thread`
+
+        arguments
+            - changes (list) <- (`push` | `update` | `delete`, id, new object or None, object the watchers match their query against) tuples
+        '''
+        if not changes: return
+
+        with self.__lock:
+            for op, id, record, subject in changes:
+                self.generation += 1
+                self.__events.append(({ 'op' : op, 'id' : id, 'record' : record, 'generation' : self.generation }, subject))
+
+            waiters, self.__waiters = self.__waiters, []
+
+        notify(waiters)
+
+    def written(self, path: str, stamp: Hashable) -> None:
+        '''`Remembers the state the database file was left in by a write of this process (file lock must be held)`'''
+        with self.__lock: self.__stamps[path] = stamp
+
+    def check(self, path: str, stamp: Hashable) -> bool:
+        '''
+        `Compares the state of the database file with the one left by the last write of this process, the first state seen is taken as known`
+
+        A file changed since by another process gets a `reset` change with the next generation, the watchers should read the database again.
+
+        @returns {changed: bool} <- True if the reset change was published
+        '''
+        with self.__lock:
+            if self.__stamps.setdefault(path, stamp) == stamp: return False
+
+            self.__stamps[path]  = stamp
+            self.generation     += 1
+            self.__events.append(({ 'op' : 'reset', 'id' : None, 'record' : None, 'generation' : self.generation }, None))
+
+            waiters, self.__waiters = self.__waiters, []
+
+        notify(waiters)
+
+        return True
+
+    def since(self, generation: int) -> list[tuple[dict[str, Any], dict[str, Any] | None]] | None:
+        '''
+        `Returns the changes made after the given generation`
+
+        @returns {changes: list | None} <- (event, matched object) pairs, None if the changes are no longer in the buffer or the generation is unknown
+        '''
+        with self.__lock:
+            missed: int = self.generation - generation
+
+            if missed < 0 or missed > len(self.__events): return None
+
+            return list(islice(self.__events, len(self.__events) - missed, None))
+
+    async def wait(self, generation: int, timeout: float | None = None) -> None:
+        '''`Waits until a change newer than the given generation is published or the timeout passes`'''
+        loop:   asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        future: asyncio.Future            = loop.create_future()
+
+        with self.__lock:
+            if self.generation != generation: return
+
+            self.__waiters.append((loop, future))
+
+        try: await asyncio.wait_for(future, timeout)
+
+        except TimeoutError:
+            with self.__lock:
+                if (loop, future) in self.__waiters: self.__waiters.remove((loop, future))
+
+def notify(waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]]) -> None:
+    '''Wakes the watchers in the threads of their event loops'''
+    for loop, future in waiters:
+        try:                 loop.call_soon_threadsafe(wake, future)
+        except RuntimeError: pass
+
+def wake(future: asyncio.Future) -> None:
+    '''Resolves the future of a watcher unless it was cancelled'''
+    if not future.done(): future.set_result(None)
+
+feeds:      dict[str, ChangeFeed] = {}
+feeds_lock: threading.Lock        = threading.Lock()
+
+def get_feed(path: str, size: int) -> ChangeFeed:
+    '''Returns the change feed of the database file, all handles of the file in this process share it'''
+    with feeds_lock:
+        if path not in feeds: feeds[path] = ChangeFeed(size)
+
+        return feeds.get(path)
@@ -0,0 +1,368 @@
+from typing import Any, Iterator
+
+import mmap
+import os
+
+from Moonlight.core.dataset     import Dataset, OrderKey
+from Moonlight.core.serializers import json_lines
+from Moonlight.core.tools       import write_atomic
+
+
+META:        str   = '$meta'
+HEADER:      bytes = b'{"$meta":'
+HEADER_SIZE: int   = 256
+
+class LinesFile:
+    '''Database file with one json-record per line and a sidecar table of record offsets used for point reads and writes'''
+    def __init__(self, path: str, offsets_path: str, primary_key: str) -> None:
+        '''
+        arguments
+            - path         (str) <- path to the database file
+            - offsets_path (str) <- path to the offsets table of the database file
+            - primary_key  (str) <- name of the primary key field
+        '''
+        self.path:         str = path
+        self.offsets_path: str = offsets_path
+        self.primary_key:  str = primary_key
+
+        self.__table: dict[Any, tuple[int, int]] = {}
+        self.__stamp: tuple[int, ...] | None     = None
+        self.__dead:  int                        = 0
+
+    @staticmethod
+    def is_lines(raw: bytes) -> bool:
+        '''Checks if the database file content is in the lines format'''
+        return raw.startswith(HEADER)
+
+    def ready(self) -> bool:
+        '''`Checks if the database file is already in the lines format`'''
+        with open(self.path, 'rb') as database_file: return self.is_lines(database_file.read(len(HEADER)))
+
+    def count(self) -> int:
+        '''`Returns count of records in the file`'''
+        self.__load_table()
+
+        return len(self.__table) - (META in self.__table)
+
+    def contains(self, id: Any) -> bool:
+        self.__load_table()
+
+        return id in self.__table
+
+    def read(self, id: Any) -> dict[str, Any] | None:
+        '''`Decodes only the line of the record with the given primary key from the memory-mapped file`'''
+        self.__load_table()
+
+        position: tuple[int, int] | None = self.__table.get(id)
+
+        if position is None: return None
+
+        offset, length = position
+
+        with open(self.path, 'rb') as database_file, mmap.mmap(database_file.fileno(), 0, access = mmap.ACCESS_READ) as view:
+            line: bytes = view[offset : offset + length]
+
+        if not line.strip(): return None
+
+        return json_lines.loads(line)
+
+    def records(self) -> Iterator[dict[str, Any]]:
+        '''`Yields the records in the order of the offsets table, that is the order they were pushed in even if some were moved to the end of the file`'''
+        self.__load_table()
+
+        positions: list[tuple[int, int]] = [position for key, position in self.__table.items() if key != META]
+
+        with open(self.path, 'rb') as database_file, mmap.mmap(database_file.fileno(), 0, access = mmap.ACCESS_READ) as view:
+            for offset, length in positions:
+                try:               yield json_lines.loads(view[offset : offset + length])
+                except ValueError: continue
+
+    def load(self) -> dict[str, Any]:
+        '''`Reads the whole file into the database file format`'''
+        return { **(self.read(META) or {}).get(META, {}), 'data': list(self.records()) }
+
+    def write(self, database_data: dict[str, Any]) -> None:
+        '''`Rewrites the whole file and its offsets table`'''
+        lines:  list[bytes]                  = []
+        table:  dict[Any, tuple[int, int]]   = {}
+        offset: int                          = 0
+
+        items: list[tuple[Any, dict[str, Any]]] = [(META, { META: { key: value for key, value in database_data.items() if key != 'data' } })]
+        items.extend((record.get(self.primary_key), record) for record in database_data.get('data', []))
+
+        for key, item in items:
+            line: bytes = json_lines.dumps(item)
+
+            if key == META: line = line.ljust(HEADER_SIZE)
+
+            table[key] = (offset, len(line))
+            offset    += len(line) + 1
+
+            lines.append(line)
+
+        with open(self.path, 'wb') as database_file: database_file.write(b'\n'.join(lines) + b'\n')
+
+        with open(self.offsets_path, 'wb') as offsets_file: offsets_file.write(b''.join(self.__entry(key, *position) for key, position in table.items()))
+
+        self.__table = table
+        self.__dead  = 0
+        self.__stamp = self.__get_stamp()
+
+    def apply(self, dataset: Any, entries: list[dict[str, Any]]) -> None:
+        '''
+        `Writes the final state of every record touched by the entries in place`
+
+        All records are serialized before the file is touched, so a record that can not be serialized leaves the file as it was.
+        A record that still fits into its line is overwritten, otherwise its line is blanked and the record is appended to the end of the file,
+        it keeps its place in the offsets table though, which gives the order of the records (see `records`).
+        The meta line has to stay the first one, the whole file is rewritten if it outgrows its reserved space.
+
+        arguments
+            - dataset (Dataset) <- dataset with the entries already applied
+            - entries (list)    <- journal entries describing the changes
+        '''
+        self.__load_table()
+
+        touched: dict[Any, None] = {}
+
+        for entry in entries:
+            match entry.get('op'):
+                case 'push' | 'update': touched[entry.get('record').get(self.primary_key)] = None
+                case 'delete':          touched[entry.get('id')]                          = None
+                case _:                 touched[META]                                     = None
+
+        lines: dict[Any, bytes | None] = {}
+
+        for key in touched:
+            item: dict[str, Any] | None = { META: dataset.meta } if key == META else dataset.get(key)
+
+            lines[key] = json_lines.dumps(item) if item is not None else None
+
+        if META in lines and len(lines.get(META)) > self.__table.get(META, (0, 0))[1]: return self.write(dataset.dump())
+
+        offsets: list[bytes] = []
+
+        with open(self.path, 'r+b') as database_file:
+            end: int = database_file.seek(0, os.SEEK_END)
+
+            if end and (database_file.seek(end - 1), database_file.read(1))[1] != b'\n':
+                database_file.write(b'\n')
+                end += 1
+
+            for key, line in lines.items():
+                position: tuple[int, int] | None = self.__table.get(key)
+
+                if position and line is not None and len(line) <= position[1]:
+                    database_file.seek(position[0])
+                    database_file.write(line.ljust(position[1]))
+                    continue
+
+                if position:
+                    database_file.seek(position[0])
+                    database_file.write(b' ' * position[1])
+
+                    self.__dead += position[1] + 1
+
+                if line is None:
+                    if position: offsets.append(self.__entry(key, position[0], 0))
+
+                    self.__table.pop(key, None)
+                    continue
+
+                database_file.seek(end)
+                database_file.write(line + b'\n')
+
+                self.__table[key] = (end, len(line))
+                offsets.append(self.__entry(key, end, len(line)))
+
+                end += len(line) + 1
+
+        with open(self.offsets_path, 'ab') as offsets_file: offsets_file.write(b''.join(offsets))
+
+        self.__stamp = self.__get_stamp()
+
+    def dead_size(self) -> int:
+        '''`Returns count of bytes taken by blanked lines`'''
+        self.__load_table()
+
+        return self.__dead
+
+    def outgrown(self, min_size: int) -> bool:
+        '''`Checks if blanked lines take more space than the records and the file should be rewritten`'''
+        return self.__dead >= max(min_size, os.path.getsize(self.path) - self.__dead)
+
+    def __get_stamp(self) -> tuple[int, ...]:
+        stat: os.stat_result = os.stat(self.path)
+
+        offsets_size: int = os.path.getsize(self.offsets_path) if os.path.exists(self.offsets_path) else -1
+
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino, offsets_size)
+
+    def __entry(self, key: Any, offset: int, length: int) -> bytes:
+        return b'%d\t%d\t%s\n' % (offset, length, json_lines.dumps(key))
+
+    def __load_table(self) -> None:
+        '''`Reads the offsets table, lines appended after it was written (e.g. by an interrupted write) are scanned from the file, a missing table is rebuilt and replaced at once as readers may run together`'''
+        if self.__stamp is not None and self.__stamp == self.__get_stamp(): return None
+
+        table:   dict[Any, tuple[int, int]] = {}
+        covered: int                        = 0
+
+        if os.path.exists(self.offsets_path):
+            with open(self.offsets_path, 'rb') as offsets_file:
+                for line in offsets_file:
+                    parts: list[bytes] = line.rstrip(b'\n').split(b'\t', 2)
+
+                    try:               offset, length, key = int(parts[0]), int(parts[1]), json_lines.loads(parts[2])
+                    except (ValueError, IndexError): break
+
+                    if length: table[key] = (offset, length)
+                    else:      table.pop(key, None)
+
+                    covered = max(covered, offset + length + 1)
+
+        size: int = os.path.getsize(self.path)
+
+        if not os.path.exists(self.offsets_path) or covered > size:
+            table = dict(self.__scan(0))
+
+            write_atomic(self.offsets_path, b''.join(self.__entry(key, *position) for key, position in table.items()))
+
+        elif covered < size:
+            tail: list[tuple[Any, tuple[int, int]]] = list(self.__scan(covered))
+
+            table.update(tail)
+
+            with open(self.offsets_path, 'ab') as offsets_file: offsets_file.write(b''.join(self.__entry(key, *position) for key, position in tail))
+
+        self.__table = table
+        self.__dead  = size - sum(length + 1 for _, length in table.values())
+        self.__stamp = self.__get_stamp()
+
+    def __scan(self, start: int) -> Iterator[tuple[Any, tuple[int, int]]]:
+        '''`Yields offsets of the records found in the file from the given position`'''
+        with open(self.path, 'rb') as database_file:
+            database_file.seek(start)
+
+            offset: int = start
+
+            for line in database_file:
+                content: bytes = line.rstrip(b'\n')
+
+                if content.strip():
+                    try:
+                        item: dict[str, Any] = json_lines.loads(content)
+
+                        yield (META if content.startswith(HEADER) else item.get(self.primary_key)), (offset, len(content))
+
+                    except ValueError: pass
+
+                offset += len(line)
+
+
+class LinesDataset:
+    '''Dataset view of a lines file, operations by primary key read single records instead of parsing the whole file'''
+    def __init__(self, lines: LinesFile, primary_key: str) -> None:
+        self.primary_key: str = primary_key
+
+        self.__lines:   LinesFile                           = lines
+        self.__changed: dict[Any, dict[str, Any] | None]    = {}
+        self.__full:    Dataset | None                      = None
+
+    @property
+    def meta(self) -> dict[str, Any]:
+        if self.__full: return self.__full.meta
+
+        return (self.__lines.read(META) or {}).get(META, {})
+
+    @property
+    def indexes(self) -> list[str]:         return self.meta.get('indexes', [])
+    @property
+    def ordered_indexes(self) -> list[str]: return self.meta.get('ordered_indexes', [])
+
+    def built(self, field: str, ordered: bool = False) -> bool:
+        return self.__full is not None and self.__full.built(field, ordered)
+
+    def __len__(self) -> int:
+        if self.__full: return len(self.__full)
+
+        return self.__lines.count() + sum((record is not None) - self.__lines.contains(id) for id, record in self.__changed.items())
+
+    def __iter__(self) -> Iterator[dict[str, Any]]: return iter(self.__get_full())
+
+    def __contains__(self, id: Any) -> bool:
+        if self.__full:         return id in self.__full
+        if id in self.__changed: return self.__changed[id] is not None
+
+        return self.__lines.contains(id)
+
+    def get(self, id: Any) -> dict[str, Any] | None:
+        if self.__full:         return self.__full.get(id)
+        if id in self.__changed: return self.__changed[id]
+
+        try:              return self.__lines.read(id)
+        except TypeError: return None
+
+    def push(self, record: dict[str, Any]) -> None:
+        if self.__full: return self.__full.push(record)
+
+        self.__changed[record.get(self.primary_key)] = record
+
+    def update(self, record: dict[str, Any]) -> dict[str, Any] | None:
+        if self.__full: return self.__full.update(record)
+
+        existed_record: dict[str, Any] | None = self.get(record.get(self.primary_key))
+
+        if existed_record is None: return None
+
+        existed_record.update(record)
+
+        self.__changed[record.get(self.primary_key)] = existed_record
+
+        return existed_record
+
+    def delete(self, id: Any) -> dict[str, Any] | None:
+        if self.__full: return self.__full.delete(id)
+
+        deleted_record: dict[str, Any] | None = self.get(id)
+
+        if deleted_record is not None: self.__changed[id] = None
+
+        return deleted_record
+
+    def apply(self, entry: dict[str, Any]) -> None:
+        match entry.get('op'):
+            case 'push':
+                if entry.get('record').get(self.primary_key) not in self: self.push(entry.get('record'))
+
+            case 'update': self.update(entry.get('record'))
+            case 'delete': self.delete(entry.get('id'))
+            case _:        self.__get_full().apply(entry)
+
+    def lookup(self, conditions: dict[str, list[Any]]) -> list[dict[str, Any]] | None:
+        if not self.indexes: return None
+
+        return self.__get_full().lookup(conditions)
+
+    def range(self, field: str, start: Any = None, end: Any = None, reverse: bool = False, after: OrderKey | None = None) -> Iterator[tuple[OrderKey, dict[str, Any]]]:
+        return self.__get_full().range(field, start, end, reverse, after)
+
+    def dump(self) -> dict[str, Any]: return self.__get_full().dump()
+
+    def __get_full(self) -> Dataset:
+        if self.__full is None: self.__full = self.__materialize()
+
+        return self.__full
+
+    def __materialize(self) -> Dataset:
+        '''`Parses the whole file and applies the changes made through this view`'''
+        dataset: Dataset = Dataset(self.__lines.load(), self.primary_key)
+
+        for id, record in self.__changed.items():
+            if record is None:  dataset.delete(id)
+            elif id in dataset: dataset.update(record)
+            else:               dataset.push(record)
+
+        self.__changed = {}
+
+        return dataset
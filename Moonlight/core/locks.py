@@ -0,0 +1,104 @@
+from contextlib import AbstractContextManager, asynccontextmanager, contextmanager
+from filelock   import FileLock
+from typing     import AsyncIterator, Iterator
+
+import asyncio
+import os
+
+try:                import fcntl
+except ImportError: fcntl = None
+
+REPLACE_WHILE_OPEN: bool = os.name != 'nt'
+
+
+class ReadWriteLock:
+    '''Lock of the coroutines of one process, readers hold it together and a writer alone, a waiting writer goes before new readers'''
+    def __init__(self) -> None:
+        self.__readers: int                  = 0
+        self.__writing: bool                 = False
+        self.__waiting: int                  = 0
+        self.__futures: list[asyncio.Future] = []
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[None]:
+        '''`Holds the lock together with other readers`'''
+        while self.__writing or self.__waiting: await self.__wait()
+
+        self.__readers += 1
+
+        try: yield
+
+        finally:
+            self.__readers -= 1
+
+            if not self.__readers: self.__wake()
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[None]:
+        '''`Holds the lock alone, waits for the readers holding it to finish`'''
+        self.__waiting += 1
+
+        try:
+            while self.__writing or self.__readers: await self.__wait()
+
+        except BaseException:
+            self.__waiting -= 1
+            self.__wake()
+            raise
+
+        self.__waiting -= 1
+        self.__writing  = True
+
+        try: yield
+
+        finally:
+            self.__writing = False
+            self.__wake()
+
+    async def __wait(self) -> None:
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+        self.__futures.append(future)
+
+        try:     await future
+        finally: self.__futures.remove(future)
+
+    def __wake(self) -> None:
+        for future in self.__futures:
+            if not future.done(): future.set_result(None)
+
+
+class FileReadWriteLock:
+    '''Lock of a file shared between processes, readers take a shared `flock` and writers an exclusive one, every lock is exclusive where fcntl is not available'''
+    def __init__(self, path: str) -> None:
+        '''
+        arguments
+            - path (str) <- path to the lock file
+        '''
+        self.path: str = path
+
+        self.__fallback: FileLock | None = FileLock(path) if fcntl is None else None
+
+    def shared(self) -> AbstractContextManager[None]:
+        '''`Holds the lock together with readers of this and other processes`'''
+        return self.__hold(shared = True)
+
+    def exclusive(self) -> AbstractContextManager[None]:
+        '''`Holds the lock alone`'''
+        return self.__hold(shared = False)
+
+    @contextmanager
+    def __hold(self, shared: bool) -> Iterator[None]:
+        '''`Every holder opens the lock file on its own, so threads of one process can share the lock and closing the file releases it`'''
+        if self.__fallback is not None:
+            with self.__fallback: yield
+            return
+
+        descriptor: int = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+            yield
+
+        finally: os.close(descriptor)
@@ -1,8 +1,10 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing   import Any
 
-from Moonlight.core.tools    import generate_uuid, get_now_datetime, remove_file, password_hash, generate_token
+from Moonlight.core.tools    import generate_uuid, get_now_datetime, remove_file, password_hash
+from Moonlight.core.tokens   import tokens
 from Moonlight.config.config import config
+from Moonlight.config.paths  import make_journal_path, make_offsets_path, make_columns_path
 
 
 class Methods:
@@ -51,27 +53,16 @@ class Methods:
     
     @staticmethod
     def delete_database(database_name: str, filename: str, logs_path: str) -> None:
-        '''`Deletes the database and its corresponding log file`'''
+        '''`Deletes the database, its journal, offsets table, columnar copy and its corresponding log file`'''
         remove_file(filename)
+        remove_file(make_journal_path(filename))
+        remove_file(make_offsets_path(filename))
+        remove_file(make_columns_path(filename))
         remove_file(logs_path)
         
         config.delete('databases', 'name', database_name)
 
     @staticmethod
     def create_token(username: str) -> dict[str, str]:
-        '''`Generates a new user authorization token for API requests`'''
-        token:   str = generate_token()
-        expires: str = (datetime.now() + timedelta(hours = 3)).isoformat()
-        created: str = datetime.now().isoformat()        
-
-        config.push('api_keys', {
-            'author'     : username,
-            'token'      : token,
-            'expires'    : expires,
-            'created'    : created
-        })
-
-        return {
-            'token'   : token, 
-            'expires' : expires
-        }
\ No newline at end of file
+        '''`Generates a new user authorization token for API requests, it is kept in the tokens file`'''
+        return tokens.create(username, timedelta(hours = 3))
\ No newline at end of file
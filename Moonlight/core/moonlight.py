@@ -1,266 +1,1597 @@
-from filelock import FileLock
-from typing   import Any
-from enum     import Enum
+from contextlib import AsyncExitStack, ExitStack, aclosing
+from itertools  import cycle, islice
+from typing     import Any, AsyncIterator, Awaitable, Callable, Hashable, Iterable, Iterator
+from enum       import Enum
 
+import threading
+import asyncio
+import heapq
 import json
+import time
+import os
 
-from Moonlight.core.tools        import check_path_exist, get_filename_from_path, generate_uuid
-from Moonlight.config.paths      import make_database_path, make_logging_path
+from Moonlight.core.tools        import check_path_exist, get_filename_from_path, generate_id, wait_past_id, remove_file, encode_cursor, decode_cursor, write_atomic
+from Moonlight.config.paths      import make_database_path, make_logging_path, make_journal_path, make_offsets_path, make_columns_path
 from Moonlight.config.config     import config, app_data
 from Moonlight.core.methods      import Methods
+from Moonlight.core.dataset      import Dataset, Snapshot, EXPIRES, expiry, is_expired, order_key, copy_record
+from Moonlight.core.transaction  import Transaction
+from Moonlight.core.lines        import LinesFile, LinesDataset
+from Moonlight.core.columns      import Columns, Aggregation, aggregate, combine, numpy
+from Moonlight.core.query        import Plan, PlanKind, compile_query, equalities, parse_sort, plan_query, project, sort_records
+from Moonlight.core.serializers  import Serializer, get_serializer, json_lines
+from Moonlight.core.storage      import read_database, iter_database
+from Moonlight.core.shards       import shard_name, get_pool, scan
+from Moonlight.core.writer       import GroupCommit
+from Moonlight.core.feed         import ChangeFeed, Change, get_feed
+from Moonlight.core.cache        import ResultCache, get_cache, make_key
+from Moonlight.core.locks        import ReadWriteLock, FileReadWriteLock, REPLACE_WHILE_OPEN
 from Moonlight.messages.logger   import Logger, LogLevel
 from Moonlight.messages.messages import t
 from Moonlight.schemas.queries   import Query
 from Moonlight.schemas.schemas   import Schema
 
 
-def init_database(path: str) -> None:
+def init_database(path: str, lines: bool = False) -> None:
     if check_path_exist(path): return None
 
+    if lines: return LinesFile(path, make_offsets_path(path), 'id').write(app_data.get('base_database_data'))
+
     with open(path, 'w', encoding = 'utf-8') as database_file: 
         json.dump(app_data.get('base_database_data'), database_file, indent = 4)
 
-class Operations(Enum):
-    PUSH:     str = 'PUSH'
-    ALL:      str = 'ALL'
-    GET:      str = 'GET'
-    UPDATE:   str = 'UPDATE'
-    DELETE:   str = 'DELETE'
-    DROP:     str = 'DROP'
-    CONTAINS: str = 'CONTAINS'
-    LENGTH:   str = 'LENGTH'
-    COUNT:    str = 'COUNT'
+class Operations(Enum):
+    PUSH:        str = 'PUSH'
+    ALL:         str = 'ALL'
+    GET:         str = 'GET'
+    UPDATE:      str = 'UPDATE'
+    DELETE:      str = 'DELETE'
+    DROP:        str = 'DROP'
+    CONTAINS:    str = 'CONTAINS'
+    LENGTH:      str = 'LENGTH'
+    COUNT:       str = 'COUNT'
+    COMPACT:     str = 'COMPACT'
+    INDEX:       str = 'INDEX'
+    RANGE:       str = 'RANGE'
+    AGGREGATE:   str = 'AGGREGATE'
+    EXPLAIN:     str = 'EXPLAIN'
+    TRANSACTION: str = 'TRANSACTION'
+    WATCH:       str = 'WATCH'
+    EXPIRE:      str = 'EXPIRE'
+
+class Storage(Enum):
+    SNAPSHOT: str = 'snapshot'
+    LOG:      str = 'log'
+    LINES:    str = 'lines'
+
+class Moonlight:
+    '''Moonlight json database class'''
+    def __init__(self, filename: str, author: str = app_data.get('self_admin'), console_show: bool = True, resident: bool = False, storage: Storage | str = Storage.SNAPSHOT, serializer: str | None = None, columnar: bool = False, shards: int = 1, ttl: float | None = None) -> None:
+        '''
+        arguments
+            - filename   (str)     <- relative path to database .json-file
+            - author     (str)     <- creator of database
+            - resident   (bool)    <- keep the parsed database in memory and reload it only when the file was changed by someone else
+            - storage    (Storage) <- `snapshot` rewrites the database file on every change, `log` appends changes to the journal, `lines` keeps one object per line and rewrites only the changed lines
+            - serializer (str)     <- encoding of the database file: `json`, `json_compact`, `orjson` or `msgpack` (default: `serializer` from config)
+            - columnar   (bool)    <- keep a columnar copy of the database for vectorized queries and aggregations (requires numpy)
+            - shards     (int)     <- split the database into this many files by primary key, every file has its own lock, scans run in spawned processes (see `get_pool`)
+            - ttl        (float)   <- seconds objects live after they are pushed unless push() is given its own ttl, by default objects do not expire
+        '''
+        self.logs_path: str = make_logging_path(filename)
+
+        self.log_levels: list[LogLevel] = [LogLevel[level.upper()] for level in config.get('loggers') if level.upper() in LogLevel.__members__]
+        self.logger: Logger = Logger(self.logs_path, self.log_levels, console_show) 
+
+        self.__setup(filename, resident, storage, serializer, columnar)
+
+        self.ttl: float | None = ttl if self.__check_ttl(ttl, Operations.PUSH) else None
+
+        self.database_id: int = Methods.create_database(self.name, self.filename, self.logs_path, author).get('id')
+        
+        self.logger.write(t('loggers.info.database_connect', name = app_data.get('name')), LogLevel.INFO)
+
+        self.shards: list[Moonlight] = self.__open_shards(shards) if shards > 1 else []
+
+        self.__turns: Iterator[int] = cycle(range(len(self.shards) or 1))
+
+    def __setup(self, filename: str, resident: bool, storage: Storage | str, serializer: str | None, columnar: bool, shard: tuple[int, int] = (0, 1)) -> None:
+        '''`Prepares the files and the state of the database or one of its shards`'''
+        self.filename:     str = make_database_path(filename)
+        self.journal_path: str = make_journal_path(filename)
+        self.offsets_path: str = make_offsets_path(filename)
+        self.columns_path: str = make_columns_path(filename)
+        self.name:         str = get_filename_from_path(self.filename)
+
+        self.resident: bool    = resident
+        self.storage:  Storage = Storage(storage)
+        
+        init_database(self.filename, self.storage is Storage.LINES)
+
+        self.__primary_key: str             = 'id'
+        self.__shard:       tuple[int, int] = shard
+
+        self.lock: FileReadWriteLock = FileReadWriteLock(f'{self.filename}.lock')
+
+        self.__lines: LinesFile = LinesFile(self.filename, self.offsets_path, self.__primary_key)
+
+        self.__guard:  ReadWriteLock = ReadWriteLock()
+        self.__writer: GroupCommit   = GroupCommit(
+            lambda operations: self.__run(lambda: self.__write(operations)),
+            app_data.get('group_commit').get('max_delay'),
+            app_data.get('group_commit').get('max_batch')
+        )
+
+        self.__snapshot:       Snapshot | None        = None
+        self.__generation:     int                    = 0
+        self.__compaction:     asyncio.Task | None    = None
+        self.__compaction_due: bool                   = False
+        self.__columns:        Columns | None         = None
+        self.__filling:        threading.RLock        = threading.RLock()
+        self.__feed:           ChangeFeed             = get_feed(self.filename, app_data.get('watch').get('buffer_size'))
+        self.__cache:          ResultCache            = get_cache(self.filename, app_data.get('cache').get('max_entries'), app_data.get('cache').get('max_records'))
+        self.__sweep_at:       float | None           = None
+        self.__sweeper:        asyncio.Task | None    = None
+
+        self.serializer: Serializer = get_serializer(serializer or config.get('serializer'))
+
+        if self.serializer is None:
+            self.logger.write(t('loggers.warning.serializer_unavailable', name = app_data.get('name'), serializer = serializer or config.get('serializer')), LogLevel.WARNING)
+            self.serializer = get_serializer('json')
+
+        self.columnar: bool = columnar and numpy is not None
+
+        if columnar and numpy is None: self.logger.write(t('loggers.warning.numpy_unavailable', name = app_data.get('name')), LogLevel.WARNING)
+
+    def __open_shards(self, count: int) -> list['Moonlight']:
+        '''`Opens the shard files, the count is kept in the database file and records of a database that was not sharded yet are moved into the shards`'''
+        with self.lock.exclusive():
+            dataset: Dataset   = self.__read()
+            stored:  int | None = dataset.meta.get('shards')
+
+            if stored is not None and stored != count:
+                self.logger.write(t('loggers.warning.shards_mismatch', name = app_data.get('name'), shards = count, stored = stored), LogLevel.WARNING)
+                count = stored
+
+            shards: list[Moonlight] = []
+
+            for index in range(count):
+                shard: Moonlight = Moonlight.__new__(Moonlight)
+
+                shard.logs_path   = self.logs_path
+                shard.log_levels  = self.log_levels
+                shard.logger      = self.logger
+                shard.database_id = self.database_id
+                shard.ttl         = self.ttl
+                shard.shards      = []
+
+                shard.__setup(shard_name(self.filename, index), self.resident, self.storage, self.serializer.name, self.columnar, (index, count))
+
+                shard.__feed = self.__feed
+
+                shards.append(shard)
+
+            if stored is not None: return shards
+
+            for index, shard in enumerate(shards):
+                entries: list[dict[str, Any]] = [{ 'op' : 'push', 'record' : record } for record in dataset if self.__route(record.get(self.__primary_key), count) == index]
+
+                if not entries: continue
+
+                with shard.lock.exclusive():
+                    target: Dataset = shard.__load(writable = True)
+
+                    for entry in entries: target.apply(entry)
+
+                    shard.__persist(target, entries)
+
+            self.__save(Dataset({ **dataset.meta, 'shards' : count }, self.__primary_key))
+
+            return shards
+
+    def __route(self, id: Any, count: int | None = None) -> int:
+        '''`Returns the index of the shard keeping the object with the given primary key`'''
+        try:                            return self.__cast_id(id) % (count or len(self.shards))
+        except (TypeError, ValueError): return 0
+
+    async def __scatter(self, items: list[Any], route: Callable[[Any], int], call: Callable[['Moonlight', list[Any]], Awaitable[list[Any] | None]]) -> list[Any]:
+        '''`Splits the items between the shards, runs the batches of all shards at once and returns the results in the order of the items`'''
+        buckets: dict[int, list[int]] = {}
+
+        for position, item in enumerate(items): buckets.setdefault(route(item), []).append(position)
+
+        batches: list[list[Any] | None] = await asyncio.gather(*(call(self.shards[index], [items[position] for position in positions]) for index, positions in buckets.items()))
+        results: list[Any]              = [None] * len(items)
+
+        for positions, batch in zip(buckets.values(), batches):
+            for position, result in zip(positions, batch or []): results[position] = result
+
+        return results
+
+    async def __fan_out(self, query: dict[str, Any], count: bool = False, limit: int | None = None, sort: list[tuple[str, bool]] | None = None) -> list[Any]:
+        '''`Scans all shards at once, shards which are not kept in memory are read and matched in worker processes`'''
+        if self.resident or self.columnar:
+            def operation(shard: Moonlight) -> Any:
+                if count: return shard.__count(query, limit)
+
+                return list(islice(shard.__match(shard.__load(), query, sort), limit))
+
+            return await asyncio.gather(*(shard.__run(lambda shard = shard: operation(shard), shared = True) for shard in self.shards))
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+
+        return await asyncio.gather(*(loop.run_in_executor(get_pool(), scan, shard.filename, shard.journal_path, self.__primary_key, query, count, limit, sort) for shard in self.shards))
+
+    def __target_shards(self, query: dict[str, Any]) -> list['Moonlight']:
+        '''`Returns the shards that may keep records of the query, only the shards of the primary keys if they are given`'''
+        identifiers: list[Any] | None = equalities(query.get(self.__primary_key)) if self.__primary_key in query else None
+
+        if identifiers is None: return self.shards
+
+        return [self.shards[index] for index in sorted({ self.__route(identifier) for identifier in identifiers })]
+
+    def __get_id(self) -> int:
+        '''`Generates a new time-ordered primary key, keys generated by a shard always belong to it`'''
+        return generate_id(*self.__shard)
+
+    def __cast_id(self, id: int) -> int: return int(id)
+
+    def __get_stamp(self) -> tuple[int, ...]:
+        '''`Returns the state of the database and journal files used to detect changes made by other processes`'''
+        stat: os.stat_result = os.stat(self.filename)
+
+        journal_size: int = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else -1
+
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino, journal_size)
+
+    def __version(self) -> Hashable | None:
+        '''`Returns the version of the database: the generation of its change feed and the state of its files, so changes made by other processes count too`'''
+        try:            return (self.__feed.generation, *(database.__get_stamp() for database in (self.shards or [self])))
+        except OSError: return None
+
+    def __cached(self) -> Dataset | None:
+        '''`Returns the resident dataset if it still matches the files (lock must be held)`'''
+        snapshot: Snapshot | None = self.__snapshot
+
+        if self.resident and snapshot is not None and snapshot.stamp == self.__get_stamp(): return snapshot.dataset
+
+        return None
+
+    def __publish(self, dataset: Dataset, stamp: tuple[int, ...]) -> None:
+        '''`Makes the dataset the resident snapshot seen by the next reads, readers of the previous one keep it`'''
+        self.__generation += 1
+        self.__snapshot    = Snapshot(self.__generation, stamp, dataset)
+
+    def __load(self, writable: bool = False, expired: bool = False) -> Dataset | LinesDataset:
+        '''
+        `Returns the dataset of the database (lock must be held), readers do not see expired objects unless they ask for them`
+
+        arguments
+            - writable (bool) <- the dataset is going to be changed
+            - expired  (bool) <- keep the expired objects which were not swept yet
+        '''
+        dataset: Dataset | LinesDataset = self.__fetch(writable)
+
+        if writable or expired or not isinstance(dataset, Dataset): return dataset
+
+        return self.__live(dataset)
+
+    def __live(self, dataset: Dataset) -> Dataset:
+        '''`Hides the expired objects from a reader, the resident dataset is copied without them and the sweeper is called to delete them`'''
+        now: float = time.time()
+
+        identifiers, upcoming = dataset.expired(now)
+
+        self.__expect(upcoming)
+
+        if not identifiers: return dataset
+
+        self.__expect(now)
+
+        live: Dataset = dataset.copy() if self.resident else dataset
+
+        for id in identifiers: live.delete(id)
+
+        return live
+
+    def __alive(self, records: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        '''`Yields the objects that have not expired, the sweeper is called if any have`'''
+        now: float = time.time()
+
+        for record in records:
+            if not is_expired(record, now): yield record
+
+            else: self.__expect(now)
+
+    def __visible(self, dataset: Dataset | LinesDataset, records: Iterable[dict[str, Any]] | None = None) -> Iterable[dict[str, Any]]:
+        '''`Hides the expired objects among the records of the dataset (all of them by default), a lines view is not filtered when it is loaded`'''
+        records: Iterable[dict[str, Any]] = dataset if records is None else records
+
+        return self.__alive(records) if isinstance(dataset, LinesDataset) else records
+
+    def __detach(self, records: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+        '''`Returns copies of the objects of the resident dataset, so a caller changing them does not change the database, parsed objects are returned as they are`'''
+        return [copy_record(record) for record in records] if self.resident else list(records)
+
+    def __expect(self, moment: float | None) -> None:
+        '''`Makes the sweeper run at the moment an object expires at, if it is earlier than the planned one`'''
+        if moment is not None and (self.__sweep_at is None or moment < self.__sweep_at): self.__sweep_at = moment
+
+    def __fetch(self, writable: bool = False) -> Dataset | LinesDataset:
+        '''
+        `Reads the database and replays its journal, reusing the resident dataset while the files are unchanged (lock must be held)`
+
+        A writer in snapshot storage gets a copy of the resident dataset, readers without the lock keep the published one until the next is published.
+
+        In lines mode the file is converted to the lines format first if needed, without the resident copy only a view reading single lines is returned.
+        Readers running together wait for one of them to parse the file instead of parsing it each.
+        '''
+        dataset: Dataset | None = self.__cached()
+
+        if dataset is not None: return dataset.copy() if writable and self.storage is Storage.SNAPSHOT else dataset
+
+        if self.storage is Storage.LINES:
+            if not self.__lines.ready() or os.path.exists(self.journal_path): self.__save(self.__read())
+
+            if not self.resident: return LinesDataset(self.__lines, self.__primary_key)
+
+        if not self.resident: return self.__read()
+
+        with self.__filling:
+            dataset = self.__cached()
+
+            if dataset is None:
+                stamp: tuple[int, ...] = self.__get_stamp()
+
+                dataset = self.__read()
+
+                self.__publish(dataset, stamp)
+
+            return dataset.copy() if writable and self.storage is Storage.SNAPSHOT else dataset
+
+    def __read(self) -> Dataset:
+        '''`Parses the database file in any format and replays the journal`'''
+        return read_database(self.filename, self.journal_path, self.__primary_key)
+
+    def __save(self, dataset: Dataset | LinesDataset) -> None:
+        '''`Writes the whole database to the file, the journal is merged into it, in snapshot storage the file is replaced at once, the change feed remembers the written state (lock must be held)`'''
+        if self.storage is Storage.LINES: self.__lines.write(dataset.dump())
+
+        else:
+            write_atomic(self.filename, self.serializer.dumps(dataset.dump()))
+
+            remove_file(self.offsets_path)
+
+        remove_file(self.journal_path)
+
+        self.__feed.written(self.filename, self.__get_stamp())
+
+    def __persist(self, dataset: Dataset | None, entries: list[dict[str, Any]]) -> None:
+        '''
+        `Stores the changes according to the storage mode and remembers the written state, also in the change feed (lock must be held)`
+
+        arguments
+            - dataset (Dataset) <- dataset with the entries already applied, may be None in log mode if it was not read
+            - entries (list)    <- journal entries describing the changes
+        '''
+        match self.storage:
+            case Storage.LOG:   self.__append_journal(entries)
+            case Storage.LINES: self.__lines.apply(dataset, entries)
+            case _:             self.__save(dataset)
+
+        self.__feed.written(self.filename, self.__get_stamp())
+
+        if self.resident and isinstance(dataset, Dataset): self.__publish(dataset, self.__get_stamp())
+
+        else: self.__invalidate()
+
+        if self.storage is Storage.LOG:   self.__compaction_due = self.__journal_outgrown()
+        if self.storage is Storage.LINES: self.__compaction_due = self.__lines.outgrown(app_data.get('journal').get('compaction_min_size'))
+
+    def __get_columns(self, dataset: Dataset | None = None) -> Columns | None:
+        '''`Returns the columnar copy of the database, it is read from the columns file or built again after the database was changed, once for all readers running together (lock must be held)`'''
+        if not self.columnar: return None
+
+        columns: Columns | None = self.__columns
+
+        if columns is not None and columns.stamp == self.__get_stamp(): return columns
+
+        with self.__filling:
+            stamp:   tuple[int, ...] = self.__get_stamp()
+            columns: Columns | None  = self.__columns
+
+            if columns is not None and columns.stamp == stamp: return columns
+
+            columns = Columns.load(self.columns_path, stamp)
+
+            if columns is None:
+                dataset, stamp = self.__columns_source(dataset, stamp)
+
+                columns = Columns.build(dataset, self.__primary_key, stamp)
+
+                if columns is not None: columns.save(self.columns_path)
+
+            self.__columns = columns
+
+            return columns
+
+    def __columns_source(self, dataset: Dataset | None, stamp: tuple[int, ...]) -> tuple[Dataset | LinesDataset, tuple[int, ...]]:
+        '''
+        `Returns the dataset to build the columnar copy from and the stamp of the files it was read at (lock must be held)`
+
+        Reads in snapshot storage take no lock, so a write may land while the columns are built. The published snapshot knows the stamp it was read at,
+        any other dataset is read again after the stamp was taken: the columns are then never newer than their stamp and are built again after such a write.
+        '''
+        snapshot: Snapshot | None = self.__snapshot
+
+        if dataset is None or snapshot is None or snapshot.dataset is not dataset:
+            dataset  = self.__load(expired = True)
+            snapshot = self.__snapshot
+
+        if snapshot is not None and snapshot.dataset is dataset: return dataset, snapshot.stamp
+
+        return dataset, stamp
+
+    def __mask(self, query: dict[str, Any], dataset: Dataset | None = None) -> tuple[Columns, Any] | None:
+        '''`Returns the columnar copy with the mask of its records matching the query, None if it cannot be used`'''
+        columns: Columns | None = self.__get_columns(dataset)
+        mask:    Any            = columns.mask(query) if columns is not None else None
+
+        return (columns, mask & columns.alive(time.time())) if mask is not None else None
+
+    def __invalidate(self) -> None:
+        '''`Forgets the resident dataset, the next read will parse the file again`'''
+        self.__snapshot = None
+
+    def __append_journal(self, entries: list[dict[str, Any]]) -> None:
+        '''`Appends the entries to the journal, one json-line per entry`'''
+        with open(self.journal_path, 'ab') as journal_file:
+            journal_file.write(b''.join(json_lines.dumps(entry) + b'\n' for entry in entries))
+
+    def __match(self, dataset: Dataset, query: dict[str, Any], sort: list[tuple[str, bool]] | None = None) -> Iterator[dict[str, Any]]:
+        '''`Yields records matching the query in the requested order, the planner looks them up by the primary key, an index or the columnar copy instead of a scan when possible`'''
+        plan:       Plan                     = self.__plan(dataset, query, sort)
+        candidates: Iterable[dict[str, Any]] = self.__candidates(dataset, plan)
+        matches:    Iterator[dict[str, Any]] = filter(compile_query(query), self.__visible(dataset, candidates))
+
+        if sort and not plan.ordered: return iter(sort_records(matches, sort))
+
+        return matches
+
+    def __plan(self, dataset: Dataset, query: dict[str, Any], sort: list[tuple[str, bool]] | None = None) -> Plan:
+        '''
+        `Plans the query, primary keys growing in the order of the records work as an ordered index and need no sorting`
+
+        Without the resident copy every query parses a new dataset, so only the indexes it has built already are used,
+        building the others would cost a pass more than the scan. The resident dataset keeps its indexes between queries and writes.
+        '''
+        in_order: bool      = isinstance(dataset, Dataset) and dataset.ids_in_order
+        indexes:  list[str] = dataset.indexes         if self.resident else [field for field in dataset.indexes if dataset.built(field)]
+        ordered:  list[str] = dataset.ordered_indexes if self.resident else [field for field in dataset.ordered_indexes if dataset.built(field, True)]
+
+        plan: Plan = plan_query(query, self.__primary_key, indexes, [*ordered, self.__primary_key] if in_order else ordered, self.columnar, sort)
+
+        if in_order and sort == [(self.__primary_key, False)] and plan.kind is not PlanKind.PRIMARY_KEY: plan.ordered = True
+
+        return plan
+
+    def __candidates(self, dataset: Dataset, plan: Plan) -> Iterable[dict[str, Any]]:
+        '''`Returns the records the plan has to check against the query, the plan falls back to a scan if its index cannot be used`'''
+        match plan.kind:
+            case PlanKind.PRIMARY_KEY:
+                records: dict[Any, dict[str, Any]] = {}
+
+                for identifier in plan.values:
+                    try:              record: dict[str, Any] | None = dataset.get(identifier)
+                    except TypeError: record = None
+
+                    if record is not None: records[record.get(self.__primary_key)] = record
+
+                return records.values()
+
+            case PlanKind.INDEX:
+                indexed: list[dict[str, Any]] | None = dataset.lookup(plan.values)
+
+                if indexed is not None: return indexed
+
+            case PlanKind.ORDERED_INDEX: return (record for _, record in dataset.range(plan.fields[0], plan.start, plan.end, plan.reverse))
+
+            case PlanKind.COLUMNS:
+                masked: tuple[Columns, Any] | None = self.__mask(plan.values, dataset)
+
+                if masked is not None: return [record for id in masked[0].ids[masked[1]].tolist() if (record := dataset.get(id)) is not None]
+
+        plan.kind = PlanKind.SCAN
+
+        return dataset
+
+    def __records(self, expired: bool = False) -> Iterator[dict[str, Any]]:
+        '''`Yields all records, the resident copy is iterated in memory, otherwise the files are parsed incrementally (lock must be held)`'''
+        if self.resident: yield from self.__load(expired = expired)
+        elif expired:     yield from iter_database(self.filename, self.journal_path, self.__primary_key)
+        else:             yield from self.__alive(iter_database(self.filename, self.journal_path, self.__primary_key))
+
+    def __stream(self, query: dict[str, Any], sort: list[tuple[str, bool]] | None = None) -> Iterator[dict[str, Any]]:
+        '''`Yields records matching the query, without the resident copy, a point read or the columnar copy the files are parsed incrementally (lock must be held)`'''
+        point: bool = self.storage is Storage.LINES and self.__primary_key in query and equalities(query.get(self.__primary_key)) is not None
+
+        if not query and not sort: yield from self.__records()
+
+        elif self.resident or self.columnar or point: yield from self.__match(self.__load(), query, sort)
+
+        else:
+            matches: Iterator[dict[str, Any]] = filter(compile_query(query), self.__records())
+
+            yield from (sort_records(matches, sort) if sort else matches)
+
+    async def __iterate(self, query: dict[str, Any], offset: int, operation: Operations) -> AsyncIterator[dict[str, Any]]:
+        '''
+        `Yields records matching the query, they are read in batches holding the lock, so writes may run between the batches`
+
+        The read position is kept between batches, if the database was changed meanwhile it is read again skipping the records already passed.
+        In snapshot storage the files and the resident dataset are replaced instead of changed, so the iteration stays on the snapshot it started from.
+        '''
+        if self.shards:
+            for shard in self.__target_shards(query):
+                async with aclosing(shard.__iterate(query, 0, operation)) as records:
+                    async for record in records:
+                        if offset: offset -= 1
+                        else:      yield record
+
+            return
+
+        size:     int                              = app_data.get('iteration').get('batch_size')
+        records:  Iterator[dict[str, Any]] | None = None
+        source:   tuple | None                     = None
+        position: int                              = offset
+
+        def batch() -> list[dict[str, Any]] | None:
+            nonlocal records, source, position
+
+            try:
+                if records is None or (not self.__lock_free() and source != (self.__get_stamp(), self.__snapshot)): records = islice(self.__stream(query), position, None)
+
+                result: list[dict[str, Any]] = self.__detach(islice(records, size))
+
+                position += len(result)
+                source    = (self.__get_stamp(), self.__snapshot)
+
+                return result
+
+            except Exception as error:
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = operation.value), LogLevel.ERROR)
+                return None
+
+        while True:
+            result: list[dict[str, Any]] | None = await self.__run(batch, shared = True)
+
+            for record in result or []: yield record
+
+            if result is None or len(result) < size: return
+
+    def __check_page(self, offset: int, limit: int | None, operation: Operations) -> bool:
+        '''`Checks that the offset and the limit of a page are non-negative integers`'''
+        if all(isinstance(value, int) and not isinstance(value, bool) and value >= 0 for value in (offset, 0 if limit is None else limit)): return True
+
+        self.logger.write(t('loggers.error.invalid_page', offset = offset, limit = limit, operation = operation.value), LogLevel.ERROR)
+
+        return False
+
+    def __validate_query(self, query: dict[str, Any] | Query, operation: Operations) -> dict[str, Any] | None:
+        '''`Returns the query of a search or None if it is rejected`'''
+        query: dict[str, Any] = query() if isinstance(query, Query) else query
+
+        if not isinstance(query, dict): 
+            self.logger.write(t('loggers.error.must_be_dict', typeof = type(query), operation = operation.value), LogLevel.ERROR)    
+            return None
+        
+        if not query:
+            self.logger.write(t('loggers.error.empty_query', operation = operation.value), LogLevel.ERROR)
+            return None
+
+        return query if self.__check_query(query, operation) else None
+
+    def __check_query(self, query: dict[str, Any], operation: Operations) -> bool:
+        '''`Checks that the fields and operators of the query are valid`'''
+        try:
+            compile_query(query)
+            return True
+
+        except ValueError as error:
+            self.logger.write(t('loggers.error.invalid_query', query = query, error = error, operation = operation.value), LogLevel.ERROR)
+            return False
+
+    def __parse_sort(self, sort: str | list[str] | None, operation: Operations) -> list[tuple[str, bool]] | None:
+        '''`Returns (field, descending) pairs of the sort or None if it is rejected`'''
+        try: return parse_sort(sort)
+
+        except ValueError:
+            self.logger.write(t('loggers.error.invalid_sort', sort = sort, operation = operation.value), LogLevel.ERROR)
+            return None
+
+    def __check_ttl(self, ttl: float | None, operation: Operations) -> bool:
+        '''`Checks that the lifetime of objects is a positive number of seconds`'''
+        if ttl is None or (isinstance(ttl, (int, float)) and not isinstance(ttl, bool) and ttl > 0): return True
+
+        self.logger.write(t('loggers.error.invalid_ttl', ttl = ttl, operation = operation.value), LogLevel.ERROR)
+
+        return False
+
+    def __validate_push(self, query: dict[str, Any] | Schema, ttl: float | None = None) -> dict[str, Any] | None:
+        '''`Returns the object to push or None if it is rejected, an object with a lifetime gets the moment it expires at`'''
+        query: dict[str, Any] = query() if isinstance(query, Schema) else query
+
+        if not isinstance(query, dict): 
+            self.logger.write(t('loggers.error.must_be_dict', typeof = type(query), operation = Operations.PUSH.value), LogLevel.ERROR)    
+            return None
+        
+        if not query:
+            self.logger.write(t('loggers.error.empty_query', operation = Operations.PUSH.value), LogLevel.ERROR)
+            return None
+
+        ttl: float | None = self.ttl if ttl is None else ttl
+
+        return { **query, EXPIRES : time.time() + ttl } if ttl is not None else query
+
+    def __validate_update(self, query: dict[str, Any], ttl: float | None = None) -> dict[str, Any] | None:
+        '''`Returns the changes with the primary key cast or None if they are rejected, a new lifetime is counted from now`'''
+        if not isinstance(query, dict): 
+            self.logger.write(t('loggers.error.must_be_dict', typeof = type(query), operation = Operations.UPDATE.value), LogLevel.ERROR)    
+            return None
+        
+        if self.__primary_key not in query: 
+            self.logger.write(t('loggers.error.id_not_specified', query = query, operation = Operations.UPDATE.value), LogLevel.ERROR)
+            return None
+
+        try: changes: dict[str, Any] = { **query, self.__primary_key : self.__cast_id(query.get(self.__primary_key)) }
+
+        except (TypeError, ValueError):
+            self.logger.write(t('loggers.error.id_must_be_int', id = query.get(self.__primary_key), operation = Operations.UPDATE.value), LogLevel.ERROR)
+            return None
+
+        return { **changes, EXPIRES : time.time() + ttl } if ttl is not None else changes
+
+    def __validate_delete(self, id: int) -> int | None:
+        '''`Returns the primary key to delete or None if it is rejected`'''
+        if not isinstance(id, int):
+            self.logger.write(t('loggers.error.id_must_be_int', id = id, operation = Operations.DELETE.value), LogLevel.ERROR)
+            return None
+
+        return self.__cast_id(id)
+
+    def __apply_push(self, dataset: Dataset | None, query: dict[str, Any], identifier: int | None = None) -> tuple[int | None, dict[str, Any] | None]:
+        '''`Adds a copy of the object with a new (or reserved) id to the dataset, returns the id and the journal entry`'''
+        if identifier is not None and dataset is not None and identifier in dataset: return None, None
+
+        if identifier is None: identifier = self.__get_id()
+
+        while dataset is not None and identifier in dataset: identifier = self.__get_id()
+
+        record: dict[str, Any] = copy_record({ self.__primary_key : identifier, **query })
+
+        if dataset is not None: dataset.push(record)
+
+        return identifier, { 'op' : 'push', 'record' : record }
+
+    def __apply_update(self, dataset: Dataset, record: dict[str, Any]) -> tuple[int | None, dict[str, Any] | None]:
+        '''`Merges a copy of the changes into the object of the dataset, so the caller keeps its own objects, returns the id and the journal entry`'''
+        record = copy_record(record)
+
+        if dataset.update(record) is None:
+            self.logger.write(t('loggers.error.nothing_to_update', query = record, operation = Operations.UPDATE.value), LogLevel.ERROR)
+            return None, None
+
+        return record.get(self.__primary_key), { 'op' : 'update', 'record' : record }
+
+    def __apply_delete(self, dataset: Dataset, id: int) -> tuple[dict[str, Any] | None, dict[str, Any] | None]:
+        '''`Removes the object from the dataset, returns the object and the journal entry`'''
+        deleted_item: dict[str, Any] | None = dataset.delete(id)
+
+        if not deleted_item:
+            self.logger.write(t('loggers.error.id_not_found', id = id, operation = Operations.DELETE.value), LogLevel.ERROR)
+            return None, None
+
+        return deleted_item, { 'op' : 'delete', 'id' : id }
+
+    def __apply_expire(self, dataset: Dataset, operand: tuple[Any, float]) -> tuple[dict[str, Any] | None, dict[str, Any] | None]:
+        '''`Removes the object if it is still expired at the moment of the sweep, its lifetime may have been renewed meanwhile`'''
+        id, now = operand
+
+        record: dict[str, Any] | None = dataset.get(id)
+
+        if record is None or not is_expired(record, now): return None, None
+
+        return self.__apply_delete(dataset, id)
+
+    def __change(self, dataset: Dataset | None, result: Any, entry: dict[str, Any]) -> Change:
+        '''`Describes the applied journal entry for the change feed: a deleted object has no new state, so watchers match their query against the old one`'''
+        if entry.get('op') == 'push':   return 'push',   result,          entry.get('record'), entry.get('record')
+        if entry.get('op') == 'delete': return 'delete', entry.get('id'), None,                result
+
+        record: dict[str, Any] | None = dataset.get(result)
+
+        return 'update', result, record, record
+
+    def __write(self, operations: list[tuple[str, Any]]) -> list[Any]:
+        '''
+        `Applies the operations one by one and stores all of them with a single write, rejected operations get None (lock must be held)`
+
+        Pushes in log storage are appended without reading the database when its resident copy is not at hand, so new ids cannot be checked against it.
+        A push in log storage holds the lock until the millisecond of its last id has passed: ids are generated under the lock, so ids of later writers
+        of any process are greater and never repeat one written before, even if the processes share the node of their ids.
+
+        If the write fails (an object that cannot be serialized), nothing of it is stored and the operations are written one by one,
+        so only the failing one gets None and not the other callers whose operations were coalesced with it.
+
+        arguments
+            - operations (list) <- (`push` | `update` | `delete`, validated query or id) pairs, None instead of a rejected query
+
+        @returns {results: list[any]} <- id of every pushed and updated object, every deleted object, in the same order
+        '''
+        kinds: dict[str, Operations] = { 'push' : Operations.PUSH, 'update' : Operations.UPDATE, 'delete' : Operations.DELETE, 'expire' : Operations.EXPIRE }
+        apply: dict[str, Callable]   = { 'push' : self.__apply_push, 'update' : self.__apply_update, 'delete' : self.__apply_delete, 'expire' : self.__apply_expire }
+
+        stored: bool = False
+
+        try:
+            pushes:  bool           = all(op == 'push' for op, _ in operations)
+            dataset: Dataset | None = self.__cached() if self.storage is Storage.LOG and pushes else self.__load(writable = True)
+
+            results: list[Any]                       = []
+            entries: list[dict[str, Any]]            = []
+            changes: list[Change]                    = []
+            written: dict[str, list[dict[str, Any]]] = { op: [] for op, _ in operations }
+
+            for op, operand in operations:
+                result, entry = apply[op](dataset, operand) if operand is not None else (None, None)
+
+                results.append(result)
+
+                if entry:
+                    entries.append(entry)
+                    changes.append(self.__change(dataset, result, entry))
+                    written[op].append(entry)
+
+            if entries:
+                self.__plan_sweep(dataset, entries)
+                self.__persist(dataset, entries)
+                stored = True
+                self.__feed.publish(changes)
+
+            pushed: list[int] = [entry.get('record').get(self.__primary_key) for entry in entries if entry.get('op') == 'push']
+
+            if self.storage is Storage.LOG and pushed: wait_past_id(max(pushed))
+
+            for op, part in written.items():
+                if not part: continue
+
+                if op in ('delete', 'expire'): self.logger.write(t('loggers.success.deleted',   id     = [entry.get('id')     for entry in part], operation = kinds[op].value), LogLevel.SUCCESS)
+                else:                          self.logger.write(t('loggers.success.completed', result = [entry.get('record') for entry in part], operation = kinds[op].value), LogLevel.SUCCESS)
+
+            return results
+
+        except Exception as error:
+            self.__invalidate()
+
+            if len(operations) > 1 and not stored: return [self.__write([operation])[0] for operation in operations]
+
+            self.logger.write(t('loggers.error.operation_failed', error = error, operation = kinds[operations[0][0]].value), LogLevel.ERROR)
+            return [None] * len(operations)
+
+    def __plan_sweep(self, dataset: Dataset | LinesDataset | None, entries: list[dict[str, Any]]) -> None:
+        '''`Makes the sweeper run when the earliest of the written objects expires (lock must be held)`'''
+        if self.resident and isinstance(dataset, Dataset): dataset.prune_expiry()
+
+        for entry in entries:
+            if entry.get('record'): self.__expect(expiry(entry.get('record')))
+
+    def __find_expired(self, now: float) -> tuple[list[Any], float | None]:
+        '''`Returns the primary keys of the objects expired by the moment and the moment the next one expires at, the resident dataset keeps them in a heap (lock must be held)`'''
+        if self.resident: return self.__load(expired = True).expired(now)
+
+        identifiers: list[Any]    = []
+        upcoming:    float | None = None
+
+        for record in self.__records(expired = True):
+            expires: float | None = expiry(record)
+
+            if expires is None: continue
+
+            if expires <= now:                             identifiers.append(record.get(self.__primary_key))
+            elif upcoming is None or expires < upcoming: upcoming = expires
+
+        return identifiers, upcoming
+
+    async def __sweep(self) -> None:
+        '''`Deletes the expired objects with a single write whenever some expire, at most once per sweep interval, until no object is going to expire`'''
+        interval: float = app_data.get('ttl').get('sweep_interval')
+        last:     float = float('-inf')
+
+        while self.__sweep_at is not None:
+            delay: float = max(self.__sweep_at, last + interval) - time.time()
+
+            if delay > 0:
+                await asyncio.sleep(min(delay, interval))
+                continue
+
+            self.__sweep_at = None
+
+            last = now = time.time()
+
+            try:
+                identifiers, upcoming = await self.__run(lambda: self.__find_expired(now), shared = True)
+
+                self.__expect(upcoming)
+
+                if identifiers: await self.__run(lambda: self.__write([('expire', (id, now)) for id in identifiers]))
+
+            except Exception as error:
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.EXPIRE.value), LogLevel.ERROR)
+                return None
+
+    def __stop_sweep(self) -> None:
+        '''`Stops the sweeper, expired objects are still hidden from reads`'''
+        self.__sweep_at = None
+
+        if self.__sweeper is not None: self.__sweeper.cancel()
+
+    def __schedule_sweep(self) -> None:
+        '''`Starts the sweeper in the background if an object is going to expire`'''
+        if self.__sweep_at is not None and not (self.__sweeper and not self.__sweeper.done()):
+            self.__sweeper = asyncio.get_running_loop().create_task(self.__sweep())
+
+    def __journal_outgrown(self) -> bool:
+        '''`Checks if the journal has outgrown the database file and should be compacted`'''
+        journal_size: int = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+
+        return journal_size >= max(app_data.get('journal').get('compaction_min_size'), os.path.getsize(self.filename))
+
+    async def __run(self, function: Callable[[], Any], shared: bool = False) -> Any:
+        '''
+        `Runs the function holding the database lock in a worker thread, so file I/O never blocks the event loop`
+
+        The asyncio lock makes coroutines of this process wait for their turn without blocking, the file lock guards against other processes.
+        Both locks are readers-writer locks: shared functions (reads) run together, the others (writes) run alone.
+        In snapshot storage reads take no lock at all and never wait for writes, see `__lock_free`.
+        '''
+        if shared and self.__lock_free(): result: Any = await asyncio.to_thread(function)
+
+        else:
+            async with (self.__guard.read() if shared else self.__guard.write()):
+                result: Any = await asyncio.to_thread(self.__locked, function, shared)
+
+        self.__schedule_compaction()
+        self.__schedule_sweep()
+
+        return result
+
+    def __schedule_compaction(self) -> None:
+        '''`Starts compaction in the background if the last write made it due`'''
+        if self.__compaction_due and not (self.__compaction and not self.__compaction.done()):
+            self.__compaction_due = False
+            self.__compaction     = asyncio.get_running_loop().create_task(self.compact())
+
+    def __locked(self, function: Callable[[], Any], shared: bool = False) -> Any:
+        '''`Runs the function holding the file lock, a read that has to change the files first (converting them to lines) takes the exclusive lock`'''
+        if shared:
+            with self.lock.shared():
+                if self.__readable(): return function()
+
+        with self.lock.exclusive(): return function()
+
+    def __lock_free(self) -> bool:
+        '''
+        `Checks if reads can skip the locks`
+
+        In snapshot storage a write prepares a copy of the resident dataset and a new file, then publishes both at once with `os.replace`,
+        so a reader sees either the previous or the next snapshot. A journal left by a log mode handle is replayed under the lock.
+        '''
+        return self.storage is Storage.SNAPSHOT and REPLACE_WHILE_OPEN and not os.path.exists(self.journal_path)
+
+    def __readable(self) -> bool:
+        '''`Checks if the database can be read without changing its files (lock must be held)`'''
+        return self.storage is not Storage.LINES or (self.__lines.ready() and not os.path.exists(self.journal_path))
+    
+
+    async def push(self, query: dict[str, Any] | Schema, ttl: float | None = None) -> int | None:
+        '''
+        `Adds an object with the given fields to the database`
+
+        Objects pushed, updated and deleted at the same moment by concurrent callers are written together with a single write.
+        An object with a lifetime gets the `_expires` field, it is hidden from reads once it expires and deleted by the sweeper soon after.
+
+        arguments
+            - query (dict[str, any]) <- the key-value dictionary to be added to the database
+            - ttl   (float)          <- seconds the object lives, the `ttl` of the database by default
+
+        @returns {id: int}
+        '''
+        if not self.__check_ttl(ttl, Operations.PUSH): return None
+
+        if self.shards: return await self.shards[next(self.__turns)].push(query, ttl)
+
+        record: dict[str, Any] | None = self.__validate_push(query, ttl)
+
+        if record is None: return None
+
+        return await self.__writer.submit(('push', record))
+
+    async def push_many(self, queries: list[dict[str, Any] | Schema], ttl: float | None = None) -> list[int | None] | None:
+        '''
+        `Adds objects to the database in a single write`
+
+        arguments
+            - queries (list[dict[str, any]]) <- the key-value dictionaries to be added to the database
+            - ttl     (float)                <- seconds the objects live, the `ttl` of the database by default
+
+        @returns {ids: list[int | None]} <- id of every object in the same order, None for the rejected ones
+        '''
+        if not isinstance(queries, list):
+            self.logger.write(t('loggers.error.must_be_list', typeof = type(queries), operation = Operations.PUSH.value), LogLevel.ERROR)
+            return None
+
+        if not self.__check_ttl(ttl, Operations.PUSH): return None
+
+        if self.shards: return await self.__scatter(queries, lambda _: next(self.__turns), lambda shard, batch: shard.push_many(batch, ttl))
+
+        records: list[dict[str, Any] | None] = [self.__validate_push(query, ttl) for query in queries]
+
+        if not any(records): return [None] * len(records)
+
+        return await self.__run(lambda: self.__write([('push', record) for record in records]))
+
+    async def all(self, offset: int = 0, limit: int | None = None) -> list[dict[str, Any] | None]:
+        '''
+        `Get all objects from the database`
+
+        arguments
+            - offset (int) <- count of objects to skip
+            - limit  (int) <- maximum count of objects to return, the database file is then parsed incrementally and only the page is kept in memory
+
+        @returns {all_objects: list[dict[str, any]]}
+        '''
+        if not self.__check_page(offset, limit, Operations.ALL): return []
+
+        paged: bool = bool(offset) or limit is not None
+
+        if self.shards and not paged: return [record for records in await asyncio.gather(*(shard.all() for shard in self.shards)) for record in records]
+
+        if self.shards:
+            page: list[dict[str, Any]] = []
+
+            async with aclosing(self.__iterate({}, offset, Operations.ALL)) as records:
+                async for record in records:
+                    if limit is not None and len(page) >= limit: break
+
+                    page.append(record)
+
+            return page
+
+        def operation() -> list[dict[str, Any] | None]:
+            try: 
+                data: list[dict[str, Any]] = self.__detach(islice(self.__records(), offset, None if limit is None else offset + limit) if paged else self.__visible(self.__load()))
+                
+                self.logger.write(t('loggers.success.get_all', operation = Operations.ALL.value), LogLevel.SUCCESS)
+                
+                return data
+                
+            except Exception as error:
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.ALL.value), LogLevel.ERROR)
+                return []
+
+        return await self.__run(operation, shared = True)
+
+    async def iter_all(self, offset: int = 0) -> AsyncIterator[dict[str, Any]]:
+        '''
+        `Yields all objects of the database, the file is parsed incrementally and read in batches, so memory use does not depend on the size of the database`
+
+        arguments
+            - offset (int) <- count of objects to skip
+
+        @yields {object: dict[str, any]}
+        '''
+        if not self.__check_page(offset, None, Operations.ALL): return
+
+        async with aclosing(self.__iterate({}, offset, Operations.ALL)) as records:
+            async for record in records: yield record
+
+    async def get(self, query: dict[str, Any] | Query, offset: int = 0, limit: int | None = None, sort: str | list[str] | None = None, projection: list[str] | None = None) -> list[dict[str, Any] | None] | None:
+        '''
+        `Get object/s from the database by query`
+
+        Results are cached for every database file and shared by all handles of it in this process, a repeated search returns
+        a copy of the cached result until the database is changed (by any process) or one of the found objects expires.
+
+        arguments
+            - query      (dict[str, any]) <- the key-value dictionary to find in database, values may be operators like `{ '$gt' : 5 }` and keys dotted paths like `address.city`
+            - offset     (int)            <- count of matching objects to skip
+            - limit      (int)            <- maximum count of objects to return, without an index the database file is then parsed incrementally and only the page is kept in memory
+            - sort       (str | list)     <- field or fields to sort by, `-field` sorts from the greatest value
+            - projection (list[str])      <- fields to return, the primary key is always returned
+
+        @returns {object/s: list[dict[str, any]]}
+        '''
+        query: dict[str, Any] | None = self.__validate_query(query, Operations.GET)
+
+        if query is None or not self.__check_page(offset, limit, Operations.GET): return None
+
+        order: list[tuple[str, bool]] | None = self.__parse_sort(sort, Operations.GET)
+
+        if order is None: return None
+
+        if projection is not None and not (isinstance(projection, list) and all(isinstance(field, str) for field in projection)):
+            self.logger.write(t('loggers.error.invalid_projection', projection = projection, operation = Operations.GET.value), LogLevel.ERROR)
+            return None
+
+        stop:  int | None = None if limit is None else offset + limit
+        paged: bool       = bool(offset) or limit is not None
+
+        if self.shards and len(targets := self.__target_shards(query)) == 1: return await targets[0].get(query, offset, limit, sort, projection)
+
+        def report(result: list[dict[str, Any]]) -> list[dict[str, Any]]:
+            if not result: self.logger.write(t('loggers.warning.no_matches', query = query,   operation = Operations.GET.value), LogLevel.WARNING)
+            else:          self.logger.write(t('loggers.success.completed',  result = result, operation = Operations.GET.value), LogLevel.SUCCESS)
+
+            return result
+
+        key:     str | None      = make_key(Operations.GET.value, query, offset, limit, order, projection)
+        version: Hashable | None = self.__version() if key is not None else None
+
+        if version is not None and (cached := self.__cache.get(key, version)) is not None: return report(cached)
+
+        def operation(scanned: list[list[dict[str, Any]]] | None = None) -> list[dict[str, Any] | None] | None:
+            try:
+                if scanned is None: matches: Iterable[dict[str, Any]] = self.__stream(query, order) if paged else self.__match(self.__load(), query, order)
+
+                else:
+                    matches = [record for records in scanned for record in records]
+
+                    if order: matches = sort_records(matches, order)
+
+                records: list = self.__detach(islice(matches, offset, stop))
+                result:  list = records if projection is None else [project(record, [self.__primary_key, *projection]) for record in records]
+
+                if version is not None: self.__cache.put(key, version, result, min((expires for record in records if (expires := expiry(record)) is not None), default = None))
+
+                return report(result)
+            
+            except Exception as error:
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.GET.value), LogLevel.ERROR)
+                return None
+
+        if not self.shards: return await self.__run(operation, shared = True)
+
+        try: return operation(await self.__fan_out(query, limit = stop, sort = order))
+
+        except Exception as error:
+            self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.GET.value), LogLevel.ERROR)
+            return None
+
+    async def iter_get(self, query: dict[str, Any] | Query, offset: int = 0) -> AsyncIterator[dict[str, Any]]:
+        '''
+        `Yields objects matching the query, they are read in batches and without an index the file is parsed incrementally`
+
+        arguments
+            - query  (dict[str, any]) <- the key-value dictionary to find in database
+            - offset (int)            <- count of matching objects to skip
+
+        @yields {object: dict[str, any]}
+        '''
+        query: dict[str, Any] | None = self.__validate_query(query, Operations.GET)
+
+        if query is None or not self.__check_page(offset, None, Operations.GET): return
+
+        async with aclosing(self.__iterate(query, offset, Operations.GET)) as records:
+            async for record in records: yield record
+
+    async def explain(self, query: dict[str, Any] | Query, sort: str | list[str] | None = None) -> dict[str, Any] | None:
+        '''
+        `Shows how the objects of the query are found: the chosen index or a scan, and how many objects had to be checked`
+
+        arguments
+            - query (dict[str, any]) <- the key-value dictionary to find in database
+            - sort  (str | list)     <- field or fields to sort by, an ordered index may return the objects already sorted
+
+        @returns {plan: dict[str, any]} <- { 'plan' : str, 'fields' : list[str], 'sorted_by_index' : bool, 'candidates' : int, 'matches' : int }
+        '''
+        query: dict[str, Any] | None = self.__validate_query(query, Operations.EXPLAIN)
+
+        if query is None: return None
+
+        order: list[tuple[str, bool]] | None = self.__parse_sort(sort, Operations.EXPLAIN)
+
+        if order is None: return None
+
+        if self.shards:
+            plans: list[dict[str, Any] | None] = await asyncio.gather(*(shard.explain(query, sort) for shard in self.__target_shards(query)))
+
+            if None in plans: return None
+
+            return {
+                'plan'       : 'shards',
+                'shards'     : plans,
+                'candidates' : sum(plan.get('candidates') for plan in plans),
+                'matches'    : sum(plan.get('matches') for plan in plans)
+            }
+
+        def operation() -> dict[str, Any] | None:
+            try:
+                dataset:   Dataset                           = self.__load()
+                plan:      Plan                              = self.__plan(dataset, query, order)
+                predicate: Callable[[dict[str, Any]], bool] = compile_query(query)
+
+                candidates: int = 0
+                matches:    int = 0
+
+                for record in self.__candidates(dataset, plan):
+                    candidates += 1
+                    matches    += predicate(record)
+
+                result: dict[str, Any] = { **plan.explain(), 'candidates' : candidates, 'matches' : matches }
+
+                self.logger.write(t('loggers.success.completed', result = result, operation = Operations.EXPLAIN.value), LogLevel.SUCCESS)
+
+                return result
+
+            except Exception as error:
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.EXPLAIN.value), LogLevel.ERROR)
+                return None
+
+        return await self.__run(operation, shared = True)
+
+    async def range(self, field: str, start: Any = None, end: Any = None, query: dict[str, Any] | Query | None = None, reverse: bool = False, limit: int | None = None, cursor: str | None = None) -> dict[str, Any] | None:
+        '''
+        `Get objects whose field lies between start and end, sorted by the field and split into pages`
+
+        arguments
+            - field   (str)            <- name of the field to sort by, declare it with `create_index(field, ordered = True)`
+            - start   (int | str)      <- lower bound (inclusive), None for no bound
+            - end     (int | str)      <- upper bound (inclusive), None for no bound
+            - query   (dict[str, any]) <- the key-value dictionary the objects must also match
+            - reverse (bool)           <- sort from the greatest value
+            - limit   (int)            <- maximum count of objects in the page
+            - cursor  (str)            <- cursor returned with the previous page
+
+        @returns {page: dict[str, any]} <- { 'records' : list[dict[str, any]], 'cursor' : str | None }
+        '''
+        query: dict[str, Any] = (query() if isinstance(query, Query) else query) or {}
+
+        if not isinstance(query, dict): 
+            self.logger.write(t('loggers.error.must_be_dict', typeof = type(query), operation = Operations.RANGE.value), LogLevel.ERROR)    
+            return None
+
+        if not isinstance(field, str):
+            self.logger.write(t('loggers.error.field_must_be_str', typeof = type(field), operation = Operations.RANGE.value), LogLevel.ERROR)
+            return None
+
+        if not self.__check_query(query, Operations.RANGE) or not self.__check_page(0, limit, Operations.RANGE): return None
+
+        if any(bound is not None and order_key(bound) is None for bound in (start, end)):
+            self.logger.write(t('loggers.error.bound_not_ordered', start = start, end = end, operation = Operations.RANGE.value), LogLevel.ERROR)
+            return None
+
+        if self.shards:
+            pages: list[dict[str, Any] | None] = await asyncio.gather(*(shard.range(field, start, end, query, reverse, limit, cursor) for shard in self.shards))
+
+            if None in pages: return None
+
+            merged: list[tuple[tuple, dict[str, Any]]] = list(heapq.merge(
+                *([((*order_key(record.get(field)), record.get(self.__primary_key)), record) for record in page.get('records')] for page in pages),
+                key     = lambda item: item[0],
+                reverse = reverse
+            ))
+
+            selected: list[tuple[tuple, dict[str, Any]]] = merged[:limit] if limit is not None else merged
+            more:     bool                               = len(merged) > len(selected) or any(page.get('cursor') for page in pages)
+
+            return {
+                'records' : [record for _, record in selected],
+                'cursor'  : encode_cursor(selected[-1][0]) if more and selected else None
+            }
+
+        def operation() -> dict[str, Any] | None:
+            try:
+                after: tuple | None = tuple(decode_cursor(cursor)) if cursor else None
+
+                records:   list[dict[str, Any]]             = []
+                last:      tuple | None                     = None
+                predicate: Callable[[dict[str, Any]], bool] = compile_query(query)
+                dataset:   Dataset | LinesDataset           = self.__load()
+                now:       float                            = time.time()
+
+                for key, record in dataset.range(field, start, end, reverse, after):
+                    if not predicate(record) or (isinstance(dataset, LinesDataset) and is_expired(record, now)): continue
+
+                    if limit is not None and len(records) >= limit: break
+
+                    records.append(record)
+                    last = key
+
+                else: last = None
+
+                self.logger.write(t('loggers.success.completed', result = records, operation = Operations.RANGE.value), LogLevel.SUCCESS)
+
+                return {
+                    'records' : self.__detach(records),
+                    'cursor'  : encode_cursor(last) if last is not None else None
+                }
+
+            except Exception as error:
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.RANGE.value), LogLevel.ERROR)
+                return None
+
+        return await self.__run(operation, shared = True)
+
+    async def update(self, query: dict[str, Any], ttl: float | None = None) -> None | int:
+        '''
+        `Update object in the database`
 
-class Moonlight:
-    '''Moonlight json database class'''
-    def __init__(self, filename: str, author: str = app_data.get('self_admin'), console_show: bool = True) -> None:
+        arguments
+            - query (dict[str, any]) <- the key-value dictionary to change in object in database (`id` in `query` required!)
+            - ttl   (float)          <- seconds the object lives from now on, the lifetime is kept by default
+
+        @returns {id: int}
+        '''
+        if not self.__check_ttl(ttl, Operations.UPDATE): return None
+
+        if self.shards: return await self.shards[self.__route(query.get(self.__primary_key) if isinstance(query, dict) else None)].update(query, ttl)
+
+        query: dict[str, Any] | None = self.__validate_update(query, ttl)
+
+        if query is None: return None
+
+        return await self.__writer.submit(('update', query))
+
+    async def update_many(self, queries: list[dict[str, Any]], ttl: float | None = None) -> list[int | None] | None:
         '''
+        `Update objects in the database in a single write`
+
         arguments
-            - filename (str) <- relative path to database .json-file
-            - author   (str) <- creator of database
+            - queries (list[dict[str, any]]) <- the key-value dictionaries to change in objects in database (`id` in every query required!)
+            - ttl     (float)                <- seconds the objects live from now on, the lifetimes are kept by default
+
+        @returns {ids: list[int | None]} <- id of every updated object in the same order, None for the rejected ones
         '''
-        self.filename:  str = make_database_path(filename)
-        self.logs_path: str = make_logging_path(filename)
-        self.name:      str = get_filename_from_path(self.filename)
-        
-        init_database(self.filename)
+        if not isinstance(queries, list):
+            self.logger.write(t('loggers.error.must_be_list', typeof = type(queries), operation = Operations.UPDATE.value), LogLevel.ERROR)
+            return None
 
-        self.database_id: int = Methods.create_database(self.name, self.filename, self.logs_path, author).get('id')
+        if not self.__check_ttl(ttl, Operations.UPDATE): return None
 
-        self.__primary_key: str = 'id'
+        if self.shards: return await self.__scatter(queries, lambda query: self.__route(query.get(self.__primary_key) if isinstance(query, dict) else None), lambda shard, batch: shard.update_many(batch, ttl))
 
-        self.lock = FileLock(f'{self.filename}.lock')
+        queries: list[dict[str, Any] | None] = [self.__validate_update(query, ttl) for query in queries]
 
-        self.log_levels: list[LogLevel] = [LogLevel[level.upper()] for level in config.get('loggers') if level.upper() in LogLevel.__members__]
-        self.logger: Logger = Logger(self.logs_path, self.log_levels, console_show) 
-        
-        self.logger.write(t('loggers.info.database_connect', name = app_data.get('name')), LogLevel.INFO)
+        if not any(queries): return [None] * len(queries)
 
-    def __get_id(self) -> int:           return int(generate_uuid())
-    def __cast_id(self, id: int) -> int: return int(id)
-    def __get_load_func(self):           return json.load
-    def __get_dump_func(self):           return json.dump
-    def __truncate(self, file) -> None:
-        file.seek(0)
-        file.truncate()
-    
+        return await self.__run(lambda: self.__write([('update', query) for query in queries]))
 
-    async def push(self, query: dict[str, Any] | Schema) -> int | None:
+    async def delete(self, id: int) -> dict[str, Any] | None:
         '''
-        `Adds an object with the given fields to the database`
+        `Remove object from the database`
 
         arguments
-            - query (dict[str, any]) <- the key-value dictionary to be added to the database
+            - id (int) <- primary key of object in database to delete
 
-        @returns {id: int}
+        @returns {object: dict[str, any]}
         '''
-        query: dict[str, Any] = query() if isinstance(query, Schema) else query
+        if self.shards: return await self.shards[self.__route(id)].delete(id)
 
-        if not isinstance(query, dict): 
-            self.logger.write(t('loggers.error.must_be_dict', typeof = type(query), operation = Operations.PUSH.value), LogLevel.ERROR)    
-            return None
-        
-        if not query:
-            self.logger.write(t('loggers.error.empty_query', operation = Operations.PUSH.value), LogLevel.ERROR)
-            return None
+        id: int | None = self.__validate_delete(id)
 
-        with self.lock:
-            try:
-                with open(self.filename, 'r+', encoding = 'utf-8') as database_file:
-                    database_data: dict[str, list] = self.__get_load_func()(database_file)
+        if id is None: return None
 
-                    identifier: int = self.__get_id()
-                    query: dict[str, Any] = { self.__primary_key : identifier, **query }
+        return await self.__writer.submit(('delete', id))
 
-                    database_data['data'].append(query)
+    async def delete_many(self, ids: list[int]) -> list[dict[str, Any] | None] | None:
+        '''
+        `Remove objects from the database in a single write`
 
-                    self.__truncate(database_file)
+        arguments
+            - ids (list[int]) <- primary keys of objects in database to delete
 
-                    self.__get_dump_func()(database_data, database_file, indent = 4, ensure_ascii = False)
+        @returns {objects: list[dict[str, any] | None]} <- every deleted object in the same order, None for the missing ones
+        '''
+        if not isinstance(ids, list):
+            self.logger.write(t('loggers.error.must_be_list', typeof = type(ids), operation = Operations.DELETE.value), LogLevel.ERROR)
+            return None
 
-                    self.logger.write(t('loggers.success.completed', result = query, operation = Operations.PUSH.value), LogLevel.SUCCESS)
+        if self.shards: return await self.__scatter(ids, self.__route, lambda shard, batch: shard.delete_many(batch))
 
-                    return identifier
-            
-            except Exception as error:
-                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.PUSH.value), LogLevel.ERROR)
-                return None
+        ids: list[int | None] = [self.__validate_delete(id) for id in ids]
+
+        if all(id is None for id in ids): return [None] * len(ids)
+
+        return await self.__run(lambda: self.__write([('delete', id) for id in ids]))
 
-    async def all(self) -> list[dict[str, Any] | None]:
+    async def watch(self, query: dict[str, Any] | Query | None = None, generation: int | None = None) -> AsyncIterator[dict[str, Any]]:
         '''
-        `Get all objects from the database`
+        `Yields the changes of the database as they are written: pushes, updates and deletes made by handles of this process`
 
-        @returns {all_objects: list[dict[str, any]]}
+        Every change is a dictionary with `op` (`push`, `update` or `delete`), `id`, `record` (the object after the change, None after a delete)
+        and `generation` (number of the change). A watcher that was interrupted passes the last generation it has seen to get the changes made since.
+        Only the latest changes are kept: if the changes after the generation are gone, a `reset` change with the current generation is yielded
+        first and the watcher should read the database again.
+
+        Changes of other processes (e.g. other workers of the server) are not known one by one: the files are checked every `watch.poll_interval` seconds
+        and a change made to them by another process is yielded as a `reset` change too.
+
+        arguments
+            - query      (dict[str, any]) <- only changes of objects matching the query, a deleted object is matched as it was before the delete
+            - generation (int)            <- yield the changes made after this generation, by default only new changes
+
+        @yields {change: dict[str, any]}
         '''
-        with self.lock:
-            try: 
-                with open(self.filename, 'r', encoding = 'utf-8') as database_file:
-                    database_data: dict[str, list] = self.__get_load_func()(database_file)
-                    data: list[dict[str, Any]]     = database_data.get('data', [])
-                    
-                    self.logger.write(t('loggers.success.get_all', operation = Operations.ALL.value), LogLevel.SUCCESS)
-                    
-                    return data
-                
-            except Exception as error:
-                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.ALL.value), LogLevel.ERROR)
-                return []
+        if query is not None and not (isinstance(query, dict) and not query):
+            query = self.__validate_query(query, Operations.WATCH)
+
+            if query is None: return
+
+        if generation is not None and (isinstance(generation, bool) or not isinstance(generation, int) or generation < 0):
+            self.logger.write(t('loggers.error.invalid_generation', generation = generation, operation = Operations.WATCH.value), LogLevel.ERROR)
+            return
+
+        await self.__poll()
+
+        matches:  Callable[[dict[str, Any]], bool] | None = compile_query(query) if query else None
+        position: int                                     = self.__feed.generation if generation is None else generation
+        interval: float                                   = app_data.get('watch').get('poll_interval')
+        polled:   float                                   = time.monotonic()
+
+        while True:
+            events: list[tuple[dict[str, Any], dict[str, Any] | None]] | None = self.__feed.since(position)
+
+            if events is None:
+                current: int = self.__feed.generation
+
+                self.logger.write(t('loggers.warning.changes_missed', generation = position, current = current, operation = Operations.WATCH.value), LogLevel.WARNING)
+
+                position = current
+
+                yield { 'op' : 'reset', 'id' : None, 'record' : None, 'generation' : current }
+                continue
+
+            for event, subject in events:
+                position = event.get('generation')
+
+                if matches is None or event.get('op') == 'reset' or (subject is not None and matches(subject)): yield copy_record(event)
+
+            if events: continue
+
+            await self.__feed.wait(position, max(0, polled + interval - time.monotonic()))
+
+            if time.monotonic() - polled >= interval:
+                polled = time.monotonic()
+
+                await self.__poll()
 
-    async def get(self, query: dict[str, Any] | Query) -> list[dict[str, Any] | None] | None:
+    async def __poll(self) -> None:
+        '''`Checks if the files of the database were changed by another process, such a change reaches the watchers as a reset change`'''
+        def check() -> None:
+            for database in (self.shards or [self]):
+                with database.lock.shared():
+                    try:            self.__feed.check(database.filename, database.__get_stamp())
+                    except OSError: pass
+
+        await asyncio.to_thread(check)
+
+    def transaction(self) -> Transaction:
         '''
-        `Get object/s from the database by query`
+        `Starts a transaction, changes staged in the async with block are written at once when it exits`
 
-        arguments
-            - query (dict[str, any]) <- the key-value dictionary to find in database
+        Nothing is written if the block raises or any of the changes cannot be applied.
 
-        @returns {object/s: list[dict[str, any]]}
+        @returns {transaction: Transaction}
         '''
-        query: dict[str, Any] = query() if isinstance(query, Query) else query
+        return Transaction(self.__commit, self.__get_id)
 
-        if not isinstance(query, dict): 
-            self.logger.write(t('loggers.error.must_be_dict', typeof = type(query), operation = Operations.GET.value), LogLevel.ERROR)    
-            return None
-        
-        if not query:
-            self.logger.write(t('loggers.error.empty_query', operation = Operations.GET.value), LogLevel.ERROR)
+    async def __commit(self, operations: list[tuple[str, Any]]) -> list[Any] | None:
+        '''`Applies the staged operations of a transaction holding the locks of all touched files and writes them at once`'''
+        def validate_push(operand: tuple[int, Any]) -> tuple[int, dict[str, Any]] | None:
+            record: dict[str, Any] | None = self.__validate_push(operand[1])
+
+            return (operand[0], record) if record is not None else None
+
+        validate: dict[str, Callable[[Any], Any]] = {
+            'push'   : validate_push,
+            'update' : self.__validate_update,
+            'delete' : self.__validate_delete
+        }
+
+        operands: list[Any] = [validate[op](operand) for op, operand in operations]
+
+        if any(operand is None for operand in operands):
+            self.logger.write(t('loggers.error.transaction_aborted', operation = Operations.TRANSACTION.value), LogLevel.ERROR)
             return None
 
-        with self.lock:
+        parts: dict[int, list[int]] = {}
+
+        for position, ((op, _), operand) in enumerate(zip(operations, operands)):
+            match op:
+                case 'push':   id: Any = operand[0]
+                case 'update': id: Any = operand.get(self.__primary_key)
+                case 'delete': id: Any = operand
+
+            parts.setdefault(self.__route(id) if self.shards else 0, []).append(position)
+
+        databases: list[Moonlight] = [self.shards[index] if self.shards else self for index in sorted(parts)]
+        positions: list[list[int]] = [parts[index] for index in sorted(parts)]
+
+        def operation() -> list[Any] | None:
             try:
-                with open(self.filename, 'r', encoding = 'utf-8') as database_file:
-                    database_data: dict[str, list] = self.__get_load_func()(database_file)
+                with ExitStack() as stack:
+                    for database in databases: stack.enter_context(database.lock.exclusive())
 
-                    result: list = [data for data in database_data.get('data', []) if all(data.get(key) == value for key, value in query.items())]
-                    
-                    if not result: self.logger.write(t('loggers.warning.no_matches', query = query,   operation = Operations.GET.value), LogLevel.WARNING)
-                    else:          self.logger.write(t('loggers.success.completed',  result = result, operation = Operations.GET.value), LogLevel.SUCCESS)
+                    prepared: list[tuple[Dataset, list[Any], list[dict[str, Any]], list[Change]]] = []
+
+                    for database, part in zip(databases, positions):
+                        applied: tuple[Dataset, list[Any], list[dict[str, Any]], list[Change]] | None = database.__prepare([operations[position] for position in part], [operands[position] for position in part])
+
+                        if applied is None:
+                            for database in databases: database.__invalidate()
+
+                            self.logger.write(t('loggers.error.transaction_aborted', operation = Operations.TRANSACTION.value), LogLevel.ERROR)
+                            return None
+
+                        prepared.append(applied)
+
+                    results: list[Any] = [None] * len(operations)
+
+                    for database, part, (dataset, applied_results, entries, _) in zip(databases, positions, prepared):
+                        database.__plan_sweep(dataset, entries)
+                        database.__persist(dataset, entries)
+
+                        for position, result in zip(part, applied_results): results[position] = result
+
+                for database, (_, _, _, changes) in zip(databases, prepared): database.__feed.publish(changes)
+
+                self.logger.write(t('loggers.success.completed', result = [entry for _, _, entries, _ in prepared for entry in entries], operation = Operations.TRANSACTION.value), LogLevel.SUCCESS)
+
+                return results
 
-                    return result
-            
             except Exception as error:
-                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.GET.value), LogLevel.ERROR)
+                for database in databases: database.__invalidate()
+
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.TRANSACTION.value), LogLevel.ERROR)
                 return None
 
-    async def update(self, query: dict[str, Any]) -> None | int:
-        '''
-        `Update object in the database`
+        async with AsyncExitStack() as stack:
+            for database in databases: await stack.enter_async_context(database.__guard.write())
 
-        arguments
-            - query (dict[str, any]) <- the key-value dictionary to change in object in database (`id` in `query` required!)
+            results: list[Any] | None = await asyncio.to_thread(operation)
 
-        @returns {id: int}
-        '''
-        if not isinstance(query, dict): 
-            self.logger.write(t('loggers.error.must_be_dict', typeof = type(query), operation = Operations.UPDATE.value), LogLevel.ERROR)    
-            return None
-        
-        if self.__primary_key not in query: 
-            self.logger.write(t('loggers.error.id_not_specified', query = query, operation = Operations.UPDATE.value), LogLevel.ERROR)
-            return None
-        
-        with self.lock:
-            try:
-                with open(self.filename, 'r+', encoding = 'utf-8') as database_file:
-                    database_data: dict[str, list] = self.__get_load_func()(database_file)
-                    data: list[dict[str, Any]]     = database_data.get('data', [])
+        for database in databases:
+            database.__schedule_compaction()
+            database.__schedule_sweep()
 
-                    updated: bool = False
+        return results
 
-                    for index, item in enumerate(data):
-                        if item.get(self.__primary_key) == self.__cast_id(query.get(self.__primary_key)):
-                            data[index].update(query)
-                            updated = True
+    def __prepare(self, operations: list[tuple[str, Any]], operands: list[Any]) -> tuple[Dataset, list[Any], list[dict[str, Any]], list[Change]] | None:
+        '''`Applies the staged operations to the dataset, returns the dataset, results, journal entries and feed changes or None if any of them cannot be applied (lock must be held)`'''
+        dataset: Dataset = self.__load(writable = True)
 
-                    if not updated:
-                        self.logger.write(t('loggers.error.nothing_to_update', query = query, operation = Operations.UPDATE.value), LogLevel.ERROR)
-                        return None
+        results: list[Any]            = []
+        entries: list[dict[str, Any]] = []
+        changes: list[Change]         = []
 
-                    self.__truncate(database_file)
+        for (op, _), operand in zip(operations, operands):
+            match op:
+                case 'push':   result, entry = self.__apply_push(dataset, operand[1], operand[0])
+                case 'update': result, entry = self.__apply_update(dataset, operand)
+                case 'delete': result, entry = self.__apply_delete(dataset, operand)
 
-                    self.__get_dump_func()(database_data, database_file, indent = 4, ensure_ascii = False)
+            if entry is None:
+                self.__invalidate()
+                return None
+
+            results.append(result)
+            entries.append(entry)
+            changes.append(self.__change(dataset, result, entry))
+
+        return dataset, results, entries, changes
+
+    async def drop(self) -> None:
+        '''`Removes database file`'''
+        def remove(shard: Moonlight) -> None:
+            shard.__invalidate()
+            shard.__cache.clear()
+
+            Methods.delete_database(shard.name, shard.filename, shard.logs_path)
+
+        for database in (self, *self.shards): database.__stop_sweep()
 
-                    self.logger.write(t('loggers.success.completed', result = query, operation = Operations.UPDATE.value), LogLevel.SUCCESS)
+        for shard in self.shards: await shard.__run(lambda shard = shard: remove(shard))
 
-                    return query.get(self.__primary_key)
+        def operation() -> None:
+            try:
+                self.logger.stop()
+                self.__invalidate()
+                self.__cache.clear()
+
+                Methods.delete_database(self.name, self.filename, self.logs_path)
                 
+                self.logger.write(t('loggers.info.database_drop', operation = Operations.DROP.value), LogLevel.INFO)
+                    
             except Exception as error:
-                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.UPDATE.value), LogLevel.ERROR)
-                return None
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.DROP.value), LogLevel.ERROR)
 
-    async def delete(self, id: int) -> dict[str, Any] | None:
+        return await self.__run(operation)
+
+    async def compact(self) -> None:
+        '''`Merges the journal into the database file, in lines mode also drops the blanked lines`'''
+        if self.shards:
+            await asyncio.gather(*(shard.compact() for shard in self.shards))
+            return None
+
+        def operation() -> None:
+            try:
+                if not os.path.exists(self.journal_path) and not (self.storage is Storage.LINES and self.__lines.dead_size()): return None
+
+                dataset: Dataset | LinesDataset = self.__load(expired = True)
+
+                self.__save(dataset)
+
+                if self.resident and isinstance(dataset, Dataset): self.__publish(dataset, self.__get_stamp())
+
+                self.logger.write(t('loggers.success.compacted', operation = Operations.COMPACT.value), LogLevel.SUCCESS)
+
+            except Exception as error:
+                self.__invalidate()
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.COMPACT.value), LogLevel.ERROR)
+
+        return await self.__run(operation)
+
+    async def close(self) -> None:
+        '''`Compacts the journal and forgets the resident copy`'''
+        await self.compact()
+
+        for database in (self, *self.shards):
+            database.__stop_sweep()
+            database.__invalidate()
+
+    async def create_index(self, field: str, ordered: bool = False) -> None:
         '''
-        `Remove object from the database`
+        `Declares an index on the field, queries by this field will no longer scan the database`
 
         arguments
-            - id (int) <- primary key of object in database to delete
+            - field   (str)  <- name of the field to index
+            - ordered (bool) <- build an ordered index used by `range` instead of an equality index
+        '''
+        await self.__change_index({ 'op' : 'create_index', 'field' : field, 'ordered' : ordered })
 
-        @returns {object: dict[str, any]}
+    async def drop_index(self, field: str) -> None:
         '''
-        if not isinstance(id, int):
-            self.logger.write(t('loggers.error.id_must_be_int', id = id, operation = Operations.DELETE.value), LogLevel.ERROR)
+        `Removes the equality index from the field`
+
+        arguments
+            - field (str) <- name of the indexed field
+        '''
+        await self.__change_index({ 'op' : 'drop_index', 'field' : field })
+
+    async def __change_index(self, entry: dict[str, Any]) -> None:
+        if not isinstance(entry.get('field'), str):
+            self.logger.write(t('loggers.error.field_must_be_str', typeof = type(entry.get('field')), operation = Operations.INDEX.value), LogLevel.ERROR)
+            return None
+
+        if self.shards:
+            await asyncio.gather(*(shard.__change_index(entry) for shard in self.shards))
             return None
 
-        with self.lock:
+        def operation() -> None:
             try:
-                with open(self.filename, 'r+', encoding = 'utf-8') as database_file:
-                    database_data: dict[str, list] = self.__get_load_func()(database_file)
-                    data: list[dict[str, Any]]     = database_data.get('data', [])
+                dataset: Dataset = self.__load(writable = True)
 
-                    deleted_item: dict[str, Any] | None = next((item for item in data if item.get(self.__primary_key) == self.__cast_id(id)), None)
+                dataset.apply(entry)
 
-                    if not deleted_item:
-                        self.logger.write(t('loggers.error.id_not_found', id = id, operation = Operations.DELETE.value), LogLevel.ERROR)
-                        return None
-                    
-                    database_data['data'] = [item for item in data if item.get(self.__primary_key) != self.__cast_id(id)]
-                    
-                    self.__truncate(database_file)
-                    
-                    self.__get_dump_func()(database_data, database_file, indent = 4, ensure_ascii = False)
-                    
-                    self.logger.write(t('loggers.success.deleted', id = id, operation = Operations.DELETE.value), LogLevel.SUCCESS)
-                    
-                    return deleted_item
-            
-            except Exception as error:
-                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.DELETE.value), LogLevel.ERROR)
-                return None
-            
-    async def drop(self) -> None:
-        '''`Removes database file`'''
-        try:
-            self.lock.acquire()
-            self.logger.stop()
+                self.__persist(dataset, [entry])
 
-            Methods.delete_database(self.name, self.filename, self.logs_path)
-            
-            self.logger.write(t('loggers.info.database_drop', operation = Operations.DROP.value), LogLevel.INFO)
-                
-        except Exception as error:
-            self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.DROP.value), LogLevel.ERROR)
+                self.logger.write(t('loggers.success.indexes', indexes = dataset.indexes, ordered_indexes = dataset.ordered_indexes, operation = Operations.INDEX.value), LogLevel.SUCCESS)
+
+            except Exception as error:
+                self.__invalidate()
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.INDEX.value), LogLevel.ERROR)
 
-        finally:
-            self.lock.release()
+        return await self.__run(operation)
 
     async def contains(self, key: str, value: Any) -> bool:
         '''
@@ -273,12 +1604,9 @@ class Moonlight:
         @returns {contains: bool}
         '''
         try:
-            with self.lock:
-                with open(self.filename, 'r', encoding = 'utf-8') as database_file:
-                    database_data: dict[str, list] = self.__get_load_func()(database_file)
-                    data: list[dict[str, Any]]     = database_data.get('data', [])
+            if self.shards: return any(await self.__fan_out({ key: value }, True, 1))
 
-                    return any(record.get(key) == value for record in data)
+            return await self.__run(lambda: self.__count({ key: value }, 1) > 0, shared = True)
         
         except Exception as error:
             self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.CONTAINS.value), LogLevel.ERROR)
@@ -291,7 +1619,9 @@ class Moonlight:
         @returns {length: int}
         '''
         try:
-            return len(await self.all())
+            if self.shards: return sum(await asyncio.gather(*(shard.length() for shard in self.shards)))
+
+            return await self.__run(lambda: len(self.__load()), shared = True)
         
         except Exception as error:
             self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.LENGTH.value), LogLevel.ERROR)
@@ -308,13 +1638,158 @@ class Moonlight:
         @returns {count: int}
         '''
         try:
-            with self.lock:
-                with open(self.filename, 'r', encoding = 'utf-8') as database_file:
-                    database_data: dict[str, list] = self.__get_load_func()(database_file)
-                    data: list[dict[str, Any]]     = database_data.get('data', [])
+            if self.shards: return sum(await self.__fan_out({ key: value }, True))
 
-                    return sum(1 for record in data if data.get(key) == value) 
+            return await self.__run(lambda: self.__count({ key: value }), shared = True)
                 
         except Exception as error:
             self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.COUNT.value), LogLevel.ERROR)
-            return 0
\ No newline at end of file
+            return 0
+
+    def __count(self, query: dict[str, Any], limit: int | None = None) -> int:
+        '''`Counts records matching the query on the columnar copy if possible, otherwise scans until limit matches are found`'''
+        masked: tuple[Columns, Any] | None = self.__mask(query)
+
+        if masked is not None: return int(masked[1].sum())
+
+        matches: Iterator[dict[str, Any]] = self.__match(self.__load(), query)
+
+        return sum(1 for _ in (matches if limit is None else zip(matches, range(limit))))
+
+    async def sum(self, field: str, query: dict[str, Any] | Query | None = None) -> int | float | None:
+        '''
+        `Returns the sum of numeric values of the field`
+
+        arguments
+            - field (str)            <- name of the field
+            - query (dict[str, any]) <- the key-value dictionary the objects must match
+
+        @returns {sum: int | float}
+        '''
+        return await self.__aggregate(Aggregation.SUM, field, query)
+
+    async def min(self, field: str, query: dict[str, Any] | Query | None = None) -> int | float | None:
+        '''
+        `Returns the least numeric value of the field`
+
+        arguments
+            - field (str)            <- name of the field
+            - query (dict[str, any]) <- the key-value dictionary the objects must match
+
+        @returns {min: int | float | None}
+        '''
+        return await self.__aggregate(Aggregation.MIN, field, query)
+
+    async def max(self, field: str, query: dict[str, Any] | Query | None = None) -> int | float | None:
+        '''
+        `Returns the greatest numeric value of the field`
+
+        arguments
+            - field (str)            <- name of the field
+            - query (dict[str, any]) <- the key-value dictionary the objects must match
+
+        @returns {max: int | float | None}
+        '''
+        return await self.__aggregate(Aggregation.MAX, field, query)
+
+    async def avg(self, field: str, query: dict[str, Any] | Query | None = None) -> float | None:
+        '''
+        `Returns the average of numeric values of the field`
+
+        arguments
+            - field (str)            <- name of the field
+            - query (dict[str, any]) <- the key-value dictionary the objects must match
+
+        @returns {avg: float | None}
+        '''
+        return await self.__aggregate(Aggregation.AVG, field, query)
+
+    async def group_by(self, key: str, field: str | None = None, aggregation: Aggregation | str = Aggregation.COUNT, query: dict[str, Any] | Query | None = None) -> dict[Any, Any] | None:
+        '''
+        `Groups objects by the value of the key field and aggregates the field in every group`
+
+        arguments
+            - key         (str)            <- name of the field to group by, objects without it form the None group
+            - field       (str)            <- name of the aggregated field, not needed for `count`
+            - aggregation (Aggregation)    <- `count`, `sum`, `min`, `max` or `avg`
+            - query       (dict[str, any]) <- the key-value dictionary the objects must match
+
+        @returns {groups: dict[any, any]} <- aggregated value by the value of the key field
+        '''
+        if not isinstance(key, str):
+            self.logger.write(t('loggers.error.field_must_be_str', typeof = type(key), operation = Operations.AGGREGATE.value), LogLevel.ERROR)
+            return None
+
+        return await self.__aggregate(aggregation, field, query, key)
+
+    async def __aggregate(self, aggregation: Aggregation | str, field: str | None, query: dict[str, Any] | Query | None, key: str | None = None, partial: bool = False) -> Any:
+        '''`Aggregates on the columnar copy if possible, shards return partial results which are combined here`'''
+        query: dict[str, Any] = (query() if isinstance(query, Query) else query) or {}
+
+        if not isinstance(query, dict): 
+            self.logger.write(t('loggers.error.must_be_dict', typeof = type(query), operation = Operations.AGGREGATE.value), LogLevel.ERROR)    
+            return None
+
+        if not isinstance(aggregation, Aggregation) and aggregation not in Aggregation._value2member_map_:
+            self.logger.write(t('loggers.error.unknown_aggregation', aggregation = aggregation, aggregations = [member.value for member in Aggregation], operation = Operations.AGGREGATE.value), LogLevel.ERROR)
+            return None
+
+        aggregation: Aggregation = Aggregation(aggregation)
+
+        if not self.__check_query(query, Operations.AGGREGATE): return None
+
+        if not isinstance(field, str) and not (field is None and aggregation is Aggregation.COUNT):
+            self.logger.write(t('loggers.error.field_must_be_str', typeof = type(field), operation = Operations.AGGREGATE.value), LogLevel.ERROR)
+            return None
+
+        if self.shards:
+            try:
+                results: list[Any] = await asyncio.gather(*(shard.__aggregate(aggregation, field, query, key, True) for shard in self.shards))
+
+                if key is None: return combine(results, aggregation)
+
+                groups: dict[Any, list[Any]] = {}
+
+                for result in results:
+                    for group, value in result.items(): groups.setdefault(group, []).append(value)
+
+                return { group: combine(values, aggregation) for group, values in groups.items() }
+
+            except Exception as error:
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.AGGREGATE.value), LogLevel.ERROR)
+                return None
+
+        def operation() -> Any:
+            try:
+                columns: Columns | None = self.__get_columns()
+                mask:    Any            = columns.mask(query) if columns is not None and columns.supports(field, key) else None
+
+                if mask is not None:
+                    mask &= columns.alive(time.time())
+
+                    result: Any = columns.aggregate(aggregation, field, mask, partial) if key is None else columns.group_by(key, aggregation, field, mask, partial)
+
+                else:
+                    dataset: Dataset              = self.__load()
+                    records: list[dict[str, Any]] = list(self.__match(dataset, query) if query else self.__visible(dataset))
+
+                    if key is None: result = aggregate((record.get(field) for record in records), aggregation, partial)
+
+                    else:
+                        groups: dict[Any, list[Any]] = {}
+
+                        for record in records:
+                            try:              groups.setdefault(record.get(key), []).append(record.get(field))
+                            except TypeError: continue
+
+                        result = { group: aggregate(values, aggregation, partial) for group, values in groups.items() }
+
+                self.logger.write(t('loggers.success.completed', result = result, operation = Operations.AGGREGATE.value), LogLevel.SUCCESS)
+
+                return result
+
+            except Exception as error:
+                self.logger.write(t('loggers.error.operation_failed', error = error, operation = Operations.AGGREGATE.value), LogLevel.ERROR)
+                return None
+
+        return await self.__run(operation, shared = True)
@@ -0,0 +1,294 @@
+from functools import lru_cache
+from typing    import Any, Callable, Iterable
+from enum      import Enum
+
+import re
+
+from Moonlight.core.dataset import order_key
+
+
+MISSING: object = object()
+
+class Operator(Enum):
+    EQ:     str = '$eq'
+    NE:     str = '$ne'
+    GT:     str = '$gt'
+    GTE:    str = '$gte'
+    LT:     str = '$lt'
+    LTE:    str = '$lte'
+    IN:     str = '$in'
+    NIN:    str = '$nin'
+    EXISTS: str = '$exists'
+    REGEX:  str = '$regex'
+
+class PlanKind(Enum):
+    PRIMARY_KEY:   str = 'primary_key'
+    INDEX:         str = 'index'
+    ORDERED_INDEX: str = 'ordered_index'
+    COLUMNS:       str = 'columns'
+    SCAN:          str = 'scan'
+
+BOUNDS: dict[Operator, tuple[str, str]] = {
+    Operator.GT:  ('start', '>'),
+    Operator.GTE: ('start', '>='),
+    Operator.LT:  ('end',   '<'),
+    Operator.LTE: ('end',   '<=')
+}
+
+CACHE_SIZE: int = 256
+
+def is_operator(condition: Any) -> bool:
+    '''Checks if the condition of a field is a dictionary of operators like `{ '$gt' : 5 }` and not a value to compare with'''
+    if not isinstance(condition, dict) or not condition: return False
+
+    operators: int = sum(isinstance(key, str) and key.startswith('$') for key in condition)
+
+    if operators and operators != len(condition): raise ValueError(f'operators cannot be mixed with fields in {condition}')
+
+    return bool(operators)
+
+def equalities(condition: Any) -> list[Any] | None:
+    '''Returns the values a field must be equal to, None if the condition is not an equality, `$eq` or `$in`'''
+    if not is_operator(condition): return [condition]
+
+    if condition.keys() == { Operator.EQ.value }: return [condition.get(Operator.EQ.value)]
+    if condition.keys() == { Operator.IN.value } and isinstance(condition.get(Operator.IN.value), list): return condition.get(Operator.IN.value)
+
+    return None
+
+def get_path(record: dict[str, Any], path: str) -> Any:
+    '''Returns the value of the field, dotted paths walk into nested objects and lists, MISSING if there is no such field'''
+    if path in record: return record.get(path)
+
+    if '.' not in path: return MISSING
+
+    value: Any = record
+
+    for part in path.split('.'):
+        if isinstance(value, dict) and part in value:                              value = value.get(part)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value): value = value[int(part)]
+        else:                                                                       return MISSING
+
+    return value
+
+def compile_query(query: dict[str, Any]) -> Callable[[dict[str, Any]], bool]:
+    '''
+    Returns the predicate checking if a record matches every condition of the query, raises ValueError if the query is invalid
+
+    A condition is a value the field must be equal to or a dictionary of operators. Missing fields are equal to None.
+    The code of the predicate is generated once per shape of the query (fields and operators), queries differing only in values reuse it.
+    '''
+    shape:     list[tuple[str, tuple[str, ...] | None]] = []
+    arguments: list[Any]                               = []
+
+    for path, condition in query.items():
+        if not isinstance(path, str): raise ValueError(f'field name must be string, not {path!r}')
+
+        if not is_operator(condition):
+            shape.append((path, None))
+            arguments.append(condition)
+            continue
+
+        shape.append((path, tuple(condition)))
+        arguments.extend(prepare(name, argument) for name, argument in condition.items())
+
+    return compile_shape(tuple(shape))(*arguments)
+
+def prepare(name: str, argument: Any) -> Any:
+    '''Validates the argument of the operator and converts it to the form used by the predicate'''
+    if name not in Operator._value2member_map_: raise ValueError(f'unknown operator `{name}`, use one of {[operator.value for operator in Operator]}')
+
+    match Operator(name):
+        case Operator.GT | Operator.GTE | Operator.LT | Operator.LTE:
+            bound: tuple[int, Any] | None = order_key(argument)
+
+            if bound is None: raise ValueError(f'`{name}` must be compared with a number or a string, not {argument!r}')
+
+            return bound
+
+        case Operator.IN | Operator.NIN:
+            if not isinstance(argument, list): raise ValueError(f'`{name}` must be given a list, not {argument!r}')
+
+            try:              return frozenset(argument)
+            except TypeError: return argument
+
+        case Operator.EXISTS: return bool(argument)
+
+        case Operator.REGEX:
+            try:                                   return re.compile(argument)
+            except (re.error, TypeError) as error: raise ValueError(f'`{name}` must be a valid regular expression, {error}')
+
+    return argument
+
+@lru_cache(maxsize = CACHE_SIZE)
+def compile_shape(shape: tuple[tuple[str, tuple[str, ...] | None], ...]) -> Callable[..., Callable[[dict[str, Any]], bool]]:
+    '''
+    Generates and compiles the factory of predicates of the query shape, the factory takes the prepared values in the order of the shape
+
+    Every condition becomes an `if` statement returning False, so a record is rejected by the first condition it fails without any calls in between.
+    '''
+    parameters: list[str] = []
+    lines:      list[str] = ['    def predicate(record):']
+
+    for position, (path, operators) in enumerate(shape):
+        if operators is None:
+            parameters.append(f'value_{position}')
+
+            if '.' in path: lines.append(f'        if not none_if_missing(get_path(record, {path!r})) == value_{position}: return False')
+            else:           lines.append(f'        if not record.get({path!r}) == value_{position}: return False')
+
+            continue
+
+        lines.append(f'        value = get_path(record, {path!r})' if '.' in path else f'        value = record.get({path!r}, MISSING)')
+
+        for index, name in enumerate(operators):
+            argument: str = f'argument_{position}_{index}'
+
+            parameters.append(argument)
+
+            test: str
+
+            match Operator(name):
+                case Operator.EQ:     test = f'none_if_missing(value) == {argument}'
+                case Operator.NE:     test = f'none_if_missing(value) != {argument}'
+                case Operator.IN:     test = f'contains({argument}, none_if_missing(value))'
+                case Operator.NIN:    test = f'not contains({argument}, none_if_missing(value))'
+                case Operator.EXISTS: test = f'(value is not MISSING) == {argument}'
+                case Operator.REGEX:  test = f'isinstance(value, str) and {argument}.search(value) is not None'
+
+                case operator:
+                    test = f'(key := order_key(value)) is not None and key[0] == {argument}[0] and key[1] {BOUNDS.get(operator)[1]} {argument}[1]'
+
+            lines.append(f'        if not ({test}): return False')
+
+    lines.extend(['        return True', '    return predicate'])
+
+    source:    str            = '\n'.join([f'def factory({", ".join(parameters)}):', *lines])
+    namespace: dict[str, Any] = { 'MISSING' : MISSING, 'get_path' : get_path, 'order_key' : order_key, 'contains' : contains, 'none_if_missing' : none_if_missing }
+
+    exec(compile(source, '<moonlight query>', 'exec'), namespace)
+
+    return namespace.get('factory')
+
+def none_if_missing(value: Any) -> Any:
+    return None if value is MISSING else value
+
+def contains(values: Any, value: Any) -> bool:
+    try:              return value in values
+    except TypeError: return any(value == item for item in values)
+
+def parse_sort(sort: str | list[str] | None) -> list[tuple[str, bool]]:
+    '''Parses `field` or a list of fields into (path, descending) pairs, `-field` sorts from the greatest value, raises ValueError if it is invalid'''
+    if sort is None: return []
+
+    fields: list[Any] = [sort] if isinstance(sort, str) else sort
+
+    if not isinstance(fields, list) or not all(isinstance(field, str) and field.lstrip('-') for field in fields): raise ValueError(f'sort must be a field name or a list of them, not {sort!r}')
+
+    return [(field[1:], True) if field.startswith('-') else (field, False) for field in fields]
+
+def sort_value(value: Any) -> tuple:
+    '''Returns the sort key of the value, missing and unordered values go before numbers and numbers before strings'''
+    key: tuple[int, Any] | None = order_key(value) if value is not MISSING else None
+
+    return (0,) if key is None else (1, *key)
+
+def sort_records(records: Iterable[dict[str, Any]], sort: list[tuple[str, bool]]) -> list[dict[str, Any]]:
+    '''Sorts the records by several fields in their own directions, a stable sort is run for every field from the last one'''
+    records: list[dict[str, Any]] = list(records)
+
+    for path, descending in reversed(sort): records.sort(key = lambda record: sort_value(get_path(record, path)), reverse = descending)
+
+    return records
+
+def project(record: dict[str, Any], fields: list[str]) -> dict[str, Any]:
+    '''Returns only the listed fields of the record, values of dotted paths are put into nested objects'''
+    result: dict[str, Any] = {}
+
+    for path in fields:
+        value: Any = get_path(record, path)
+
+        if value is MISSING: continue
+
+        if path in record:
+            result[path] = value
+            continue
+
+        parts:  list[str]      = path.split('.')
+        target: dict[str, Any] = result
+
+        for part in parts[:-1]: target = target.setdefault(part, {})
+
+        target[parts[-1]] = value
+
+    return result
+
+
+class Plan:
+    '''The way records of a query are found: by primary key, by an index, on the columnar copy or by scanning the database'''
+    def __init__(self, kind: PlanKind, fields: list[str] | None = None, values: Any = None, start: Any = None, end: Any = None, reverse: bool = False, ordered: bool = False) -> None:
+        '''
+        arguments
+            - kind    (PlanKind) <- chosen way to find the records
+            - fields  (list)     <- fields the index or the columns are used for
+            - values  (any)      <- primary keys, accepted values of indexed fields or the equality part of the query
+            - start   (any)      <- lower bound of the ordered index
+            - end     (any)      <- upper bound of the ordered index
+            - reverse (bool)     <- walk the ordered index from the greatest value
+            - ordered (bool)     <- the records already come in the requested sort order
+        '''
+        self.kind:    PlanKind  = kind
+        self.fields:  list[str] = fields or []
+        self.values:  Any       = values
+        self.start:   Any       = start
+        self.end:     Any       = end
+        self.reverse: bool      = reverse
+        self.ordered: bool      = ordered
+
+    def explain(self) -> dict[str, Any]:
+        '''`Returns the plan as a dictionary`'''
+        return { 'plan' : self.kind.value, 'fields' : self.fields, 'sorted_by_index' : self.ordered }
+
+def plan_query(query: dict[str, Any], primary_key: str, indexes: list[str], ordered_indexes: list[str], columnar: bool = False, sort: list[tuple[str, bool]] | None = None) -> Plan:
+    '''
+    Chooses how to find the records of the query
+
+    The primary key goes first, then equality indexes (intersected if several fields are indexed), then an ordered index
+    bounding a range of the field, then the columnar copy for top-level equalities, and a scan of the database otherwise.
+    The result still has to be checked against the whole query.
+    '''
+    if primary_key in query and (identifiers := equalities(query.get(primary_key))) is not None:
+        return Plan(PlanKind.PRIMARY_KEY, [primary_key], identifiers)
+
+    indexed: dict[str, list[Any]] = {
+        field: values for field, condition in query.items()
+        if field in indexes and (values := equalities(condition)) is not None
+    }
+
+    if indexed: return Plan(PlanKind.INDEX, list(indexed), indexed)
+
+    for field, condition in query.items():
+        if field not in ordered_indexes or not is_operator(condition): continue
+
+        bounds: dict[str, list[Any]] = { 'start' : [], 'end' : [] }
+
+        for name, argument in condition.items():
+            if name in Operator._value2member_map_ and Operator(name) in BOUNDS: bounds[BOUNDS.get(Operator(name))[0]].append(argument)
+
+        if not bounds.get('start') and not bounds.get('end'): continue
+
+        ordered: bool = bool(sort) and len(sort) == 1 and sort[0][0] == field
+
+        return Plan(
+            PlanKind.ORDERED_INDEX, [field],
+            start   = max(bounds.get('start'), key = order_key) if bounds.get('start') else None,
+            end     = min(bounds.get('end'),   key = order_key) if bounds.get('end')   else None,
+            reverse = ordered and sort[0][1],
+            ordered = ordered
+        )
+
+    equal: dict[str, Any] = { field: condition for field, condition in query.items() if '.' not in field and not is_operator(condition) }
+
+    if columnar and equal: return Plan(PlanKind.COLUMNS, list(equal), equal)
+
+    return Plan(PlanKind.SCAN)
@@ -0,0 +1,71 @@
+from abc    import ABC, abstractmethod
+from typing import Any
+
+import json
+
+try:                import orjson
+except ImportError: orjson = None
+
+try:                import msgpack
+except ImportError: msgpack = None
+
+
+class Serializer(ABC):
+    '''Base class of database file encodings'''
+    name: str = ''
+
+    @abstractmethod
+    def dumps(self, data: Any) -> bytes: ...
+    @abstractmethod
+    def loads(self, raw: bytes) -> Any: ...
+
+class JsonSerializer(Serializer):
+    '''Standard library json, indented for reading by a human or compact'''
+    def __init__(self, indent: int | None = 4) -> None:
+        self.name:   str        = 'json' if indent else 'json_compact'
+        self.indent: int | None = indent
+
+    def dumps(self, data: Any) -> bytes:
+        if self.indent: return json.dumps(data, indent = self.indent, ensure_ascii = False).encode('utf-8')
+
+        return json.dumps(data, ensure_ascii = False, separators = (',', ':')).encode('utf-8')
+
+    def loads(self, raw: bytes) -> Any: return json.loads(raw)
+
+class OrjsonSerializer(Serializer):
+    '''Compact json written and read by orjson'''
+    name: str = 'orjson'
+
+    def dumps(self, data: Any) -> bytes: return orjson.dumps(data)
+    def loads(self, raw: bytes) -> Any:  return orjson.loads(raw)
+
+class MsgpackSerializer(Serializer):
+    '''Binary MessagePack encoding'''
+    name: str = 'msgpack'
+
+    def dumps(self, data: Any) -> bytes: return msgpack.packb(data, use_bin_type = True)
+    def loads(self, raw: bytes) -> Any:  return msgpack.unpackb(raw, raw = False, strict_map_key = False)
+
+
+serializers: dict[str, Serializer] = {
+    serializer.name: serializer for serializer in (
+        JsonSerializer(),
+        JsonSerializer(indent = None),
+        *((OrjsonSerializer(),)  if orjson  else ()),
+        *((MsgpackSerializer(),) if msgpack else ())
+    )
+}
+
+json_lines: Serializer = serializers.get('orjson', serializers.get('json_compact'))
+
+def get_serializer(name: str | None) -> Serializer | None:
+    '''Returns the installed serializer with the given name'''
+    return serializers.get(name or 'json')
+
+def detect_serializer(raw: bytes) -> Serializer:
+    '''Detects the encoding of the database file by its first byte, json is read by the fastest installed parser'''
+    if raw.lstrip()[:1] in (b'{', b'['): return json_lines
+
+    if 'msgpack' not in serializers: raise ValueError('the database file is not json and msgpack is not installed')
+
+    return serializers.get('msgpack')
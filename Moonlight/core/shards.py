@@ -0,0 +1,59 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools          import islice
+from typing             import Any
+
+import multiprocessing
+import time
+import os
+
+from Moonlight.core.tools   import get_filename_from_path
+from Moonlight.core.dataset import Dataset, is_expired
+from Moonlight.core.storage import read_database
+from Moonlight.core.query   import compile_query, sort_records
+from Moonlight.core.locks   import FileReadWriteLock
+
+
+pool: ProcessPoolExecutor | None = None
+
+def shard_name(filename: str, index: int) -> str:
+    '''Returns the name of the shard file of the database'''
+    return f'{get_filename_from_path(filename)}#{index}'
+
+def get_pool() -> ProcessPoolExecutor:
+    '''
+    Returns the process pool shared by all sharded databases, it is started on first use
+
+    Workers are spawned, they import the `__main__` module of the application again, so scripts need the `if __name__ == '__main__':` guard.
+    A worker does not create a config file in the directory it was started in, see `init_config`.
+    '''
+    global pool
+
+    if pool is None: pool = ProcessPoolExecutor(max_workers = os.cpu_count(), mp_context = multiprocessing.get_context('spawn'))
+
+    return pool
+
+def scan(path: str, journal_path: str, primary_key: str, query: dict[str, Any], count: bool = False, limit: int | None = None, sort: list[tuple[str, bool]] | None = None) -> list[dict[str, Any]] | int:
+    '''
+    Reads the shard file in a worker process and matches every record against the query, expired records are skipped
+
+    arguments
+        - path         (str)            <- path to the shard file
+        - journal_path (str)            <- path to the journal of the shard
+        - primary_key  (str)            <- name of the primary key field
+        - query        (dict[str, any]) <- the key-value dictionary the records must match
+        - count        (bool)           <- return only the count of matching records
+        - limit        (int)            <- stop after this many matches
+        - sort         (list)           <- (field, descending) pairs to sort the matches by before the limit
+
+    @returns {matches: list[dict[str, any]] | int}
+    '''
+    with FileReadWriteLock(f'{path}.lock').shared(): dataset: Dataset = read_database(path, journal_path, primary_key)
+
+    now:     float = time.time()
+    matches: Any   = filter(compile_query(query), (record for record in dataset if not is_expired(record, now)))
+
+    if sort: matches = sort_records(matches, sort)
+
+    if limit is not None: matches = islice(matches, limit)
+
+    return sum(1 for _ in matches) if count else list(matches)
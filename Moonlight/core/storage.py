@@ -0,0 +1,232 @@
+from typing import Any, BinaryIO, Iterator
+
+import codecs
+import json
+import os
+import re
+
+from Moonlight.config.paths     import make_offsets_path
+from Moonlight.core.dataset     import Dataset
+from Moonlight.core.lines       import LinesFile, HEADER
+from Moonlight.core.serializers import detect_serializer, json_lines, msgpack
+
+
+CHUNK_SIZE: int              = 1 << 16
+decoder:    json.JSONDecoder = json.JSONDecoder()
+whitespace: re.Pattern       = re.compile(r'[ \t\n\r]*')
+separator:  re.Pattern       = re.compile(r'[ \t\n\r]*,?[ \t\n\r]*')
+
+
+def read_journal(journal_path: str) -> list[dict[str, Any]]:
+    '''Reads the journal entries, a torn last line left by an interrupted append is ignored'''
+    if not os.path.exists(journal_path): return []
+
+    entries: list[dict[str, Any]] = []
+
+    with open(journal_path, 'rb') as journal_file:
+        for line in journal_file:
+            try:               entries.append(json_lines.loads(line))
+            except ValueError: break
+
+    return entries
+
+def read_database(path: str, journal_path: str, primary_key: str) -> Dataset:
+    '''Parses the database file in any format and replays its journal, records of a lines file are read in the order of its offsets table'''
+    with open(path, 'rb') as database_file:
+        raw: bytes = database_file.read(len(HEADER))
+
+        if not LinesFile.is_lines(raw): raw += database_file.read()
+
+    dataset: Dataset = Dataset(LinesFile(path, make_offsets_path(path), primary_key).load() if LinesFile.is_lines(raw) else detect_serializer(raw).loads(raw), primary_key)
+
+    for entry in read_journal(journal_path): dataset.apply(entry)
+
+    return dataset
+
+def iter_database(path: str, journal_path: str, primary_key: str) -> Iterator[dict[str, Any]]:
+    '''
+    Yields the records of the database file in any format one by one and applies its journal, so memory is bounded by a record instead of the file
+
+    Only the journal is read whole. Records it changes are returned in their final state, records deleted and pushed again move to the end like in the dataset.
+    '''
+    changes: dict[Any, list[tuple[int, dict[str, Any]]]] = {}
+
+    for position, entry in enumerate(read_journal(journal_path)):
+        match entry.get('op'):
+            case 'push' | 'update': changes.setdefault(entry.get('record').get(primary_key), []).append((position, entry))
+            case 'delete':          changes.setdefault(entry.get('id'), []).append((position, entry))
+
+    moved: list[tuple[int, dict[str, Any]]] = []
+
+    for record in iter_records(path, primary_key):
+        id: Any = record.get(primary_key)
+
+        try:              replayed: list | None = changes.pop(id, None)
+        except TypeError: replayed = None
+
+        if replayed is None:
+            yield record
+            continue
+
+        record, position = replay(record, replayed)
+
+        if position is None and record is not None: yield record
+        elif record is not None:                    moved.append((position, record))
+
+    for replayed in changes.values():
+        record, position = replay(None, replayed)
+
+        if record is not None: moved.append((position, record))
+
+    moved.sort(key = lambda item: item[0])
+
+    yield from (record for _, record in moved)
+
+def replay(record: dict[str, Any] | None, entries: list[tuple[int, dict[str, Any]]]) -> tuple[dict[str, Any] | None, int | None]:
+    '''Applies the journal entries of one record, returns the record and the position of the push that put it to the end, None if it stays in place'''
+    position: int | None = None if record is not None else -1
+
+    for index, entry in entries:
+        match entry.get('op'):
+            case 'push':
+                if record is None: record, position = entry.get('record'), index
+
+            case 'update':
+                if record is not None: record = { **record, **entry.get('record') }
+
+            case 'delete': record = None
+
+    return record, position
+
+def iter_records(path: str, primary_key: str) -> Iterator[dict[str, Any]]:
+    '''Yields the records of the database file without reading it whole, the format is detected by the first bytes'''
+    with open(path, 'rb') as database_file:
+        head: bytes = database_file.read(len(HEADER))
+
+        database_file.seek(0)
+
+        if LinesFile.is_lines(head):             yield from LinesFile(path, make_offsets_path(path), primary_key).records()
+        elif head.lstrip()[:1] in (b'{', b'['): yield from iter_json(database_file)
+        else:                                    yield from iter_msgpack(database_file)
+
+def iter_json(database_file: BinaryIO) -> Iterator[dict[str, Any]]:
+    '''Yields the items of the `data` array of a json file decoding one value at a time from a buffer refilled by chunks'''
+    reader: JsonReader = JsonReader(database_file)
+
+    if not reader.expect('{'): return None
+
+    while not reader.expect('}'):
+        key: str = reader.value()
+
+        reader.expect(':')
+
+        if key != 'data':
+            reader.value()
+            reader.expect(',')
+            continue
+
+        reader.expect('[')
+
+        yield from reader.items()
+
+        reader.expect(',')
+
+def iter_msgpack(database_file: BinaryIO) -> Iterator[dict[str, Any]]:
+    '''Yields the items of the `data` array of a msgpack file, other values of the map are skipped without decoding'''
+    if msgpack is None: raise ValueError('the database file is not json and msgpack is not installed')
+
+    unpacker: Any = msgpack.Unpacker(database_file, raw = False, strict_map_key = False, max_buffer_size = 0)
+
+    for _ in range(unpacker.read_map_header()):
+        if unpacker.unpack() != 'data':
+            unpacker.skip()
+            continue
+
+        for _ in range(unpacker.read_array_header()): yield unpacker.unpack()
+
+
+class JsonReader:
+    '''Reads json values from a file one by one keeping only the undecoded part of the current chunk in memory'''
+    def __init__(self, database_file: BinaryIO) -> None:
+        self.__file:     BinaryIO                  = database_file
+        self.__decoder:  codecs.IncrementalDecoder = codecs.getincrementaldecoder('utf-8')()
+        self.__buffer:   str                       = ''
+        self.__position: int                       = 0
+        self.__ended:    bool                      = False
+
+    def expect(self, char: str) -> bool:
+        '''`Skips whitespace and the given char if it is the next one, returns whether it was found`'''
+        self.__skip()
+
+        if not self.__buffer.startswith(char, self.__position): return False
+
+        self.__position += 1
+
+        return True
+
+    def value(self) -> Any:
+        '''`Decodes the next json value, more chunks are read while it is incomplete`'''
+        self.__skip()
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.__buffer, self.__position)
+
+                if end < len(self.__buffer) or self.__ended:
+                    self.__position = end
+                    return value
+
+            except json.JSONDecodeError:
+                if self.__ended: raise
+
+            self.__fill()
+
+    def items(self) -> Iterator[Any]:
+        '''`Yields the values of the array whose opening bracket was just read, all values complete in the buffer are decoded in one loop`'''
+        while True:
+            self.__skip()
+
+            buffer:   str = self.__buffer
+            position: int = self.__position
+
+            if buffer.startswith(']', position):
+                self.__position = position + 1
+                return None
+
+            while True:
+                try:               value, end = decoder.raw_decode(buffer, position)
+                except ValueError: break
+
+                end = separator.match(buffer, end).end()
+
+                if end >= len(buffer): break
+
+                yield value
+
+                position = end
+
+                if buffer[position] == ']':
+                    self.__position = position + 1
+                    return None
+
+            self.__position = position
+
+            if not self.__fill(): raise ValueError('unexpected end of the database file')
+
+    def __skip(self) -> None:
+        while True:
+            self.__position = whitespace.match(self.__buffer, self.__position).end()
+
+            if self.__position < len(self.__buffer) or not self.__fill(): return None
+
+    def __fill(self) -> bool:
+        '''`Appends the next chunk to the buffer dropping the consumed part, returns False at the end of the file`'''
+        if self.__ended: return False
+
+        chunk: bytes = self.__file.read(max(CHUNK_SIZE, len(self.__buffer) - self.__position))
+
+        self.__ended    = not chunk
+        self.__buffer   = self.__buffer[self.__position:] + self.__decoder.decode(chunk, final = self.__ended)
+        self.__position = 0
+
+        return not self.__ended
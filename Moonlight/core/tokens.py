@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta
+from hashlib  import sha256
+from heapq    import heappop, heappush
+from typing   import Any
+
+import threading
+import asyncio
+import json
+import os
+
+from Moonlight.core.tools    import generate_token, write_atomic
+from Moonlight.core.locks    import FileReadWriteLock
+from Moonlight.config.config import config
+from Moonlight.config.paths  import tokens_path
+
+
+def hash_token(token: str) -> str:
+    '''Returns the SHA256 hash of the token, only hashes of tokens are kept'''
+    return sha256(token.encode()).hexdigest()
+
+class TokenStore:
+    '''Authorization tokens by the hash of the token with a heap of their expiry moments, kept in their own file shared by the processes of the application'''
+    def __init__(self, path: str) -> None:
+        '''
+        arguments
+            - path (str) <- path to the tokens file, it is read on first use
+        '''
+        self.path: str = path
+
+        self.__tokens: dict[str, dict[str, Any]] = {}
+        self.__expiry: list[tuple[float, str]]   = []
+        self.__stamp:  tuple[int, ...] | None    = None
+        self.__loaded: bool                      = False
+        self.__lock:   threading.RLock           = threading.RLock()
+        self.__file:   FileReadWriteLock         = FileReadWriteLock(f'{path}.lock')
+
+    def create(self, author: str, lifetime: timedelta) -> dict[str, str]:
+        '''
+        `Issues a new token of the user`
+
+        arguments
+            - author   (str)       <- username of the owner of the token
+            - lifetime (timedelta) <- time the token is valid for
+
+        @returns {token_data: dict[str, str]} <- the token and the moment it expires at in ISO format
+        '''
+        token:   str      = generate_token()
+        expires: datetime = datetime.now() + lifetime
+
+        entry: dict[str, Any] = {
+            'author'  : author,
+            'hash'    : hash_token(token),
+            'expires' : expires.isoformat(),
+            'created' : datetime.now().isoformat()
+        }
+
+        self.__migrate()
+
+        with self.__lock, self.__file.exclusive():
+            self.__refresh()
+            self.__add(entry)
+            self.__save()
+
+        return {
+            'token'   : token,
+            'expires' : entry.get('expires')
+        }
+
+    def find(self, token: str | None) -> dict[str, Any] | None:
+        '''
+        `Returns the entry of a valid token, the file is read again only if the token is unknown and the file was changed (by another process)`
+
+        @returns {entry: dict[str, any] | None} <- `author`, `hash`, `expires` and `created` of the token, None if it is unknown or expired
+        '''
+        if not token: return None
+
+        key: str = hash_token(token)
+
+        self.__migrate()
+
+        with self.__lock:
+            entry: dict[str, Any] | None = self.__tokens.get(key)
+
+            if entry is None and self.__refresh(): entry = self.__tokens.get(key)
+
+        if entry is None or entry.get('expires_at') <= datetime.now().timestamp(): return None
+
+        return entry
+
+    def prune(self) -> int:
+        '''
+        `Removes the expired tokens from memory and from the file, nothing is read or written while the earliest token is still valid`
+
+        @returns {count: int} <- count of removed tokens
+        '''
+        now: float = datetime.now().timestamp()
+
+        self.__migrate()
+
+        with self.__lock:
+            self.__refresh()
+
+            if not self.__expiry or self.__expiry[0][0] > now: return 0
+
+            with self.__file.exclusive():
+                self.__refresh()
+
+                count: int = 0
+
+                while self.__expiry and self.__expiry[0][0] <= now:
+                    if self.__tokens.pop(heappop(self.__expiry)[1], None) is not None: count += 1
+
+                if count: self.__save()
+
+                return count
+
+    async def keep_pruned(self, interval: float) -> None:
+        '''`Prunes the expired tokens in a worker thread every interval seconds until it is cancelled`'''
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.prune)
+
+    def __add(self, entry: dict[str, Any]) -> None:
+        '''`Keeps the entry in the hash table and its expiry moment in the heap (lock must be held)`'''
+        expires_at: float = datetime.fromisoformat(entry.get('expires')).timestamp()
+
+        self.__tokens[entry.get('hash')] = { **entry, 'expires_at' : expires_at }
+
+        heappush(self.__expiry, (expires_at, entry.get('hash')))
+
+    def __get_stamp(self) -> tuple[int, ...] | None:
+        '''`Returns the state of the tokens file used to detect changes made by other processes`'''
+        try:            stat: os.stat_result = os.stat(self.path)
+        except OSError: return None
+
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def __refresh(self) -> bool:
+        '''`Reads the file again if it was changed since it was read (lock must be held)`'''
+        stamp: tuple[int, ...] | None = self.__get_stamp()
+
+        if self.__loaded and stamp == self.__stamp: return False
+
+        entries: list[dict[str, Any]] = []
+
+        if stamp is not None:
+            with open(self.path, 'r', encoding = 'utf-8') as tokens_file: entries = json.load(tokens_file).get('tokens')
+
+        self.__tokens = {}
+        self.__expiry = []
+        self.__stamp  = stamp
+        self.__loaded = True
+
+        for entry in entries: self.__add(entry)
+
+        return True
+
+    def __migrate(self) -> None:
+        '''`Moves the valid tokens kept in the config by earlier versions into the file, the file lock must not be held`'''
+        if not config.get('api_keys'): return None
+
+        with self.__lock, self.__file.exclusive():
+            self.__refresh()
+
+            for token in config.get('api_keys'):
+                if datetime.fromisoformat(token.get('expires')) > datetime.now() and hash_token(token.get('token')) not in self.__tokens:
+                    self.__add({ 'author' : token.get('author'), 'hash' : hash_token(token.get('token')), 'expires' : token.get('expires'), 'created' : token.get('created') })
+
+            self.__save()
+
+            config.set('api_keys', [])
+
+    def __save(self) -> None:
+        '''`Writes the tokens to the file and remembers its state, so this process does not read its own write (file lock must be held)`'''
+        entries: list[dict[str, Any]] = [{ key : value for key, value in entry.items() if key != 'expires_at' } for entry in self.__tokens.values()]
+
+        write_atomic(self.path, json.dumps({ 'tokens' : entries }, indent = 4).encode())
+
+        self.__stamp = self.__get_stamp()
+
+tokens: TokenStore = TokenStore(tokens_path)
@@ -1,8 +1,13 @@
-from secrets  import token_hex
+from secrets  import token_hex, randbelow
 from datetime import datetime
 from hashlib  import sha256
+from base64   import urlsafe_b64encode, urlsafe_b64decode
+from typing   import Any
 from uuid     import uuid4
 
+import threading
+import json
+import time
 import os
 
 
@@ -30,10 +35,60 @@ def add_ext(filename: str, ext: str) -> str:
     '''Adds an extension to the file name'''
     return strip_ext(filename) + ext
 
+ID_EPOCH:      int = 1704067200000
+NODE_BITS:     int = 4
+SEQUENCE_BITS: int = 8
+
+id_lock:  threading.Lock = threading.Lock()
+id_state: dict[str, int] = { 'pid' : 0, 'node' : 0, 'timestamp' : 0, 'sequence' : 0 }
+
 def generate_uuid() -> str:
     '''Generates and returns a unique UUID'''
     return str(uuid4().int)[:14]
 
+def generate_id(index: int = 0, count: int = 1) -> int:
+    '''
+    Generates a time-ordered id: milliseconds since 2024 (41 bits), node of the process (4 bits) and a sequence within the millisecond (8 bits)
+
+    Ids stay below 2^53, so they are exact in JavaScript. Ids of one process always grow, a sequence running out within a millisecond
+    takes the next one. The sequence is chosen so that `id % count == index`, this is how ids of a shard are generated.
+
+    The node is drawn at random when a process generates its first id, so processes rarely share it, but they may:
+    a writer that cannot check the ids of the database calls `wait_past_id` before other processes may write, see `Moonlight.__write`.
+    '''
+    with id_lock:
+        if id_state.get('pid') != os.getpid(): id_state.update(pid = os.getpid(), node = randbelow(1 << NODE_BITS), timestamp = 0, sequence = -1)
+
+        timestamp: int = max(time.time_ns() // 1_000_000 - ID_EPOCH, id_state.get('timestamp'))
+        sequence:  int = id_state.get('sequence') + 1 if timestamp == id_state.get('timestamp') else 0
+
+        while True:
+            if sequence >> SEQUENCE_BITS: timestamp, sequence = timestamp + 1, 0
+
+            base: int = (timestamp << (NODE_BITS + SEQUENCE_BITS)) | (id_state.get('node') << SEQUENCE_BITS)
+
+            sequence += (index - base - sequence) % count
+
+            if not sequence >> SEQUENCE_BITS: break
+
+        id_state.update(timestamp = timestamp, sequence = sequence)
+
+        return base | sequence
+
+def wait_past_id(id: int) -> None:
+    '''Sleeps until the millisecond of the id has passed, ids generated afterwards by any process of the machine are greater whatever their node'''
+    delay: int = ((id >> (NODE_BITS + SEQUENCE_BITS)) + ID_EPOCH + 1) * 1_000_000 - time.time_ns()
+
+    if delay > 0: time.sleep(delay / 1_000_000_000)
+
+def encode_cursor(position: Any) -> str:
+    '''Packs the position of the last returned record into an opaque pagination cursor'''
+    return urlsafe_b64encode(json.dumps(position, ensure_ascii = False).encode()).decode()
+
+def decode_cursor(cursor: str) -> Any:
+    '''Unpacks the position from the pagination cursor'''
+    return json.loads(urlsafe_b64decode(cursor.encode()))
+
 def is_full_path(path: str) -> bool:
     '''Checks if the path is absolute'''
     return os.path.isabs(path)
@@ -52,4 +107,15 @@ def check_path_exist(path: str) -> bool:
     
     os.makedirs(os.path.dirname(path), exist_ok = True)
     
-    return False
\ No newline at end of file
+    return False
+
+def write_atomic(path: str, data: bytes) -> None:
+    '''Writes the data to a temporary file and puts it in place of the file, readers see either the old or the new content'''
+    temporary_path: str = f'{path}.{uuid4().hex}.tmp'
+
+    try:
+        with open(temporary_path, 'wb') as temporary_file: temporary_file.write(data)
+
+        os.replace(temporary_path, path)
+
+    finally: remove_file(temporary_path)
@@ -0,0 +1,70 @@
+from typing import Any, Awaitable, Callable
+
+from Moonlight.schemas.schemas import Schema
+
+
+class Transaction:
+    '''Changes staged in memory and written to the database at once when the `async with` block exits'''
+    def __init__(self, commit: Callable[[list[tuple[str, Any]]], Awaitable[list[Any] | None]], get_id: Callable[[], int]) -> None:
+        '''
+        arguments
+            - commit (callable) <- coroutine that applies the staged operations to the database in a single write
+            - get_id (callable) <- generator of primary keys for pushed objects
+        '''
+        self.__commit: Callable[[list[tuple[str, Any]]], Awaitable[list[Any] | None]] = commit
+        self.__get_id: Callable[[], int]                                              = get_id
+
+        self.operations: list[tuple[str, Any]] = []
+        self.results:    list[Any] | None      = None
+        self.committed:  bool                  = False
+
+    async def __aenter__(self) -> 'Transaction':
+        return self
+
+    async def __aexit__(self, exception_type, exception, traceback) -> bool:
+        if exception_type is not None:
+            self.rollback()
+            return False
+
+        await self.commit()
+
+        return False
+
+    def push(self, query: dict[str, Any] | Schema) -> int:
+        '''
+        `Stages adding an object, the id is reserved right away so it can be used later in the transaction`
+
+        @returns {id: int}
+        '''
+        identifier: int = self.__get_id()
+
+        self.operations.append(('push', (identifier, query() if isinstance(query, Schema) else query)))
+
+        return identifier
+
+    def update(self, query: dict[str, Any]) -> None:
+        '''`Stages changing an object (`id` in `query` required!)`'''
+        self.operations.append(('update', query))
+
+    def delete(self, id: int) -> None:
+        '''`Stages removing an object`'''
+        self.operations.append(('delete', id))
+
+    async def commit(self) -> list[Any] | None:
+        '''
+        `Writes all staged changes at once, nothing is written if any of them cannot be applied`
+
+        @returns {results: list[any] | None} <- result of every staged operation in the same order, None if the transaction was rolled back
+        '''
+        if self.committed: return self.results
+
+        self.results   = await self.__commit(self.operations) if self.operations else []
+        self.committed = self.results is not None
+
+        self.operations = []
+
+        return self.results
+
+    def rollback(self) -> None:
+        '''`Discards all staged changes`'''
+        self.operations = []
@@ -0,0 +1,68 @@
+from typing import Any, Awaitable, Callable
+
+import asyncio
+
+
+class GroupCommit:
+    '''Writes arriving close together are collected and committed to the database at once, every caller gets its own result'''
+    def __init__(self, commit: Callable[[list[Any]], Awaitable[list[Any]]], max_delay: float, max_batch: int) -> None:
+        '''
+        arguments
+            - commit    (callable) <- coroutine writing the operations with a single write and returning the result of every one of them
+            - max_delay (float)    <- seconds the first write of a batch waits for others to join it
+            - max_batch (int)      <- count of writes committed at once, a full batch is committed without waiting
+        '''
+        self.__commit:    Callable[[list[Any]], Awaitable[list[Any]]] = commit
+        self.__max_delay: float                                       = max_delay
+        self.__max_batch: int                                         = max(1, max_batch)
+
+        self.__pending: list[tuple[Any, asyncio.Future]] = []
+        self.__task:    asyncio.Task | None              = None
+        self.__full:    asyncio.Event | None             = None
+
+    async def submit(self, operation: Any) -> Any:
+        '''
+        `Queues the operation for the next commit and waits for it`
+
+        @returns {result: any} <- result of the operation given by the commit
+        '''
+        loop:   asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        future: asyncio.Future            = loop.create_future()
+
+        self.__pending.append((operation, future))
+
+        if self.__task is None or self.__task.done(): self.__task = loop.create_task(self.__drain())
+
+        elif self.__full is not None and len(self.__pending) >= self.__max_batch: self.__full.set()
+
+        return await future
+
+    async def __drain(self) -> None:
+        '''`Commits the queued operations batch by batch until the queue is empty, writes queued during a commit form the next batch`'''
+        self.__full = asyncio.Event()
+
+        while self.__pending:
+            if self.__max_delay > 0 and len(self.__pending) < self.__max_batch:
+                try:                         await asyncio.wait_for(self.__full.wait(), self.__max_delay)
+                except asyncio.TimeoutError: pass
+
+            else: await asyncio.sleep(0)
+
+            self.__full.clear()
+
+            batch: list[tuple[Any, asyncio.Future]] = [(operation, future) for operation, future in self.__pending[:self.__max_batch] if not future.done()]
+
+            self.__pending = self.__pending[self.__max_batch:]
+
+            if not batch: continue
+
+            try: results: list[Any] = await self.__commit([operation for operation, _ in batch])
+
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done(): future.set_exception(error)
+
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done(): future.set_result(result)
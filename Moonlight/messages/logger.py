@@ -2,12 +2,21 @@ from rich.console import Console
 from loguru       import logger
 from enum         import Enum
 
+import threading
+
 from Moonlight.core.tools        import check_path_exist
 from Moonlight.messages.messages import Messages, Style
 
 
 console: Console = Console()
 
+handlers:      dict[str, list[int]] = {}
+handlers_lock: threading.Lock       = threading.Lock()
+
+# messages are shown on the console by rich, the default stderr handler of loguru would repeat them
+try:               logger.remove(0)
+except ValueError: pass
+
 class LogLevel(Enum):
     '''Enum of logging levels'''
     INFO:    str = 'INFO'
@@ -29,16 +38,29 @@ class Logger:
 
         check_path_exist(self.path)
 
-        self.logger = logger
+        self.logger = logger.bind(moonlight_path = self.path)
         self.loggers: tuple[LogLevel] = loggers
         self.console_show: bool = console_show
 
-        self.logger.remove()
-        self.logger.add(
-            self.path,
-            format = '[{time:DD.MM.YYYY HH:mm:ss}] <{level}> -> {message}',
-            level  = 'INFO'
-        )        
+        self.__attached: bool = False
+
+        self.__attach()
+
+    def __attach(self) -> None:
+        '''Adds the handler of the log file, loggers of the same file share one handler and handlers of other files are left alone'''
+        path: str = self.path
+
+        with handlers_lock:
+            if path in handlers: handlers[path][1] += 1
+
+            else: handlers[path] = [self.logger.add(
+                path,
+                format = '[{time:DD.MM.YYYY HH:mm:ss}] <{level}> -> {message}',
+                level  = 'INFO',
+                filter = lambda record: record['extra'].get('moonlight_path') == path
+            ), 1]
+
+        self.__attached = True
 
     def write(self, content: str, level: LogLevel) -> None:
         '''
@@ -56,5 +78,14 @@ class Logger:
             console.print(content, style = Style[LogLevel[level.name].value].value)
 
     def stop(self) -> None:
-        '''Removes all handlers from the logger'''
-        self.logger.remove()
\ No newline at end of file
+        '''Detaches the logger from its log file, the handler of the file is removed with its last logger'''
+        if not self.__attached: return None
+
+        self.__attached = False
+
+        with handlers_lock:
+            handlers[self.path][1] -= 1
+
+            if handlers[self.path][1]: return None
+
+            self.logger.remove(handlers.pop(self.path)[0])
\ No newline at end of file
@@ -0,0 +1,54 @@
+from typing import Any, Callable, Iterator
+
+import tempfile
+import asyncio
+import inspect
+import re
+import os
+
+import pytest
+
+# Moonlight keeps its config and databases in the working directory it is imported from
+os.chdir(tempfile.mkdtemp(prefix = 'moonlight-tests-'))
+
+from sanic_testing.testing import SanicTestClient
+
+from Moonlight.core.moonlight import Moonlight
+from Moonlight.core.methods   import Methods
+from Moonlight.api.api        import create_application
+
+
+@pytest.hookimpl(tryfirst = True)
+def pytest_pyfunc_call(pyfuncitem: pytest.Function) -> bool | None:
+    '''Runs coroutine tests in an event loop of their own'''
+    if not inspect.iscoroutinefunction(pyfuncitem.obj): return None
+
+    asyncio.run(pyfuncitem.obj(**{ name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames }))
+
+    return True
+
+@pytest.fixture
+def open_database(request: pytest.FixtureRequest) -> Iterator[Callable[..., Moonlight]]:
+    '''Opens handles of a database named after the test, without console output, the database is dropped after the test'''
+    opened: dict[str, Moonlight] = {}
+
+    def open(**options: Any) -> Moonlight:
+        database: Moonlight = Moonlight(re.sub(r'\W+', '_', request.node.name), console_show = False, **options)
+
+        opened.setdefault(database.filename, database)
+
+        return database
+
+    yield open
+
+    for database in opened.values(): asyncio.run(database.drop())
+
+@pytest.fixture(scope = 'session')
+def api_client() -> tuple[SanicTestClient, dict[str, str]]:
+    '''Creates the application once, Sanic does not allow a second one of the same name, and returns its client with the headers of an administrator'''
+    Methods.create_user('tests-admin', 'tests-admin', 'administrator')
+
+    client:   SanicTestClient = SanicTestClient(create_application())
+    response: Any             = client.post('/auth', json = { 'username' : 'tests-admin', 'password' : 'tests-admin' })[1]
+
+    return client, { 'Authorization' : response.json.get('data').get('token') }
@@ -0,0 +1,124 @@
+from typing import Any, Callable
+
+import subprocess
+import time
+import json
+import sys
+import os
+
+import pytest
+
+import Moonlight as package
+
+from Moonlight.core.cache     import ResultCache, make_key
+from Moonlight.core.moonlight import Moonlight
+
+WRITER: str = '''
+import asyncio, sys
+
+from Moonlight.core.moonlight import Moonlight
+
+asyncio.run(Moonlight(sys.argv[1], console_show = False, storage = sys.argv[2]).push({ 'name' : 'a', 'writer' : 'other' }))
+'''
+
+
+def test_kept_and_returned_results_are_copies() -> None:
+    cache:  ResultCache          = ResultCache(4, 100)
+    result: list[dict[str, Any]] = [{ 'id' : 1, 'tags' : ['a'] }]
+
+    cache.put('key', 1, result)
+
+    result[0]['tags'].append('b')
+    cache.get('key', 1)[0]['tags'].append('c')
+
+    assert cache.get('key', 1) == [{ 'id' : 1, 'tags' : ['a'] }]
+
+def test_stale_results_are_dropped() -> None:
+    cache: ResultCache = ResultCache(2, 3)
+
+    cache.put('old', 1, [1])
+    cache.put('expired', 1, [2], expires = time.time() - 1)
+    cache.put('large', 1, [1, 2, 3, 4])
+
+    assert cache.get('old', 2) is None
+    assert cache.get('old', 1) is None
+    assert cache.get('expired', 1) is None
+    assert cache.get('large', 1) is None
+
+def test_least_recently_used_result_goes_first() -> None:
+    cache: ResultCache = ResultCache(2, 100)
+
+    cache.put('first', 1, [1])
+    cache.put('second', 1, [2])
+    cache.get('first', 1)
+    cache.put('third', 1, [3])
+
+    assert cache.get('second', 1) is None
+    assert cache.get('first', 1) == [1] and cache.get('third', 1) == [3]
+
+def test_keys_do_not_depend_on_field_order() -> None:
+    assert make_key('get', { 'a' : 1, 'b' : 2 }) == make_key('get', { 'b' : 2, 'a' : 1 })
+    assert make_key('get', { 'a' : { 1, 2 } }) is None
+
+@pytest.mark.parametrize('resident', [False, True])
+async def test_changed_result_does_not_change_the_next_hit(open_database: Callable[..., Moonlight], resident: bool) -> None:
+    database: Moonlight = open_database(resident = resident)
+
+    await database.push({ 'name' : 'a' })
+
+    (await database.get({ 'name' : 'a' }))[0]['name'] = 'MUTATED'
+
+    assert [record.get('name') for record in await database.get({ 'name' : 'a' })] == ['a']
+
+async def test_repeated_get_does_not_read_the_database(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database()
+    loads:    list[int] = []
+    load:     Any       = database._Moonlight__load
+
+    await database.push({ 'name' : 'a' })
+
+    database._Moonlight__load = lambda *arguments, **options: (loads.append(1), load(*arguments, **options))[1]
+
+    await database.get({ 'name' : 'a' })
+    await database.get({ 'name' : 'a' })
+
+    assert len(loads) == 1
+
+@pytest.mark.parametrize('change', ['push', 'update', 'delete'])
+async def test_write_clears_the_result(open_database: Callable[..., Moonlight], change: str) -> None:
+    database: Moonlight = open_database()
+    id:       int       = await database.push({ 'name' : 'a' })
+
+    assert len(await database.get({ 'name' : 'a' })) == 1
+
+    match change:
+        case 'push':   await database.push({ 'name' : 'a' })
+        case 'update': await database.update({ 'id' : id, 'name' : 'b' })
+        case 'delete': await database.delete(id)
+
+    assert len(await database.get({ 'name' : 'a' })) == { 'push' : 2, 'update' : 0, 'delete' : 0 }[change]
+
+async def test_journal_append_clears_the_result(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(storage = 'log')
+
+    await database.push({ 'name' : 'a' })
+
+    assert len(await database.get({ 'name' : 'a' })) == 1
+
+    with open(database.journal_path, 'ab') as journal_file: journal_file.write(json.dumps({ 'op' : 'push', 'record' : { 'id' : 1, 'name' : 'a' } }).encode() + b'\n')
+
+    assert len(await database.get({ 'name' : 'a' })) == 2
+
+@pytest.mark.parametrize('storage', ['snapshot', 'log'])
+async def test_write_of_another_process_clears_the_result(open_database: Callable[..., Moonlight], storage: str) -> None:
+    database: Moonlight = open_database(storage = storage)
+
+    await database.push({ 'name' : 'a' })
+
+    assert len(await database.get({ 'name' : 'a' })) == 1
+
+    environment: dict[str, str] = { **os.environ, 'PYTHONPATH' : os.path.dirname(os.path.dirname(package.__file__)) }
+
+    subprocess.run([sys.executable, '-c', WRITER, database.name.removesuffix('.json'), storage], env = environment, check = True)
+
+    assert len(await database.get({ 'name' : 'a' })) == 2
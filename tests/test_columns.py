@@ -0,0 +1,131 @@
+from pathlib import Path
+from typing  import Any, Callable
+
+import threading
+import asyncio
+
+import pytest
+
+from Moonlight.core.moonlight import Moonlight
+from Moonlight.core.columns   import Column, Columns, numpy
+from Moonlight.core.query     import compile_query
+
+pytestmark = pytest.mark.skipif(numpy is None, reason = 'the columnar copy requires numpy')
+
+RECORDS: list[dict[str, Any]] = [
+    { 'id' : 1, 'city' : 'Oslo', 'age' : 30,   'score' : 1.5, 'admin' : True,  'meta' : { 'a' : 1 } },
+    { 'id' : 2, 'city' : 'Rome', 'age' : 40,   'score' : 2,   'admin' : False, 'meta' : [1] },
+    { 'id' : 3, 'city' : 'Oslo', 'age' : None, 'score' : 3,   'admin' : True },
+    { 'id' : 4, 'city' : None,   'age' : 1 }
+]
+
+
+def write_after_load(monkeypatch: pytest.MonkeyPatch, database: Moonlight) -> None:
+    '''Makes the next read of the database push 50 records from another handle once it has loaded the dataset, as a write landing during a lock-free read'''
+    load: Callable[..., Any] = database._Moonlight__load
+
+    def concurrent_load(*args: Any, **kwargs: Any) -> Any:
+        monkeypatch.undo()
+
+        dataset: Any = load(*args, **kwargs)
+
+        writer: threading.Thread = threading.Thread(target = lambda: asyncio.run(Moonlight(database.name, console_show = False).push_many([{ 'n' : n } for n in range(100, 150)])))
+        writer.start()
+        writer.join()
+
+        return dataset
+
+    monkeypatch.setattr(database, '_Moonlight__load', concurrent_load, raising = False)
+
+@pytest.mark.parametrize('values, kind', [
+    ([1, None, 3],      'int'),
+    ([1, 2.5],          'float'),
+    ([True, None],      'bool'),
+    (['a', 'b', 'a'],   'str'),
+    ([None, None],      'null'),
+    ([1, 'a'],          'object'),
+    ([{ 'a' : 1 }],     'object'),
+    ([2 ** 70],         'object')
+])
+def test_column_kind(values: list[Any], kind: str) -> None:
+    column: Column = Column.build(values)
+
+    assert column.kind == kind
+    assert column.present.tolist() == [value is not None for value in values]
+
+@pytest.mark.parametrize('query', [
+    { 'city' : 'Oslo' },
+    { 'city' : 'Paris' },
+    { 'city' : None },
+    { 'age' : 40 },
+    { 'age' : 'forty' },
+    { 'score' : 2 },
+    { 'admin' : True },
+    { 'admin' : 1 },
+    { 'missing' : None },
+    { 'missing' : 1 },
+    { 'city' : 'Oslo', 'admin' : True }
+])
+def test_mask_matches_the_same_records_as_the_query(query: dict[str, Any]) -> None:
+    columns: Columns = Columns.build(RECORDS, 'id', (0,))
+
+    assert columns.ids[columns.mask(query)].tolist() == [record.get('id') for record in RECORDS if compile_query(query)(record)]
+
+@pytest.mark.parametrize('query', [{ 'age' : { '$gt' : 1 } }, { 'meta.a' : 1 }, { 'meta' : { 'a' : 1 } }])
+def test_mask_leaves_other_queries_to_the_scan(query: dict[str, Any]) -> None:
+    assert Columns.build(RECORDS, 'id', (0,)).mask(query) is None
+
+def test_records_without_integer_ids_have_no_columns() -> None:
+    assert Columns.build([{ 'id' : 'a' }], 'id', (0,)) is None
+    assert len(Columns.build([], 'id', (0,))) == 0
+
+def test_saved_columns_are_loaded_only_for_the_same_stamp(tmp_path: Path) -> None:
+    columns: Columns = Columns.build(RECORDS, 'id', (1, 2))
+
+    columns.save(str(tmp_path / 'columns.npz'))
+
+    loaded: Columns = Columns.load(str(tmp_path / 'columns.npz'), (1, 2))
+
+    assert loaded.ids.tolist() == [1, 2, 3, 4]
+    assert { name: column.kind for name, column in loaded.columns.items() } == { name: column.kind for name, column in columns.columns.items() }
+    assert loaded.mask({ 'city' : 'Oslo' }).tolist() == [True, False, True, False]
+
+    assert Columns.load(str(tmp_path / 'columns.npz'), (1, 3)) is None
+    assert Columns.load(str(tmp_path / 'missing.npz'), (1, 2)) is None
+
+    (tmp_path / 'columns.npz').write_bytes(b'damaged')
+
+    assert Columns.load(str(tmp_path / 'columns.npz'), (1, 2)) is None
+
+async def test_aggregations_equal_those_of_a_scan(open_database: Callable[..., Moonlight]) -> None:
+    columnar: Moonlight = open_database(columnar = True)
+    scanned:  Moonlight = open_database()
+
+    await columnar.push_many([{ key : value for key, value in record.items() if key != 'id' } for record in RECORDS])
+    await columnar.push({ 'city' : 'Oslo', 'age' : 1000 }, ttl = 0.01)
+    await asyncio.sleep(0.05)
+
+    for database in (columnar, scanned):
+        assert await database.sum('age') == 71
+        assert await database.min('score', { 'city' : 'Oslo' }) == 1.5
+        assert await database.max('age', { 'admin' : False }) == 40
+        assert await database.avg('age', { 'city' : 'Oslo' }) == 30
+        assert await database.count('city', 'Oslo') == 2
+        assert await database.group_by('city') == { 'Oslo' : 2, 'Rome' : 1, None : 1 }
+        assert await database.group_by('admin', 'score', 'sum') == { True : 4.5, False : 2, None : 0 }
+
+    assert (await columnar.explain({ 'city' : 'Oslo' })).get('plan') == 'columns'
+
+@pytest.mark.parametrize('resident', [False, True])
+async def test_columns_are_not_stamped_newer_than_their_data(open_database: Callable[..., Moonlight], monkeypatch: pytest.MonkeyPatch, resident: bool) -> None:
+    database: Moonlight = open_database(resident = resident, columnar = True)
+
+    await database.push_many([{ 'n' : n } for n in range(100)])
+
+    write_after_load(monkeypatch, database)
+
+    await database.count('n', 0)
+
+    assert await database.count('n', 120) == 1
+    assert len(await database.get({ 'n' : { '$gte' : 0 } })) == 150
+    assert await database.length() == 150
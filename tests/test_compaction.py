@@ -0,0 +1,83 @@
+from typing import Any, Callable
+
+import asyncio
+import shutil
+import os
+
+import pytest
+
+from Moonlight.config.config  import app_data
+from Moonlight.core.moonlight import Moonlight
+
+
+async def test_journal_is_merged_into_the_file(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(storage = 'log')
+    ids:      list[int] = [await database.push({ 'n' : n }) for n in range(3)]
+    size:     int       = os.path.getsize(database.filename)
+
+    await database.update({ 'id' : ids[0], 'n' : 10 })
+    await database.delete(ids[1])
+
+    assert os.path.getsize(database.filename) == size and os.path.exists(database.journal_path)
+
+    records: list[dict[str, Any]] = await database.all()
+
+    await database.compact()
+
+    assert not os.path.exists(database.journal_path)
+    assert await database.all() == records == [{ 'id' : ids[0], 'n' : 10 }, { 'id' : ids[2], 'n' : 2 }]
+    assert await open_database(storage = 'log').all() == records
+
+async def test_journal_left_by_an_interrupted_compaction_is_replayed_without_effect(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(storage = 'log')
+    id:       int       = await database.push({ 'n' : 1 })
+
+    await database.push({ 'n' : 2 })
+    await database.update({ 'id' : id, 'n' : 3 })
+    await database.delete(id)
+
+    shutil.copy(database.journal_path, f'{database.journal_path}.copy')
+
+    await database.compact()
+
+    os.replace(f'{database.journal_path}.copy', database.journal_path)
+
+    assert [record.get('n') for record in await open_database(storage = 'log').all()] == [2]
+
+@pytest.mark.parametrize('storage', ['log', 'lines'])
+async def test_outgrown_journal_is_compacted_in_the_background(open_database: Callable[..., Moonlight], monkeypatch: pytest.MonkeyPatch, storage: str) -> None:
+    monkeypatch.setitem(app_data.get('journal'), 'compaction_min_size', 256)
+
+    database:    Moonlight = open_database(storage = storage)
+    compactions: list[int] = []
+    compact:     Any       = database.compact
+    id:          int       = await database.push({ 'text' : 'x' * 100 })
+
+    async def counted() -> None:
+        compactions.append(1)
+
+        await compact()
+
+    database.compact = counted
+
+    for n in range(20): await database.update({ 'id' : id, 'text' : 'x' * (100 + n) })
+
+    await asyncio.sleep(0.1)
+
+    assert 0 < len(compactions) < 20
+    assert os.path.getsize(database.filename) < 20 * 100
+    assert await open_database(storage = storage).all() == [{ 'id' : id, 'text' : 'x' * 119 }]
+
+async def test_close_compacts_and_resident_handles_see_the_result(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(storage = 'log')
+    resident: Moonlight = open_database(storage = 'log', resident = True)
+
+    await database.push({ 'n' : 1 })
+
+    assert [record.get('n') for record in await resident.all()] == [1]
+
+    await database.push({ 'n' : 2 })
+    await database.close()
+
+    assert not os.path.exists(database.journal_path)
+    assert [record.get('n') for record in await resident.all()] == [1, 2]
@@ -0,0 +1,97 @@
+from pathlib import Path
+from typing  import Any
+
+import subprocess
+import json
+import time
+import sys
+import os
+
+import pytest
+
+import Moonlight as package
+
+from Moonlight.config        import config as config_module
+from Moonlight.config.config import Config
+
+EXITING: str = '''
+import sys
+
+from Moonlight.config.config import Config
+
+Config(sys.argv[1], { 'users' : [] }, write_delay = 60).push('users', 'other')
+'''
+
+
+def write_file(path: Path, data: dict[str, Any]) -> None:
+    '''Writes the file as another process would, with a later modification time'''
+    stat: os.stat_result = path.stat()
+
+    path.write_text(json.dumps(data))
+
+    os.utime(path, ns = (stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_missing_file_is_created(tmp_path: Path) -> None:
+    settings: Config = Config(str(tmp_path / 'config.json'), { 'a' : 1 })
+
+    assert settings.get('a') == 1
+    assert json.loads((tmp_path / 'config.json').read_text()) == { 'a' : 1 }
+
+def test_changes_are_written_together_after_the_delay(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    writes:   list[str] = []
+    write:    Any       = config_module.write_atomic
+    settings: Config    = Config(str(tmp_path / 'config.json'), { 'users' : [] }, write_delay = 0.2)
+
+    monkeypatch.setattr(config_module, 'write_atomic', lambda path, data: (writes.append(path), write(path, data)))
+
+    settings.push('users', { 'name' : 'a' })
+    settings.push('users', { 'name' : 'b' })
+    settings.delete('users', 'name', 'a')
+
+    assert settings.get('users') == [{ 'name' : 'b' }]
+    assert json.loads((tmp_path / 'config.json').read_text()) == { 'users' : [] }
+
+    time.sleep(0.5)
+
+    assert writes.count(str(tmp_path / 'config.json')) == 1
+    assert json.loads((tmp_path / 'config.json').read_text()) == { 'users' : [{ 'name' : 'b' }] }
+
+def test_pending_changes_are_written_at_exit(tmp_path: Path) -> None:
+    Config(str(tmp_path / 'config.json'), { 'users' : ['own'] })
+
+    environment: dict[str, str] = { **os.environ, 'PYTHONPATH' : os.path.dirname(os.path.dirname(package.__file__)) }
+
+    subprocess.run([sys.executable, '-c', EXITING, str(tmp_path / 'config.json')], env = environment, check = True)
+
+    assert json.loads((tmp_path / 'config.json').read_text()) == { 'users' : ['own', 'other'] }
+
+def test_file_is_replaced_instead_of_rewritten(tmp_path: Path) -> None:
+    settings: Config = Config(str(tmp_path / 'config.json'), { 'a' : 1 })
+    inode:    int    = (tmp_path / 'config.json').stat().st_ino
+
+    settings.set('a', 2)
+
+    assert (tmp_path / 'config.json').stat().st_ino != inode
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['config.json', 'config.json.lock']
+
+def test_file_changed_by_another_process_is_read_again(tmp_path: Path) -> None:
+    settings: Config = Config(str(tmp_path / 'config.json'), { 'a' : 1 }, check_interval = 0)
+    lazy:     Config = Config(str(tmp_path / 'config.json'))
+
+    write_file(tmp_path / 'config.json', { 'a' : 2 })
+
+    assert settings.get('a') == 2
+    assert lazy.get('a') == 1
+
+def test_pending_changes_are_replayed_on_the_changed_file(tmp_path: Path) -> None:
+    settings: Config = Config(str(tmp_path / 'config.json'), { 'users' : ['a'], 'port' : 1 }, write_delay = 60)
+
+    settings.push('users', 'own')
+    settings.set('port', 2)
+
+    write_file(tmp_path / 'config.json', { 'users' : ['a', 'other'], 'port' : 1, 'added' : True })
+
+    settings.flush()
+
+    assert json.loads((tmp_path / 'config.json').read_text()) == { 'users' : ['a', 'other', 'own'], 'port' : 2, 'added' : True }
+    assert settings.get('added') is True
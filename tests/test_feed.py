@@ -0,0 +1,63 @@
+from typing import Any, Callable
+
+import subprocess
+import asyncio
+import sys
+import os
+
+import pytest
+
+import Moonlight as package
+
+from Moonlight.config.config  import app_data
+from Moonlight.core.moonlight import Moonlight
+
+WRITER: str = '''
+import asyncio, sys
+
+from Moonlight.core.moonlight import Moonlight
+
+asyncio.run(Moonlight(sys.argv[1], console_show = False).push({ 'writer' : 'other' }))
+'''
+
+
+@pytest.fixture(autouse = True)
+def fast_poll(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(app_data.get('watch'), 'poll_interval', 0.05)
+
+async def next_change(changes: Any, timeout: float = 5) -> dict:
+    return await asyncio.wait_for(anext(changes), timeout)
+
+async def test_watcher_gets_own_changes_without_reset(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database()
+    changes:  Any       = database.watch()
+
+    watching: asyncio.Task = asyncio.ensure_future(next_change(changes))
+
+    await asyncio.sleep(0.2)
+
+    id: int = await database.push({ 'n' : 1 })
+
+    change: dict = await watching
+
+    assert change.get('op') == 'push' and change.get('id') == id
+
+    with pytest.raises(TimeoutError): await next_change(changes, 0.2)
+
+    await changes.aclose()
+
+async def test_watcher_gets_reset_after_a_write_of_another_process(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database()
+    changes:  Any       = database.watch({ 'n' : 1 })
+
+    watching: asyncio.Task = asyncio.ensure_future(next_change(changes))
+
+    await asyncio.sleep(0.2)
+
+    environment: dict[str, str] = { **os.environ, 'PYTHONPATH' : os.path.dirname(os.path.dirname(package.__file__)) }
+
+    assert (await asyncio.to_thread(subprocess.run, [sys.executable, '-c', WRITER, database.name.removesuffix('.json')], env = environment)).returncode == 0
+
+    assert (await watching).get('op') == 'reset'
+
+    await changes.aclose()
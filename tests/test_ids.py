@@ -0,0 +1,45 @@
+from typing import Callable
+
+import subprocess
+import sys
+import os
+
+import Moonlight as package
+
+from Moonlight.core.moonlight import Moonlight
+from Moonlight.core.tools     import generate_id
+
+WRITER: str = '''
+import asyncio, os, sys
+
+from Moonlight.core            import tools
+from Moonlight.core.moonlight import Moonlight
+
+tools.id_state.update(pid = os.getpid(), node = 0, timestamp = 0, sequence = -1)
+
+async def main() -> None:
+    database: Moonlight = Moonlight(sys.argv[1], console_show = False, storage = 'log')
+    ids:      list      = [await database.push({ 'writer' : sys.argv[2], 'n' : n }) for n in range(300)]
+
+    assert None not in ids
+
+asyncio.run(main())
+'''
+
+
+def test_ids_of_one_process_grow() -> None:
+    ids: list[int] = [generate_id() for _ in range(5000)]
+
+    assert ids == sorted(set(ids)) and max(ids) < 2 ** 53
+
+def test_ids_of_one_shard_belong_to_it() -> None:
+    assert all(generate_id(2, 3) % 3 == 2 for _ in range(1000))
+
+async def test_processes_sharing_a_node_lose_no_records(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(storage = 'log')
+
+    environment: dict[str, str]         = { **os.environ, 'PYTHONPATH' : os.path.dirname(os.path.dirname(package.__file__)) }
+    writers:     list[subprocess.Popen] = [subprocess.Popen([sys.executable, '-c', WRITER, database.name.removesuffix('.json'), str(writer)], env = environment) for writer in range(2)]
+
+    assert all(writer.wait() == 0 for writer in writers)
+    assert await database.length() == 600
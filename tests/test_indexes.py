@@ -0,0 +1,69 @@
+from typing import Callable
+
+import pytest
+
+from Moonlight.core.dataset   import Dataset
+from Moonlight.core.moonlight import Moonlight
+
+
+def make_dataset() -> Dataset:
+    dataset: Dataset = Dataset({ 'data' : [{ 'id' : 1, 'city' : 'a' }, { 'id' : 2, 'city' : 'a' }, { 'id' : 3, 'city' : 'b' }] }, 'id')
+
+    dataset.create_index('city')
+
+    return dataset
+
+def test_postings_follow_updates_and_deletes() -> None:
+    dataset: Dataset = make_dataset()
+
+    assert [record.get('id') for record in dataset.lookup({ 'city' : ['a'] })] == [1, 2]
+    assert dataset.built('city') and not dataset.built('city', True)
+
+    dataset.update({ 'id' : 1, 'city' : 'b' })
+    dataset.delete(2)
+    dataset.push({ 'id' : 4, 'city' : 'a' })
+
+    assert [record.get('id') for record in dataset.lookup({ 'city' : ['a'] })]      == [4]
+    assert [record.get('id') for record in dataset.lookup({ 'city' : ['a', 'b'] })] == [1, 3, 4]
+
+def test_copy_keeps_postings_of_its_own() -> None:
+    dataset: Dataset = make_dataset()
+
+    dataset.lookup({ 'city' : ['a'] })
+
+    copy: Dataset = dataset.copy()
+
+    copy.delete(1)
+
+    assert copy.built('city')
+    assert [record.get('id') for record in dataset.lookup({ 'city' : ['a'] })] == [1, 2]
+    assert [record.get('id') for record in copy.lookup({ 'city' : ['a'] })]    == [2]
+
+@pytest.mark.parametrize('storage', ['snapshot', 'log', 'lines'])
+async def test_resident_index_follows_writes(open_database: Callable[..., Moonlight], storage: str) -> None:
+    database: Moonlight = open_database(storage = storage, resident = True)
+
+    await database.create_index('city')
+
+    ids: list[int] = [await database.push({ 'city' : city }) for city in ('a', 'a', 'b')]
+
+    assert (await database.explain({ 'city' : 'a' })) == { 'plan' : 'index', 'fields' : ['city'], 'sorted_by_index' : False, 'candidates' : 2, 'matches' : 2 }
+
+    await database.update({ 'id' : ids[0], 'city' : 'b' })
+    await database.delete(ids[1])
+
+    assert await database.get({ 'city' : 'a' }) == []
+    assert [record.get('id') for record in await database.get({ 'city' : 'b' })] == [ids[0], ids[2]]
+    assert (await database.explain({ 'city' : 'b' })).get('candidates') == 2
+
+async def test_parsed_database_is_scanned_instead_of_building_the_index(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database()
+
+    await database.create_index('city')
+    await database.create_index('n', ordered = True)
+
+    for n in range(5): await database.push({ 'city' : 'a' if n % 2 else 'b', 'n' : n })
+
+    assert (await database.explain({ 'city' : 'a' })).get('plan')          == 'scan'
+    assert (await database.explain({ 'n' : { '$gte' : 3 } })).get('plan') == 'scan'
+    assert [record.get('n') for record in await database.get({ 'city' : 'a' })] == [1, 3]
@@ -0,0 +1,38 @@
+from pathlib import Path
+from typing  import Callable
+
+import pytest
+
+from Moonlight.core.dataset   import Dataset
+from Moonlight.core.lines     import LinesFile
+from Moonlight.core.moonlight import Moonlight
+
+
+@pytest.mark.parametrize('resident', [False, True])
+async def test_grown_record_keeps_its_place(open_database: Callable[..., Moonlight], resident: bool) -> None:
+    database: Moonlight = open_database(storage = 'lines', resident = resident)
+    ids:      list[int] = [await database.push({ 'n' : n }) for n in range(5)]
+
+    await database.update({ 'id' : ids[1], 'text' : 'grown' * 20 })
+
+    reopened: Moonlight = open_database(storage = 'lines', resident = resident)
+
+    assert [record.get('id') for record in await database.all()] == ids
+    assert [record.get('id') for record in await reopened.all()] == ids
+    assert (await reopened.get({ 'id' : ids[1] }))[0].get('text') == 'grown' * 20
+
+def test_failed_apply_leaves_the_file_untouched(tmp_path: Path) -> None:
+    lines: LinesFile = LinesFile(str(tmp_path / 'lines.json'), str(tmp_path / 'lines.offsets'), 'id')
+
+    lines.write({ 'data' : [{ 'id' : 1, 'n' : 0 }] })
+
+    with open(lines.path, 'rb') as database_file: before: bytes = database_file.read()
+
+    dataset: Dataset = Dataset(lines.load(), 'id')
+
+    dataset.update({ 'id' : 1, 'n' : 1 })
+    dataset.push({ 'id' : 2, 'bad' : { 1 } })
+
+    with pytest.raises(TypeError): lines.apply(dataset, [{ 'op' : 'update', 'record' : { 'id' : 1, 'n' : 1 } }, { 'op' : 'push', 'record' : { 'id' : 2 } }])
+
+    with open(lines.path, 'rb') as database_file: assert database_file.read() == before
@@ -0,0 +1,91 @@
+from pathlib import Path
+from typing  import Any, Callable
+
+import threading
+import asyncio
+import time
+
+import pytest
+
+from Moonlight.core.locks     import ReadWriteLock, FileReadWriteLock, fcntl
+from Moonlight.core.moonlight import Moonlight
+
+
+async def test_readers_share_the_lock_and_a_waiting_writer_goes_first() -> None:
+    lock:   ReadWriteLock = ReadWriteLock()
+    events: list[str]     = []
+
+    async def read(name: str, delay: float) -> None:
+        async with lock.read():
+            events.append(f'{name} in')
+            await asyncio.sleep(delay)
+            events.append(f'{name} out')
+
+    async def write() -> None:
+        async with lock.write(): events.append('writer')
+
+    first:  asyncio.Task = asyncio.create_task(read('first', 0.05))
+    second: asyncio.Task = asyncio.create_task(read('second', 0.05))
+
+    await asyncio.sleep(0.01)
+
+    writer: asyncio.Task = asyncio.create_task(write())
+
+    await asyncio.sleep(0.01)
+
+    late: asyncio.Task = asyncio.create_task(read('late', 0))
+
+    await asyncio.gather(first, second, writer, late)
+
+    assert events[:2] == ['first in', 'second in']
+    assert events.index('writer') > max(events.index('first out'), events.index('second out'))
+    assert events.index('late in') > events.index('writer')
+
+@pytest.mark.skipif(fcntl is None, reason = 'shared file locks need fcntl')
+def test_file_lock_is_shared_by_readers_and_exclusive_for_writers(tmp_path: Path) -> None:
+    lock:     FileReadWriteLock = FileReadWriteLock(str(tmp_path / 'database.lock'))
+    acquired: threading.Event   = threading.Event()
+
+    def write() -> None:
+        with lock.exclusive(): acquired.set()
+
+    with lock.shared():
+        with lock.shared(): pass
+
+        writer: threading.Thread = threading.Thread(target = write)
+        writer.start()
+
+        assert not acquired.wait(0.1)
+
+    writer.join(1)
+
+    assert acquired.is_set()
+
+async def test_snapshot_reads_do_not_wait_for_a_write(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight       = open_database(storage = 'snapshot', resident = True)
+    existed:  int             = await database.push({ 'n' : 0 })
+    started:  threading.Event = threading.Event()
+    release:  threading.Event = threading.Event()
+    persist:  Any             = database._Moonlight__persist
+
+    def slow(dataset: Any, entries: list) -> None:
+        started.set()
+        release.wait(5)
+        persist(dataset, entries)
+
+    database._Moonlight__persist = slow
+
+    writer: asyncio.Task = asyncio.create_task(database.update({ 'id' : existed, 'n' : 1 }))
+
+    await asyncio.to_thread(started.wait, 5)
+
+    began: float = time.monotonic()
+
+    assert (await database.get({ 'id' : existed }))[0].get('n') == 0
+    assert time.monotonic() - began < 1
+
+    release.set()
+
+    await writer
+
+    assert (await database.get({ 'id' : existed }))[0].get('n') == 1
@@ -0,0 +1,52 @@
+from typing import Any, Callable
+
+import pytest
+
+from Moonlight.core.moonlight import Moonlight
+
+
+@pytest.mark.parametrize('shards', [1, 3])
+async def test_every_item_gets_its_own_result(open_database: Callable[..., Moonlight], shards: int) -> None:
+    database: Moonlight        = open_database(shards = shards)
+    ids:      list[int | None] = await database.push_many([{ 'n' : 1 }, 'not an object', { 'n' : 2 }, { 'n' : 3 }])
+
+    assert ids[1] is None and all(isinstance(id, int) for id in (ids[0], ids[2], ids[3]))
+
+    updated: list[int | None] = await database.update_many([{ 'id' : ids[2], 'n' : 20 }, { 'id' : -1, 'n' : 0 }, { 'n' : 0 }, { 'id' : ids[0], 'n' : 10 }])
+
+    assert updated == [ids[2], None, None, ids[0]]
+
+    deleted: list[dict[str, Any] | None] = await database.delete_many([-1, ids[3], ids[3]])
+
+    assert deleted == [None, { 'id' : ids[3], 'n' : 3 }, None]
+    assert sorted(record.get('n') for record in await database.all()) == [10, 20]
+
+async def test_items_are_written_at_once(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(storage = 'log')
+    writes:   list[int] = []
+    persist:  Any       = database._Moonlight__persist
+
+    database._Moonlight__persist = lambda dataset, entries: (writes.append(len(entries)), persist(dataset, entries))
+
+    ids: list[int | None] = await database.push_many([{ 'n' : n } for n in range(5)])
+
+    await database.update_many([{ 'id' : id, 'n' : -1 } for id in ids])
+    await database.delete_many(ids[:3])
+
+    assert writes == [5, 5, 3]
+
+async def test_item_that_cannot_be_stored_fails_alone(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight        = open_database()
+    ids:      list[int | None] = await database.push_many([{ 'n' : 1 }, { 'n' : { 1, 2 } }, { 'n' : 3 }])
+
+    assert ids[1] is None and None not in (ids[0], ids[2])
+    assert [record.get('n') for record in await database.all()] == [1, 3]
+
+async def test_batch_without_valid_items_writes_nothing(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database()
+
+    assert await database.push_many([1, 'a']) == [None, None]
+    assert await database.update_many([{ 'n' : 1 }]) == [None]
+    assert await database.delete_many([-1, -2]) == [None, None]
+    assert await database.push_many({ 'n' : 1 }) is None
+    assert await database.all() == []
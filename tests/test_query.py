@@ -0,0 +1,128 @@
+from typing import Any, Callable
+
+import pytest
+
+from Moonlight.core.moonlight import Moonlight
+from Moonlight.core.query     import PlanKind, compile_query, compile_shape, parse_sort, plan_query, project, sort_records
+
+RECORDS: list[dict[str, Any]] = [
+    { 'id' : 1, 'n' : 1,   'name' : 'ann',  'tags' : ['a', 'b'], 'address' : { 'city' : 'Oslo' } },
+    { 'id' : 2, 'n' : 5,   'name' : 'bob',  'tags' : [],         'address' : { 'city' : 'Rome' } },
+    { 'id' : 3, 'n' : 10,  'name' : 'cid',  'address' : None },
+    { 'id' : 4, 'n' : '7', 'name' : None },
+    { 'id' : 5 }
+]
+
+
+def matching(query: dict[str, Any]) -> list[int]:
+    return [record.get('id') for record in filter(compile_query(query), RECORDS)]
+
+@pytest.mark.parametrize('query, ids', [
+    ({ 'n' : 5 },                             [2]),
+    ({ 'name' : None },                       [4, 5]),
+    ({ 'n' : { '$eq' : 5 } },                 [2]),
+    ({ 'n' : { '$ne' : 5 } },                 [1, 3, 4, 5]),
+    ({ 'n' : { '$gt' : 1 } },                 [2, 3]),
+    ({ 'n' : { '$gte' : 1, '$lt' : 10 } },    [1, 2]),
+    ({ 'n' : { '$lte' : 5 } },                [1, 2]),
+    ({ 'n' : { '$gt' : '5' } },               [4]),
+    ({ 'n' : { '$in' : [1, 10, '7'] } },      [1, 3, 4]),
+    ({ 'n' : { '$in' : [[1], 5] } },          [2]),
+    ({ 'n' : { '$nin' : [1, 10] } },          [2, 4, 5]),
+    ({ 'name' : { '$exists' : True } },       [1, 2, 3, 4]),
+    ({ 'name' : { '$exists' : False } },      [5]),
+    ({ 'name' : { '$regex' : '^[ab]' } },     [1, 2]),
+    ({ 'n' : { '$gt' : 1 }, 'name' : 'cid' }, [3]),
+    ({},                                      [1, 2, 3, 4, 5])
+])
+def test_operators(query: dict[str, Any], ids: list[int]) -> None:
+    assert matching(query) == ids
+
+@pytest.mark.parametrize('query, ids', [
+    ({ 'address.city' : 'Oslo' },                       [1]),
+    ({ 'address.city' : None },                         [3, 4, 5]),
+    ({ 'address.city' : { '$exists' : True } },         [1, 2]),
+    ({ 'address.city' : { '$in' : ['Rome', 'Oslo'] } }, [1, 2]),
+    ({ 'tags.1' : 'b' },                                [1]),
+    ({ 'tags.0' : { '$exists' : False } },              [2, 3, 4, 5])
+])
+def test_dotted_paths(query: dict[str, Any], ids: list[int]) -> None:
+    assert matching(query) == ids
+
+def test_field_with_a_dot_in_its_name_is_matched_first() -> None:
+    assert compile_query({ 'a.b' : 1 })({ 'a.b' : 1, 'a' : { 'b' : 2 } })
+
+@pytest.mark.parametrize('query', [
+    { 'n' : { '$like' : 1 } },
+    { 'n' : { '$gt' : None } },
+    { 'n' : { '$in' : 5 } },
+    { 'n' : { '$regex' : '(' } },
+    { 'n' : { '$gt' : 1, 'other' : 2 } },
+    { 1 : 'not a string' }
+])
+def test_invalid_queries_are_rejected(query: dict[str, Any]) -> None:
+    with pytest.raises(ValueError): compile_query(query)
+
+def test_shape_is_compiled_once_for_any_values() -> None:
+    compile_shape.cache_clear()
+
+    assert matching({ 'n' : { '$gt' : 1 }, 'name' : 'bob' }) == [2]
+    assert matching({ 'n' : { '$gt' : 7 }, 'name' : 'cid' }) == [3]
+    assert matching({ 'name' : 'cid', 'n' : { '$gt' : 7 } }) == [3]
+
+    assert compile_shape.cache_info().misses == 2 and compile_shape.cache_info().hits == 1
+
+def test_compiled_shape_takes_values_in_order() -> None:
+    factory: Callable[..., Callable[[dict[str, Any]], bool]] = compile_shape((('n', ('$gte', '$lt')), ('address.city', None)))
+
+    assert factory((0, 1), (0, 10), 'Oslo')(RECORDS[0])
+    assert not factory((0, 5), (0, 10), 'Oslo')(RECORDS[0])
+
+def test_sort_and_projection() -> None:
+    assert [record.get('id') for record in sort_records(RECORDS, parse_sort(['-n']))]           == [4, 3, 2, 1, 5]
+    assert [record.get('id') for record in sort_records(RECORDS, parse_sort('address.city'))] == [3, 4, 5, 1, 2]
+    assert project(RECORDS[0], ['id', 'address.city', 'missing']) == { 'id' : 1, 'address' : { 'city' : 'Oslo' } }
+
+    with pytest.raises(ValueError): parse_sort(['-'])
+
+@pytest.mark.parametrize('query, columnar, sort, kind, fields', [
+    ({ 'id' : 1, 'city' : 'a' },        False, None,               PlanKind.PRIMARY_KEY,   ['id']),
+    ({ 'id' : { '$in' : [1, 2] } },     False, None,               PlanKind.PRIMARY_KEY,   ['id']),
+    ({ 'city' : 'a', 'age' : 1 },       False, None,               PlanKind.INDEX,         ['city']),
+    ({ 'city' : { '$in' : ['a'] } },    False, None,               PlanKind.INDEX,         ['city']),
+    ({ 'city' : { '$ne' : 'a' } },      False, None,               PlanKind.SCAN,          []),
+    ({ 'age' : { '$gt' : 1 } },         False, None,               PlanKind.ORDERED_INDEX, ['age']),
+    ({ 'age' : { '$exists' : True } },  False, None,               PlanKind.SCAN,          []),
+    ({ 'name' : 'a' },                  True,  None,               PlanKind.COLUMNS,       ['name']),
+    ({ 'name.first' : 'a' },            True,  None,               PlanKind.SCAN,          []),
+    ({ 'name' : 'a' },                  False, [('name', False)],  PlanKind.SCAN,          [])
+])
+def test_planner_choice(query: dict[str, Any], columnar: bool, sort: list[tuple[str, bool]] | None, kind: PlanKind, fields: list[str]) -> None:
+    plan: Any = plan_query(query, 'id', ['city'], ['age'], columnar, sort)
+
+    assert plan.kind is kind and plan.fields == fields
+
+def test_ordered_index_takes_the_narrowest_bounds() -> None:
+    plan: Any = plan_query({ 'age' : { '$gt' : 1, '$gte' : 3, '$lt' : 9 } }, 'id', [], ['age'], sort = [('age', True)])
+
+    assert (plan.start, plan.end, plan.reverse, plan.ordered) == (3, 9, True, True)
+
+async def test_explain_counts_candidates_and_matches(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(resident = True)
+
+    await database.create_index('age', ordered = True)
+
+    ids: list[int] = [await database.push({ 'age' : age, 'name' : 'even' if age % 2 == 0 else 'odd' }) for age in range(10)]
+
+    assert await database.explain({ 'id' : ids[0] })                                    == { 'plan' : 'primary_key', 'fields' : ['id'], 'sorted_by_index' : False, 'candidates' : 1, 'matches' : 1 }
+    assert await database.explain({ 'age' : { '$gte' : 6 }, 'name' : 'even' }, '-age') == { 'plan' : 'ordered_index', 'fields' : ['age'], 'sorted_by_index' : True, 'candidates' : 4, 'matches' : 2 }
+    assert await database.explain({ 'name' : 'odd' })                                   == { 'plan' : 'scan', 'fields' : [], 'sorted_by_index' : False, 'candidates' : 10, 'matches' : 5 }
+    assert await database.explain({ 'age' : { '$bad' : 1 } }) is None
+
+async def test_invalid_query_is_not_run(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database()
+
+    await database.push({ 'n' : 1 })
+
+    assert await database.get({ 'n' : { '$gt' : 1, 'm' : 2 } }) is None
+    assert await database.get({ 'n' : { '$like' : 1 } }) is None
@@ -0,0 +1,15 @@
+from typing import Callable
+
+import pytest
+
+from Moonlight.core.moonlight import Moonlight
+
+
+@pytest.mark.parametrize('limit', [-1, 1.5, '2', True])
+async def test_range_rejects_invalid_limit(open_database: Callable[..., Moonlight], limit: object) -> None:
+    database: Moonlight = open_database()
+
+    await database.push({ 'n' : 1 })
+
+    assert await database.range('n', limit = limit) is None
+    assert len((await database.range('n', limit = 1)).get('records')) == 1
@@ -0,0 +1,83 @@
+from pathlib import Path
+from typing  import Callable
+
+import asyncio
+
+from Moonlight.api.registry    import Registry
+from Moonlight.core.moonlight  import Moonlight
+from Moonlight.messages        import logger as logger_module
+from Moonlight.messages.logger import Logger, LogLevel
+
+
+async def test_handle_is_opened_once_and_shared(open_database: Callable[..., Moonlight]) -> None:
+    registry: Registry  = Registry(60)
+    database: Moonlight = open_database()
+
+    async with registry.use(database.database_id) as first:
+        async with registry.use(database.database_id) as second: assert first is second and first.name == database.name
+
+    async with registry.use(-1) as missing: assert missing is None
+
+    await registry.close()
+
+async def test_idle_handle_is_closed(open_database: Callable[..., Moonlight]) -> None:
+    registry: Registry  = Registry(0.05)
+    database: Moonlight = open_database()
+
+    async with registry.use(database.database_id) as handle: await handle.push({ 'n' : 1 })
+
+    assert logger_module.handlers.get(database.logs_path)[1] == 2
+
+    await asyncio.sleep(0.2)
+
+    assert logger_module.handlers.get(database.logs_path)[1] == 1
+
+    async with registry.use(database.database_id) as reopened: assert reopened is not handle and len(await reopened.all()) == 1
+
+    await registry.close()
+
+async def test_handle_held_by_a_request_is_not_closed(open_database: Callable[..., Moonlight]) -> None:
+    registry: Registry  = Registry(0.05)
+    database: Moonlight = open_database()
+
+    async with registry.use(database.database_id) as handle:
+        await asyncio.sleep(0.2)
+
+        async with registry.use(database.database_id) as same: assert same is handle
+
+    await registry.close()
+
+async def test_handle_of_a_deleted_database_is_forgotten(open_database: Callable[..., Moonlight]) -> None:
+    registry: Registry  = Registry(60)
+    database: Moonlight = open_database()
+
+    registry.add(database)
+
+    await database.drop()
+
+    async with registry.use(database.database_id) as missing: assert missing is None
+
+    await registry.close()
+
+def test_loggers_of_a_file_share_one_handler(tmp_path: Path) -> None:
+    first:  Logger = Logger(str(tmp_path / 'first.log'),  (LogLevel.INFO,), console_show = False)
+    second: Logger = Logger(str(tmp_path / 'first.log'),  (LogLevel.INFO,), console_show = False)
+    other:  Logger = Logger(str(tmp_path / 'other.log'), (LogLevel.INFO,), console_show = False)
+
+    assert logger_module.handlers.get(first.path)[1] == 2
+
+    first.write('from first', LogLevel.INFO)
+    first.stop()
+    first.stop()
+    second.write('from second', LogLevel.INFO)
+    other.write('from other', LogLevel.INFO)
+    second.stop()
+
+    assert first.path not in logger_module.handlers and other.path in logger_module.handlers
+
+    second.write('after stop', LogLevel.INFO)
+    other.stop()
+
+    assert 'from first' in (tmp_path / 'first.log').read_text() and 'from second' in (tmp_path / 'first.log').read_text()
+    assert 'after stop' not in (tmp_path / 'first.log').read_text() and 'other' not in (tmp_path / 'first.log').read_text()
+    assert (tmp_path / 'other.log').read_text().count('from') == 1
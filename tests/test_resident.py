@@ -0,0 +1,72 @@
+from typing import Any, Callable
+
+import os
+
+import pytest
+
+from Moonlight.core.moonlight import Moonlight
+
+
+@pytest.mark.parametrize('storage', ['snapshot', 'log', 'lines'])
+async def test_changed_results_do_not_reach_the_file(open_database: Callable[..., Moonlight], storage: str) -> None:
+    database: Moonlight = open_database(storage = storage, resident = True)
+    id:       int       = await database.push({ 'n' : 1, 'tags' : ['a'] })
+
+    results: list[dict[str, Any]] = [
+        *(await database.all()),
+        *(await database.all(0, 10)),
+        *(await database.get({ 'n' : 1 })),
+        *(await database.range('n')).get('records'),
+        *[record async for record in database.iter_all()]
+    ]
+
+    for record in results:
+        record['n'] = 99
+        record['tags'].append('x')
+
+    await database.push({ 'n' : 2 })
+
+    assert (await database.get({ 'id' : id }))[0] == { 'id' : id, 'n' : 1, 'tags' : ['a'] }
+    assert (await open_database(storage = storage).get({ 'id' : id }))[0] == { 'id' : id, 'n' : 1, 'tags' : ['a'] }
+
+async def test_pushed_and_updated_objects_stay_with_the_caller(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight      = open_database(resident = True)
+    pushed:   dict[str, Any] = { 'tags' : ['a'] }
+    id:       int            = await database.push(pushed)
+    changes:  dict[str, Any] = { 'id' : id, 'more' : ['b'] }
+
+    await database.update(changes)
+
+    pushed['tags'].append('x')
+    changes['more'].append('y')
+
+    assert await database.all() == [{ 'id' : id, 'tags' : ['a'], 'more' : ['b'] }]
+
+async def test_resident_copy_is_read_again_after_the_file_changes(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(resident = True, serializer = 'json')
+
+    await database.push({ 'name' : 'aaaa' })
+
+    assert [record.get('name') for record in await database.all()] == ['aaaa']
+
+    stat: os.stat_result = os.stat(database.filename)
+
+    with open(database.filename, 'r+b') as database_file:
+        raw: bytes = database_file.read()
+
+        database_file.seek(0)
+        database_file.write(raw.replace(b'"aaaa"', b'"bbbb"'))
+
+    os.utime(database.filename, ns = (stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert [record.get('name') for record in await database.all()] == ['bbbb']
+
+async def test_resident_copy_sees_writes_of_another_handle(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(resident = True)
+    other:    Moonlight = open_database()
+
+    await database.push({ 'n' : 1 })
+    await database.all()
+    await other.push({ 'n' : 2 })
+
+    assert sorted(record.get('n') for record in await database.all()) == [1, 2]
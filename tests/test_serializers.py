@@ -0,0 +1,56 @@
+from typing import Any, Callable
+
+import msgpack
+import pytest
+
+from Moonlight.core             import serializers as serializers_module
+from Moonlight.core.moonlight   import Moonlight
+from Moonlight.core.serializers import Serializer, detect_serializer, get_serializer, json_lines, serializers
+
+DATA: dict[str, Any] = { 'data' : [{ 'id' : 1, 'name' : 'ü', 'tags' : [1.5, None, True] }] }
+
+
+@pytest.mark.parametrize('name', ['json', 'json_compact', 'orjson', 'msgpack'])
+def test_encodings_read_what_they_write(name: str) -> None:
+    serializer: Serializer = get_serializer(name)
+
+    assert serializer.name == name
+    assert serializer.loads(serializer.dumps(DATA)) == DATA
+    assert detect_serializer(serializer.dumps(DATA)).loads(serializer.dumps(DATA)) == DATA
+
+def test_json_is_read_by_the_fastest_parser() -> None:
+    assert detect_serializer(b'  \n{"data": []}') is json_lines is serializers.get('orjson')
+    assert detect_serializer(msgpack.packb(DATA)) is serializers.get('msgpack')
+    assert get_serializer(None).name == 'json' and get_serializer('xml') is None
+
+def test_msgpack_file_without_msgpack_is_rejected(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delitem(serializers_module.serializers, 'msgpack')
+
+    with pytest.raises(ValueError): detect_serializer(msgpack.packb(DATA))
+
+def test_serializer_must_implement_both_methods() -> None:
+    class Half(Serializer):
+        def dumps(self, data: Any) -> bytes: return b''
+
+    with pytest.raises(TypeError): Half()
+
+@pytest.mark.parametrize('old, new', [('json', 'msgpack'), ('msgpack', 'orjson'), ('orjson', 'json_compact')])
+async def test_file_is_migrated_on_the_next_write(open_database: Callable[..., Moonlight], old: str, new: str) -> None:
+    id: int = await open_database(serializer = old).push({ 'name' : 'a' })
+
+    database: Moonlight = open_database(serializer = new)
+
+    assert await database.all() == [{ 'id' : id, 'name' : 'a' }]
+
+    await database.push({ 'name' : 'b' })
+
+    with open(database.filename, 'rb') as database_file: raw: bytes = database_file.read()
+
+    assert detect_serializer(raw) is (serializers.get('msgpack') if new == 'msgpack' else json_lines)
+    assert raw == get_serializer(new).dumps(get_serializer(new).loads(raw))
+    assert [record.get('name') for record in await open_database(serializer = old).all()] == ['a', 'b']
+
+async def test_unknown_serializer_falls_back_to_json(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(serializer = 'xml')
+
+    assert database.serializer.name == 'json'
@@ -0,0 +1,27 @@
+from pathlib import Path
+from typing  import Callable
+
+import os
+
+import pytest
+
+from Moonlight.core           import shards
+from Moonlight.core.moonlight import Moonlight
+
+
+async def test_scan_workers_create_no_config_where_they_start(open_database: Callable[..., Moonlight], tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(shards, 'pool', None)
+
+    database:  Moonlight = open_database(shards = 2)
+    directory: str       = os.getcwd()
+
+    for n in range(10): await database.push({ 'n' : n })
+
+    os.chdir(tmp_path)
+
+    try:     assert len(await database.get({ 'n' : { '$gte' : 0 } })) == 10
+    finally:
+        os.chdir(directory)
+        shards.get_pool().shutdown()
+
+    assert not os.path.exists(tmp_path / 'config.json')
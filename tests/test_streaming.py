@@ -0,0 +1,113 @@
+from pathlib import Path
+from typing  import Any, Callable
+
+import json
+import io
+
+import msgpack
+import pytest
+
+from Moonlight.config.config  import app_data
+from Moonlight.core           import storage
+from Moonlight.core.moonlight import Moonlight
+from Moonlight.core.storage   import iter_database, iter_json, iter_msgpack, read_database
+
+DATA: dict[str, Any] = {
+    'name'    : 'before',
+    'indexes' : ['a', { 'nested' : [1, 2, ']'] }],
+    'data'    : [
+        { 'id' : 1, 'text' : 'ünïcödé 🌙', 'list' : [1, [2, [3]]] },
+        { 'id' : 2, 'text' : 'brackets ] , } and "quotes" \\ ' },
+        { 'id' : 3, 'empty' : {}, 'none' : None, 'float' : -1.5e-3 }
+    ],
+    'after'   : { 'data' : 'not the records' }
+}
+
+
+@pytest.fixture(autouse = True)
+def small_chunks(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(storage, 'CHUNK_SIZE', 5)
+
+@pytest.mark.parametrize('options', [{ 'indent' : 4 }, { 'separators' : (',', ':') }, { 'ensure_ascii' : False }])
+def test_json_items_are_read_across_chunks(options: dict[str, Any]) -> None:
+    assert list(iter_json(io.BytesIO(json.dumps(DATA, **options).encode('utf-8')))) == DATA.get('data')
+
+def test_json_without_records() -> None:
+    assert list(iter_json(io.BytesIO(b' { "data" : [ ] } '))) == []
+    assert list(iter_json(io.BytesIO(b'{"name": 1}'))) == []
+
+def test_truncated_json_is_an_error() -> None:
+    with pytest.raises(ValueError): list(iter_json(io.BytesIO(json.dumps(DATA).encode('utf-8')[:60])))
+
+def test_msgpack_items_skip_other_values() -> None:
+    assert list(iter_msgpack(io.BytesIO(msgpack.packb(DATA, use_bin_type = True)))) == DATA.get('data')
+
+def test_journal_is_applied_like_on_the_dataset(tmp_path: Path) -> None:
+    (tmp_path / 'database.json').write_text(json.dumps({ 'data' : [{ 'id' : id, 'n' : id } for id in range(1, 5)] }))
+
+    entries: list[dict[str, Any]] = [
+        { 'op' : 'update', 'record' : { 'id' : 1, 'n' : 10 } },
+        { 'op' : 'delete', 'id' : 2 },
+        { 'op' : 'push',   'record' : { 'id' : 5, 'n' : 5 } },
+        { 'op' : 'delete', 'id' : 3 },
+        { 'op' : 'push',   'record' : { 'id' : 3, 'n' : 30 } },
+        { 'op' : 'update', 'record' : { 'id' : 5, 'n' : 50 } }
+    ]
+
+    (tmp_path / 'database.journal').write_text(''.join(json.dumps(entry) + '\n' for entry in entries) + '{"op": "torn')
+
+    streamed: list[dict[str, Any]] = list(iter_database(str(tmp_path / 'database.json'), str(tmp_path / 'database.journal'), 'id'))
+
+    assert streamed == list(read_database(str(tmp_path / 'database.json'), str(tmp_path / 'database.journal'), 'id'))
+    assert [record.get('n') for record in streamed] == [10, 4, 50, 30]
+
+@pytest.mark.parametrize('storage_mode', ['snapshot', 'log', 'lines'])
+async def test_objects_are_read_in_batches_without_parsing_the_whole_file(open_database: Callable[..., Moonlight], monkeypatch: pytest.MonkeyPatch, storage_mode: str) -> None:
+    monkeypatch.setitem(app_data.get('iteration'), 'batch_size', 3)
+
+    database: Moonlight = open_database(storage = storage_mode)
+
+    await database.push_many([{ 'n' : n } for n in range(10)])
+
+    records: list[dict[str, Any]] = await database.all()
+
+    def load(*arguments: Any, **options: Any) -> Any: raise AssertionError('the whole database was parsed')
+
+    monkeypatch.setattr(database, '_Moonlight__load', load, raising = False)
+
+    assert [record async for record in database.iter_all()]  == records
+    assert [record async for record in database.iter_all(4)] == records[4:]
+    assert await database.get({ 'n' : { '$gte' : 5 } }, 1, 2) == records[6:8]
+
+async def test_iteration_stays_on_the_snapshot_it_started_from(open_database: Callable[..., Moonlight], monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(app_data.get('iteration'), 'batch_size', 2)
+
+    database: Moonlight = open_database()
+
+    await database.push_many([{ 'n' : n } for n in range(5)])
+
+    seen: list[int] = []
+
+    async for record in database.iter_all():
+        seen.append(record.get('n'))
+
+        if len(seen) == 1: await database.push({ 'n' : 5 })
+
+    assert seen == [0, 1, 2, 3, 4]
+
+async def test_iteration_continues_after_writes_between_batches(open_database: Callable[..., Moonlight], monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(app_data.get('iteration'), 'batch_size', 2)
+
+    database: Moonlight = open_database(storage = 'log')
+    ids:      list[int] = await database.push_many([{ 'n' : n } for n in range(5)])
+
+    seen: list[int] = []
+
+    async for record in database.iter_all():
+        seen.append(record.get('n'))
+
+        if len(seen) == 1:
+            await database.update({ 'id' : ids[0], 'n' : -1 })
+            await database.push({ 'n' : 5 })
+
+    assert seen == [0, 1, 2, 3, 4, 5]
@@ -0,0 +1,100 @@
+from datetime import timedelta
+from pathlib  import Path
+from typing   import Any
+
+import subprocess
+import asyncio
+import json
+import sys
+import os
+
+import pytest
+
+import Moonlight as package
+
+from Moonlight.config.config import config
+from Moonlight.core.tokens   import TokenStore, hash_token
+
+CREATOR: str = '''
+import sys
+
+from datetime import timedelta
+
+from Moonlight.core.tokens import TokenStore
+
+print(TokenStore(sys.argv[1]).create('other', timedelta(hours = 1)).get('token'))
+'''
+
+
+def read_hashes(path: Path) -> list[str]:
+    return [entry.get('hash') for entry in json.loads(path.read_text()).get('tokens')]
+
+def test_only_the_hash_of_a_token_is_kept(tmp_path: Path) -> None:
+    store: TokenStore     = TokenStore(str(tmp_path / 'tokens.json'))
+    token: dict[str, str] = store.create('admin', timedelta(hours = 1))
+
+    assert token.get('token') not in (tmp_path / 'tokens.json').read_text()
+    assert read_hashes(tmp_path / 'tokens.json') == [hash_token(token.get('token'))]
+
+    assert store.find(token.get('token')).get('author') == 'admin'
+    assert TokenStore(str(tmp_path / 'tokens.json')).find(token.get('token')).get('author') == 'admin'
+    assert store.find('unknown') is None and store.find(None) is None
+
+def test_expired_token_is_rejected(tmp_path: Path) -> None:
+    store: TokenStore = TokenStore(str(tmp_path / 'tokens.json'))
+
+    assert store.find(store.create('admin', timedelta(seconds = -1)).get('token')) is None
+
+def test_prune_removes_only_expired_tokens(tmp_path: Path) -> None:
+    store:   TokenStore = TokenStore(str(tmp_path / 'tokens.json'))
+    expired: str        = store.create('admin', timedelta(seconds = -1)).get('token')
+    valid:   str        = store.create('admin', timedelta(hours = 1)).get('token')
+
+    assert store.prune() == 1
+    assert store.prune() == 0
+    assert read_hashes(tmp_path / 'tokens.json') == [hash_token(valid)]
+    assert store.find(valid) is not None and store.find(expired) is None
+
+async def test_pruning_task_removes_expired_tokens(tmp_path: Path) -> None:
+    store: TokenStore = TokenStore(str(tmp_path / 'tokens.json'))
+
+    store.create('admin', timedelta(seconds = -1))
+
+    pruning: asyncio.Task = asyncio.ensure_future(store.keep_pruned(0.01))
+
+    for _ in range(100):
+        if not read_hashes(tmp_path / 'tokens.json'): break
+
+        await asyncio.sleep(0.01)
+
+    pruning.cancel()
+
+    with pytest.raises(asyncio.CancelledError): await pruning
+
+    assert read_hashes(tmp_path / 'tokens.json') == []
+
+def test_tokens_of_the_config_are_moved_to_the_file(tmp_path: Path) -> None:
+    store:  TokenStore           = TokenStore(str(tmp_path / 'tokens.json'))
+    issued: list[dict[str, Any]] = [
+        { 'author' : 'old',     'token' : 'kept-token',    'expires' : '2999-01-01T00:00:00', 'created' : '2000-01-01T00:00:00' },
+        { 'author' : 'expired', 'token' : 'expired-token', 'expires' : '2000-01-02T00:00:00', 'created' : '2000-01-01T00:00:00' }
+    ]
+
+    config.set('api_keys', issued)
+
+    try:     assert store.find('kept-token').get('author') == 'old'
+    finally: config.set('api_keys', [])
+
+    assert store.find('expired-token') is None
+    assert read_hashes(tmp_path / 'tokens.json') == [hash_token('kept-token')]
+    assert 'kept-token' not in (tmp_path / 'tokens.json').read_text()
+
+def test_token_of_another_process_is_found(tmp_path: Path) -> None:
+    store: TokenStore = TokenStore(str(tmp_path / 'tokens.json'))
+
+    store.create('admin', timedelta(hours = 1))
+
+    environment: dict[str, str] = { **os.environ, 'PYTHONPATH' : os.path.dirname(os.path.dirname(package.__file__)) }
+    token:       str            = subprocess.run([sys.executable, '-c', CREATOR, str(tmp_path / 'tokens.json')], env = environment, capture_output = True, text = True, check = True).stdout.strip()
+
+    assert store.find(token).get('author') == 'other'
@@ -0,0 +1,95 @@
+from typing import Any, Callable
+
+import os
+
+import pytest
+
+from Moonlight.core.moonlight import Moonlight
+
+STORAGES: list[str] = ['snapshot', 'log']
+
+
+def read_files(database: Moonlight) -> list[bytes | None]:
+    '''Returns the database file and the journal as they are on disk, None for a missing one'''
+    def read(path: str) -> bytes | None:
+        if not os.path.exists(path): return None
+
+        with open(path, 'rb') as database_file: return database_file.read()
+
+    return [read(database.filename), read(database.journal_path)]
+
+@pytest.mark.parametrize('storage', STORAGES)
+async def test_staged_changes_are_written_on_exit(open_database: Callable[..., Moonlight], storage: str) -> None:
+    database: Moonlight = open_database(storage = storage)
+    old:      int       = await database.push({ 'name' : 'old' })
+
+    async with database.transaction() as transaction:
+        id: int = transaction.push({ 'name' : 'new' })
+
+        transaction.update({ 'id' : id, 'tag' : 1 })
+        transaction.delete(old)
+
+        assert await database.get({ 'id' : old }) != []
+
+    assert transaction.committed and transaction.results == [id, id, { 'id' : old, 'name' : 'old' }]
+    assert await open_database(storage = storage).all() == [{ 'id' : id, 'name' : 'new', 'tag' : 1 }]
+
+@pytest.mark.parametrize('storage', STORAGES)
+async def test_exception_in_the_block_writes_nothing(open_database: Callable[..., Moonlight], storage: str) -> None:
+    database: Moonlight          = open_database(storage = storage)
+    id:       int                = await database.push({ 'name' : 'a' })
+    files:    list[bytes | None] = read_files(database)
+
+    with pytest.raises(RuntimeError):
+        async with database.transaction() as transaction:
+            transaction.update({ 'id' : id, 'name' : 'b' })
+            transaction.push({ 'name' : 'c' })
+
+            raise RuntimeError()
+
+    assert not transaction.committed and transaction.operations == []
+    assert read_files(database) == files
+
+@pytest.mark.parametrize('resident', [False, True])
+@pytest.mark.parametrize('storage',  STORAGES)
+async def test_failing_change_aborts_the_others(open_database: Callable[..., Moonlight], storage: str, resident: bool) -> None:
+    database: Moonlight          = open_database(storage = storage, resident = resident)
+    id:       int                = await database.push({ 'name' : 'a' })
+    files:    list[bytes | None] = read_files(database)
+
+    async with database.transaction() as transaction:
+        transaction.push({ 'name' : 'b' })
+        transaction.update({ 'id' : id, 'name' : 'changed' })
+        transaction.delete(id + 1_000_000)
+
+    assert transaction.results is None and not transaction.committed
+    assert read_files(database) == files
+    assert await database.all() == [{ 'id' : id, 'name' : 'a' }]
+
+@pytest.mark.parametrize('storage', STORAGES)
+async def test_failed_write_leaves_the_resident_copy_unchanged(open_database: Callable[..., Moonlight], storage: str) -> None:
+    database: Moonlight = open_database(storage = storage, resident = True)
+    id:       int       = await database.push({ 'name' : 'a' })
+
+    def fail(*arguments: Any) -> None: raise OSError('disk full')
+
+    database._Moonlight__persist = fail
+
+    async with database.transaction() as transaction:
+        transaction.update({ 'id' : id, 'name' : 'changed' })
+        transaction.push({ 'name' : 'b' })
+
+    assert transaction.results is None
+    assert await database.all() == [{ 'id' : id, 'name' : 'a' }]
+
+async def test_changes_of_all_shards_are_aborted_together(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(shards = 2)
+    ids:      list[int] = [await database.push({ 'n' : n }) for n in range(4)]
+
+    async with database.transaction() as transaction:
+        for id in ids: transaction.update({ 'id' : id, 'n' : -1 })
+
+        transaction.delete(-1)
+
+    assert transaction.results is None
+    assert sorted(record.get('n') for record in await database.all()) == [0, 1, 2, 3]
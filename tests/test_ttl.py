@@ -0,0 +1,98 @@
+from typing import Any, Callable
+
+import asyncio
+import json
+
+import pytest
+
+from sanic_testing.testing import SanicTestClient
+
+from Moonlight.config.config  import app_data
+from Moonlight.core.dataset   import Dataset, EXPIRES
+from Moonlight.core.moonlight import Moonlight
+
+
+def test_heap_finds_expired_records_which_are_still_current() -> None:
+    dataset: Dataset = Dataset({ 'data' : [
+        { 'id' : 1, EXPIRES : 10 },
+        { 'id' : 2, EXPIRES : 20 },
+        { 'id' : 3, EXPIRES : 30 },
+        { 'id' : 4, EXPIRES : 40 },
+        { 'id' : 5 }
+    ] }, 'id')
+
+    assert dataset.expired(25) == ([1, 2], 30)
+
+    dataset.update({ 'id' : 1, EXPIRES : 50 })
+    dataset.delete(2)
+    dataset.push({ 'id' : 6, EXPIRES : 5 })
+
+    assert dataset.expired(25) == ([6], 30)
+    assert dataset.expired(100)[1] is None and sorted(dataset.expired(100)[0]) == [1, 3, 4, 6]
+
+@pytest.mark.parametrize('resident', [False, True])
+@pytest.mark.parametrize('storage',  ['snapshot', 'log', 'lines'])
+async def test_reads_hide_expired_objects(open_database: Callable[..., Moonlight], storage: str, resident: bool) -> None:
+    database: Moonlight = open_database(storage = storage, resident = resident)
+    kept:     int       = await database.push({ 'name' : 'a' })
+    expiring: int       = await database.push({ 'name' : 'a' }, ttl = 0.05)
+
+    assert len(await database.get({ 'name' : 'a' })) == 2
+
+    await asyncio.sleep(0.1)
+
+    assert [record.get('id') for record in await database.all()]                 == [kept]
+    assert [record.get('id') for record in await database.get({ 'name' : 'a' })] == [kept]
+    assert await database.get({ 'id' : expiring }) == []
+    assert await database.count('name', 'a') == 1
+    assert not await database.contains('id', expiring)
+
+async def test_update_renews_the_lifetime(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database(ttl = 0.05)
+    id:       int       = await database.push({ 'name' : 'a' })
+
+    await database.update({ 'id' : id, 'name' : 'b' }, ttl = 60)
+    await asyncio.sleep(0.1)
+
+    assert [record.get('name') for record in await database.all()] == ['b']
+
+async def test_sweeper_deletes_expired_objects_from_the_file(open_database: Callable[..., Moonlight], monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(app_data.get('ttl'), 'sweep_interval', 0.01)
+
+    database: Moonlight = open_database(serializer = 'json')
+
+    await database.push({ 'name' : 'kept' })
+    await database.push({ 'name' : 'expiring' }, ttl = 0.05)
+
+    def names() -> list[str]:
+        with open(database.filename, 'r', encoding = 'utf-8') as database_file: return [record.get('name') for record in json.load(database_file).get('data')]
+
+    assert names() == ['kept', 'expiring']
+
+    for _ in range(100):
+        if names() == ['kept']: break
+
+        await asyncio.sleep(0.02)
+
+    assert names() == ['kept']
+
+@pytest.mark.parametrize('ttl', [0, -1, True, 'x'])
+async def test_invalid_lifetime_is_rejected(open_database: Callable[..., Moonlight], ttl: Any) -> None:
+    database: Moonlight = open_database()
+    id:       int       = await database.push({ 'name' : 'a' })
+
+    assert await database.push({ 'name' : 'b' }, ttl = ttl) is None
+    assert await database.update({ 'id' : id, 'name' : 'c' }, ttl = ttl) is None
+    assert await database.all() == [{ 'id' : id, 'name' : 'a' }]
+
+@pytest.mark.parametrize('ttl', [0, -5, 'x'])
+def test_api_answers_400_to_invalid_lifetime(api_client: tuple[SanicTestClient, dict[str, str]], ttl: Any) -> None:
+    client, headers = api_client
+
+    database: str = client.get('/moonlight/create?name=api_ttl', headers = headers)[1].json.get('data').get('id')
+
+    assert client.post(f'/moonlight/{database}/push', headers = headers, json = { 'query' : { 'n' : 1 }, 'ttl' : ttl })[1].status == 400
+
+    id: int = client.post(f'/moonlight/{database}/push', headers = headers, json = { 'query' : { 'n' : 1 }, 'ttl' : 60 })[1].json.get('data').get('id')
+
+    assert client.post(f'/moonlight/{database}/update', headers = headers, json = { 'query' : { 'id' : id, 'n' : 2 }, 'ttl' : ttl })[1].status == 400
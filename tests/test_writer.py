@@ -0,0 +1,41 @@
+from typing import Any, Callable
+
+import asyncio
+
+import pytest
+
+from Moonlight.core.moonlight import Moonlight
+
+
+@pytest.mark.parametrize('resident', [False, True])
+@pytest.mark.parametrize('storage',  ['snapshot', 'log', 'lines'])
+async def test_bad_operation_fails_alone_in_a_coalesced_write(open_database: Callable[..., Moonlight], storage: str, resident: bool) -> None:
+    database: Moonlight = open_database(storage = storage, resident = resident)
+    existed:  int       = await database.push({ 'n' : -1 })
+
+    results: list = await asyncio.gather(
+        *(database.push({ 'n' : n }) for n in range(10)),
+        database.push({ 'bad' : { 1, 2 } }),
+        database.update({ 'id' : existed, 'n' : -2 }),
+        *(database.push({ 'n' : n }) for n in range(10, 20))
+    )
+
+    assert results[10] is None
+    assert None not in results[:10] + results[11:]
+    assert await database.length() == 21
+    assert (await database.get({ 'id' : existed }))[0].get('n') == -2
+
+async def test_writes_of_concurrent_callers_are_coalesced(open_database: Callable[..., Moonlight]) -> None:
+    database: Moonlight = open_database()
+    persists: list[int] = []
+    persist:  Any       = database._Moonlight__persist
+
+    def counting(dataset: Any, entries: list) -> None:
+        persists.append(len(entries))
+        persist(dataset, entries)
+
+    database._Moonlight__persist = counting
+
+    ids: list = await asyncio.gather(*(database.push({ 'n' : n }) for n in range(50)))
+
+    assert len(set(ids)) == 50 and len(persists) < 50 and sum(persists) == 50